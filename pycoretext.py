@@ -14,6 +14,11 @@
 # You should have received a copy of the GNU General Public License
 # along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
 
-from pycoretext import application
+from pycoretext import startup
+
+# mesure des imports (rapport de démarrage), avant tout autre import
+startup.install()
+
+from pycoretext import application  # noqa: E402
 
 app = application.Application()
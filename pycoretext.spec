@@ -18,7 +18,9 @@ a = Analysis(
         ('pycoretext.spec', '.'),
         ('.\\pycoretext\\views\\image_login.png', '.'),
         ('.\\pycoretext\\views\\origine_donnees.txt', '.'),
-        ('.\\pycoretext\\pycoretext.ico', '.')
+        ('.\\pycoretext\\pycoretext.ico', '.'),
+        ('.\\pycoretext\\api_controller\\taxonomy_sandbox.json', '.'),
+        ('.\\pycoretext\\api_controller\\taxonomy_production.json', '.')
     ],
     hiddenimports=[],
     hookspath=[],
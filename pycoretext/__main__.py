@@ -0,0 +1,24 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+python -m pycoretext : mode ligne de commande (cf. module cli)
+"""
+
+import sys
+from pycoretext.cli import main
+
+sys.exit(main())
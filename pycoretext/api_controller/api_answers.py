@@ -18,9 +18,19 @@
 Les classes de ce modules permettent de stocker et structurer les réponses
 obtenues par une requête dans l'API
 """
+import json
+import sqlite3
+import sys
+from collections import deque
+from itertools import islice
 from math import ceil
 from concurrent.futures import ThreadPoolExecutor
 from pycoretext import exceptions as exc
+from .api_jobs import JobJournal
+from .api_blobs import BlobStore, TextHandle
+from .api_store import StoredText
+from .api_table import DecisionTable
+from .api_facets import FacetIndex
 import logging
 
 logger_api = logging.getLogger('api.api_answer')
@@ -50,6 +60,8 @@ class Answer:
         # nombre total de décisions retournées ("total" dans le dict)
         # Si cette clé n'existe pas alors None
         self.total_decisions = self.dict_from_response.get("total", None)
+        # stock sur disque des textes intégraux (créé à la demande)
+        self.blobs = None
 
     def feed_dict_decisions(self):
         """
@@ -57,6 +69,39 @@ class Answer:
         """
         pass
 
+    def __getstate__(self):
+        """
+        La connexion (session HTTP, verrous) n'est pas sérialisée (pickle)
+        """
+        state = self.__dict__.copy()
+        state.pop("connexion", None)
+        return state
+
+    def _spill_texts(self, decisions):
+        """
+        Ecrit les textes intégraux des décisions sur disque : chaque
+        décision ne conserve qu'une référence, relue au premier accès
+        """
+        connexion = getattr(self, "connexion", None)
+        if connexion is None or not connexion.spill_texts:
+            return
+        try:
+            if self.blobs is None:
+                self.blobs = BlobStore()
+            for decision in decisions:
+                decision.spill_text(self.blobs)
+        except OSError as e:
+            # les textes restent en mémoire
+            logger_api.warning(f'Blob store unavailable : {e}')
+
+    def close(self):
+        """
+        Libère les ressources de la réponse (fichier des textes)
+        """
+        if self.blobs is not None:
+            self.blobs.close(remove=True)
+            self.blobs = None
+
 
 class AnswerExport(Answer):
     """
@@ -65,13 +110,28 @@ class AnswerExport(Answer):
     """
 
     def __init__(self, dict_from_response, id_answer, dict_criterias,
-                 connexion, first_url):
+                 connexion, first_url, shards=None, stream=False,
+                 retain=True, store_results=False):
         """
         Constructeur de la classe AnswerExport
+        'shards' : tranches [(url de la 1ère page, total, 1ère page), ...]
+        calculées par le QueryPlanner lorsque la requête dépasse la limite
+        de l'API (la 1ère page de chaque tranche est déjà téléchargée)
+        'stream' : seule la 1ère page est traitée, les suivantes le seront
+        par fetch_remaining() ou iter_pages()
+        'retain' : si False, les décisions ne sont pas conservées
+        (dict_decisions, table, facettes) : elles ne sont disponibles que
+        dans les pages retournées par iter_pages(), 1ère page comprise
+        'store_results' : les décisions sont ajoutées au stock local de
+        la connexion (requêtes de l'utilisateur uniquement)
         """
         # récupération des informations de connexion
         # !! important de commencer par cette étape
         self.first_url = first_url
+        self.retain = retain
+        self.store_results = store_results
+        # 1ère page non conservée, en attente de iter_pages()
+        self._first_page = None
         # appelle le constructeur parent
         super().__init__(dict_from_response, id_answer, dict_criterias,
                          connexion)
@@ -83,6 +143,20 @@ class AnswerExport(Answer):
         self.wrong_urls = []
         # dictionnaire qui contiendra l'ensemble des objets Decision
         self.dict_decisions = {}
+        # les mêmes métadonnées en colonnes (tris, facettes, exports)
+        self.table = self._new_table()
+        # facettes (filtres sans nouvelle requête)
+        self.facets = FacetIndex(self.table)
+        # identifiants Judilibre déjà traités dans la tranche en cours
+        # (dédoublonnage) : les fenêtres de dates des tranches étant
+        # disjointes, l'ensemble est vidé au début de chaque tranche
+        self._judi_ids = set()
+        self.nb_duplicates = 0
+        # sans découpage, une seule tranche : la requête elle-même
+        shards = shards or [(first_url, self.total_decisions,
+                             dict_from_response)]
+        self.shards = [(url, total) for url, total, _ in shards]
+        self.total_decisions = sum(total for _, total in self.shards)
         # construction de la liste d'urls
         if 'next_page' in dict_from_response:
             # attribut présent dans les réponses Search
@@ -96,17 +170,115 @@ class AnswerExport(Answer):
         # le dict_from_response ne correspond qu'au premier d'entre eux
         # nous pouvons à partir de cette donnée et du nombre de résultats
         # obtenir le nombre d'URLs à traiter
-        self.number_of_urls = ceil(
-                    self.total_decisions / default_nb_decisions_in_dict)
+        self._page_size = default_nb_decisions_in_dict
+        self.number_of_urls = sum(
+            ceil(total / self._page_size) for _, total in self.shards)
         # création de la liste des Url à partir du résulat de la 1ere page
         urls_list = self._start_create_urls_list()
         # Liste qui contiendra les mauvaises réponses (429 ou 416)
         self._wrong_response_list = {}
-        # Threading = requête pour chaque url et création de Decision
-        # Solution trouvée : https://realpython.com/python-concurrency/
-        # création de l'objet thread.local
-        # self._thread_local = threading.local()
-        self._generate_decisions(urls_list)
+        # journal des longs téléchargements (reprise après interruption)
+        self.journal = None
+        if (self.connexion.resume_jobs
+                and len(urls_list) >= JobJournal.min_pages):
+            try:
+                self.journal = JobJournal(first_url, urls_list)
+            except OSError as e:
+                logger_api.warning(f'Job journal unavailable : {e}')
+        # pages restant à traiter : (index, url)
+        remaining = list(enumerate(urls_list))
+        # 1ères pages des tranches déjà téléchargées : index -> page
+        prefetched, index = {}, 0
+        for _, total, page in shards:
+            prefetched[index] = page
+            index += ceil(total / self._page_size)
+        # les décisions de la 1ère page sont créées immédiatement
+        if urls_list:
+            page = prefetched.pop(0)
+            self._record_page(0, page)
+            first_page = self._decision_creation(page)
+            if not retain:
+                self._first_page = first_page
+            remaining = remaining[1:]
+        # les suivantes sont traitées à leur tour par iter_pages
+        self._prefetched = prefetched
+        # index des 1ères pages de chaque tranche
+        self._shard_starts = set(prefetched)
+        # les résultats bruts de la 1ère page ne sont plus utiles
+        self.dict_from_response = {
+            key: value for key, value in dict_from_response.items()
+            if key != "results"}
+        self._remaining = remaining
+        # toutes les pages ont-elles été traitées ?
+        self.complete = not remaining
+        # téléchargement abandonné avant la dernière page (cf. iter_pages)
+        self.cancelled = False
+        if self.complete:
+            self._close_journal()
+        if not stream:
+            self.fetch_remaining()
+
+    def fetch_remaining(self, on_page=None):
+        """
+        Télécharge les pages restantes. La fonction 'on_page' est appelée
+        avec le dict des nouvelles décisions de chaque page.
+        """
+        for new_decisions in self.iter_pages():
+            if on_page is not None:
+                on_page(new_decisions)
+
+    def iter_pages(self):
+        """
+        Générateur : télécharge les pages restantes et retourne, page après
+        page et dans l'ordre des urls, le dict des décisions créées.
+        Le moteur de requêtage (threads ou asyncio) est celui de la connexion.
+        Les pages déjà présentes dans le journal ne sont pas téléchargées.
+        Fermer le générateur (close) annule les requêtes non commencées :
+        la réponse reste alors incomplète et 'cancelled' vaut True.
+        """
+        if self._first_page is not None:
+            first_page, self._first_page = self._first_page, None
+            yield first_page
+        remaining, self._remaining = self._remaining, []
+        prefetched, self._prefetched = self._prefetched, {}
+        done = self.journal.done if self.journal else {}
+        to_fetch = [(index, url) for index, url in remaining
+                    if index not in done and index not in prefetched]
+        urls_list = [url for _, url in to_fetch]
+        if self.connexion.engine == "asyncio":
+            results = self.connexion.async_engine.iter_fetch(urls_list,
+                                                             self.wrong_urls)
+        else:
+            results = self._iter_fetch_with_threads(urls_list)
+        fetched = zip(to_fetch, results)
+        try:
+            for index, url in remaining:
+                if index in self._shard_starts:
+                    # nouvelle tranche : aucun doublon possible avec la
+                    # précédente
+                    self._judi_ids.clear()
+                if index in prefetched:
+                    r = prefetched.pop(index)
+                    self._record_page(index, r)
+                elif index in done:
+                    r = self.journal.load(index)
+                else:
+                    _, r = next(fetched)
+                    self._record_page(index, r)
+                # si le résultat est nul à cause d'une exception,
+                # on ne traite pas
+                if r:
+                    yield self._decision_creation(r)
+        except GeneratorExit:
+            # téléchargement abandonné avant la dernière page : le journal
+            # est conservé pour une reprise
+            self.cancelled = True
+            self._close_journal(keep=True)
+            raise
+        finally:
+            results.close()
+        self.complete = True
+        self._close_journal()
         # --------------------
         # Vérification des résultats
         # --------------------
@@ -116,7 +288,41 @@ class AnswerExport(Answer):
         logger_api.debug('Nb décisions obtenues par Pycoretext :'
                          + f' {self.nb_decision}')
         logger_api.debug('Nb requêtes erronées :'
-                         + f' {len(self._wrong_response_list)}')
+                         + f' {len(self.wrong_urls)}')
+        logger_api.debug(f'Nb tranches : {len(self.shards)}'
+                         + f' / doublons : {self.nb_duplicates}')
+
+    def _record_page(self, index, page):
+        """
+        Ecrit une page correcte dans le journal (point de contrôle)
+        """
+        if self.journal is not None and page:
+            try:
+                self.journal.record(index, page)
+            except OSError as e:
+                logger_api.warning(f'Job journal write failed : {e}')
+
+    def _close_journal(self, keep=False):
+        """
+        Fin du téléchargement : le journal est supprimé, sauf si 'keep'
+        (téléchargement interrompu), pour qu'une nouvelle exécution de la
+        requête reprenne les pages déjà reçues
+        """
+        if self.journal is None:
+            return
+        if keep:
+            self.journal.close()
+        else:
+            self.journal.discard()
+        self.journal = None
+
+    def close(self):
+        """
+        Libère les ressources de la réponse (journal d'un téléchargement
+        inachevé, fichier des textes)
+        """
+        self._close_journal(keep=True)
+        super().close()
 
     def _start_simple_api_request(self, url):
         """
@@ -126,48 +332,116 @@ class AnswerExport(Answer):
         en résultat nul dans la liste de résultats du
         ThreadPoolExecutor
         """
-        try:
-            response = self.connexion.simple_api_request(url)
-        except exc.ERRORS:
-            self.wrong_urls.append(url)
-        else:
-            return response
+        # une place est prise dans le contrôleur de concurrence
+        with self.connexion.concurrency:
+            try:
+                response = self.connexion.simple_api_request(url)
+            except exc.ERRORS:
+                self.wrong_urls.append(url)
+            else:
+                return response
 
-    def _generate_decisions(self, urls_list):
+    def _iter_fetch_with_threads(self, urls_list):
         """
         Lance les workers (threads) sur la fonction principale
-        """
-        # 10 est suffisant
-        # tous les workers doivent avoir terminé
-        # avant de récupérer les résultats
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # mapping sur la fonction de requêtage
-            results = executor.map(self._start_simple_api_request,
-                                   urls_list)
-            executor.shutdown(wait=True)
-        # récupération des résultats et traitement de chaque résultat
-        for r in results:
-            # si le résultat est nul à cause d'une exception, on ne traite pas
-            if r:
-                try:
-                    r = r.json()
-                except Exception as e:
-                    print(e)
-                else:
-                    self._decision_creation(r)
+        et retourne (yield) les réponses converties en dict,
+        dans l'ordre des urls
+        """
+        # le pool est dimensionné au maximum du contrôleur de concurrence
+        # qui décide ensuite du nombre de workers réellement actifs
+        executor = ThreadPoolExecutor(
+                max_workers=self.connexion.concurrency.maximum)
+        # requêtes soumises en avance : pas plus que de workers actifs,
+        # les réponses arrivées mais non traitées (plusieurs Mo par page
+        # d'Export) restent ainsi bornées en mémoire
+        concurrency = self.connexion.concurrency
+        urls = iter(urls_list)
+        futures = deque()
+        try:
+            while True:
+                ahead = max(0, concurrency.limit - len(futures))
+                for url in islice(urls, ahead):
+                    futures.append(
+                        executor.submit(self._start_simple_api_request, url))
+                if not futures:
+                    break
+                # les réponses sont retournées dans l'ordre
+                r = futures.popleft().result()
+                page = None
+                if r:
+                    try:
+                        page = r.json()
+                    except Exception as e:
+                        logger_api.error(f'JSON decode error : {e}')
+                # la réponse brute est libérée avant le traitement de la page
+                r = None
+                yield page
+        finally:
+            # générateur abandonné : les requêtes non commencées
+            # sont annulées
+            executor.shutdown(wait=True, cancel_futures=True)
 
     def _decision_creation(self, dict_from_response: dict):
         """
-        Transforme la réponse en objet Decision
+        Transforme la réponse en objet Decision.
+        Retourne le dict des décisions créées.
         """
+        new_decisions = {}
         for item in dict_from_response['results']:
+            if self._is_duplicate(item):
+                continue
             # identification de l'identifiant du nouvel objet Decision
             self._current_id_decision += 1
             new_id = self._current_id_decision
             # création de l'objet Décision et ajout au dict des décisions
-            self.dict_decisions[new_id] = DecisionFull(item)
+            new_decisions[new_id] = DecisionFull(item)
             # mise à jour du nb de décisions
             self.nb_decision += 1
+        self._store_page(new_decisions)
+        if self.retain:
+            self._keep_page(new_decisions)
+            self._spill_texts(new_decisions.values())
+        return new_decisions
+
+    def _keep_page(self, new_decisions: dict):
+        """
+        Conserve les décisions d'une page dans la réponse
+        (dict_decisions, table et facettes)
+        """
+        self.dict_decisions.update(new_decisions)
+        self.table.append(new_decisions)
+
+    def _new_table(self):
+        """
+        Table en colonnes adaptée aux objets Decision créés
+        """
+        return DecisionTable(DecisionFull.meta_list, self.dict_decisions)
+
+    def _store_page(self, new_decisions: dict):
+        """
+        Conserve les décisions complètes dans le stock local
+        (si demandé par 'store_results')
+        """
+        store = self.connexion.store
+        if not self.store_results or store is None or not new_decisions:
+            return
+        try:
+            store.upsert([decision.to_dict()
+                          for decision in new_decisions.values()])
+        except sqlite3.Error as e:
+            logger_api.warning(f'Decision store write failed : {e}')
+
+    def _is_duplicate(self, item: dict):
+        """
+        Vrai si la décision a déjà été reçue dans la tranche en cours
+        (pages décalées par une mise à jour de la base...)
+        """
+        judi_id = item.get("id")
+        if judi_id in self._judi_ids:
+            self.nb_duplicates += 1
+            return True
+        self._judi_ids.add(judi_id)
+        return False
 
     def _start_create_urls_list(self):
         """
@@ -175,8 +449,17 @@ class AnswerExport(Answer):
         Selon le type de réponse, l'expression à rechercher pour les
         remplacements varie.
         """
-        return self._create_urls_list(self.first_url, self.number_of_urls,
-                                      "batch=")
+        return self._create_shards_urls_list("batch=")
+
+    def _create_shards_urls_list(self, str_to_search):
+        """
+        Concatène les listes d'urls de chaque tranche
+        """
+        urls_list = []
+        for first_url, total in self.shards:
+            urls_list.extend(self._create_urls_list(
+                first_url, ceil(total / self._page_size), str_to_search))
+        return urls_list
 
     def _create_urls_list(self, first_url, last_index, str_to_search):
         """
@@ -218,24 +501,39 @@ class AnswerSearch(AnswerExport):
     """
 
     def __init__(self, dict_from_response, id_answer, dict_criterias,
-                 connexion, first_url):
+                 connexion, first_url, shards=None, stream=False,
+                 retain=True, store_results=False):
         """
         Constructeur de la classe
         """
         super().__init__(dict_from_response, id_answer, dict_criterias,
-                         connexion, first_url)
+                         connexion, first_url, shards, stream, retain,
+                         store_results)
 
     def _decision_creation(self, dict_from_response: dict):
         """
-        Transforme la réponse en objet Decision
+        Transforme la réponse en objet Decision.
+        Retourne le dict des décisions créées.
         """
+        new_decisions = {}
         for item in dict_from_response['results']:
+            if self._is_duplicate(item):
+                continue
             # définition de l'identifiant du nouvel objet Decision
             self._current_id_decision += 1
             new_id = self._current_id_decision
             # création de l'objet Décision et ajout au dict des décisions
-            self.dict_decisions[new_id] = DecisionShort(item)
+            new_decisions[new_id] = DecisionShort(item)
             self.nb_decision += 1
+        if self.retain:
+            self._keep_page(new_decisions)
+        return new_decisions
+
+    def _new_table(self):
+        """
+        Table en colonnes adaptée aux objets Decision créés
+        """
+        return DecisionTable(DecisionShort.meta_list, self.dict_decisions)
 
     def _start_create_urls_list(self):
         """
@@ -243,8 +541,36 @@ class AnswerSearch(AnswerExport):
         Selon le type de réponse, l'expression à rechercher pour les
         remplacements varie.
         """
-        return self._create_urls_list(self.first_url, self.number_of_urls,
-                                      "page=")
+        return self._create_shards_urls_list("page=")
+
+
+class AnswerLocal(Answer):
+    """
+    Réponse obtenue dans le stock local des décisions, sans requête API.
+    Elle offre les attributs d'AnswerExport utilisés par la page
+    de résultats.
+    'list_meta' ne contient pas les textes : chaque décision garde une
+    référence (StoredText) qui lit le sien dans le stock à l'affichage.
+    """
+
+    def __init__(self, list_meta, id_answer, dict_criterias, connexion):
+        """
+        Constructeur de la classe
+        """
+        super().__init__({"total": len(list_meta)}, id_answer,
+                         dict_criterias, connexion)
+        self.nb_decision = len(list_meta)
+        self.dict_decisions = {}
+        for i, dict_meta in enumerate(list_meta, start=1):
+            dict_meta["text"] = StoredText(connexion.store, dict_meta["id"])
+            self.dict_decisions[i] = DecisionFull(dict_meta)
+        self.table = DecisionTable(DecisionFull.meta_list,
+                                   self.dict_decisions)
+        self.table.append(self.dict_decisions)
+        self.facets = FacetIndex(self.table)
+        self.wrong_urls = []
+        self.shards = []
+        self.complete = True
 
 
 class AnswerDecision(Answer):
@@ -260,6 +586,8 @@ class AnswerDecision(Answer):
         # toujours 1 seule décision car identifiant judilibre unique
         self.nb_decision = 1
         self.decision = DecisionFull(dict_from_response)
+        # la décision brute (texte compris) n'est pas conservée en double
+        self.dict_from_response = {"id": dict_from_response.get("id")}
 
 
 class AnswerTaxonomy(Answer):
@@ -308,6 +636,62 @@ class AnswerTaxonomy(Answer):
             self.dict_results = dict_from_response["result"]
 
 
+class AnswerTransactionalHistory(Answer):
+    """
+    Classe dérivée qui va analyser la réponse d'une requête réalisée selon le
+    mode TransactionalHistory. Les pages suivantes sont obtenues en suivant
+    le curseur "next_page" (elles ne peuvent pas être demandées en
+    parallèle).
+    """
+
+    def __init__(self, dict_from_response, id_answer, dict_criterias,
+                 connexion, first_url):
+        """
+        Fonction d'initialisation
+        """
+        super().__init__(dict_from_response, id_answer, dict_criterias,
+                         connexion)
+        self.first_url = first_url
+        # date et heure de la requête côté serveur : prochain point de départ
+        self.query_date = dict_from_response.get("query_date")
+        # liste de toutes les transactions (id, action, date)
+        self.transactions = list(dict_from_response.get("transactions", []))
+        next_page = dict_from_response.get("next_page")
+        while next_page:
+            try:
+                response = self.connexion.simple_api_request(
+                    self._next_url(next_page))
+            except exc.ERRORS as e:
+                raise e
+            page = response.json()
+            self.transactions.extend(page.get("transactions", []))
+            next_page = page.get("next_page")
+        # dernière action connue pour chaque décision
+        self.dict_actions = {}
+        for transaction in sorted(self.transactions,
+                                  key=lambda t: t.get("date") or ""):
+            self.dict_actions[transaction["id"]] = transaction["action"]
+        logger_api.debug(f'Nb transactions : {len(self.transactions)}')
+
+    def _next_url(self, next_page: str):
+        """
+        Url complète de la page suivante ("next_page" ne contient que
+        les paramètres de la requête)
+        """
+        if next_page.startswith("http"):
+            return next_page
+        base = self.first_url.split("?")[0]
+        return base + "?" + next_page.lstrip("?")
+
+    def ids_by_action(self, action: str):
+        """
+        Identifiants dont la dernière action est 'action'
+        (created, updated ou deleted)
+        """
+        return [judi_id for judi_id, last_action in self.dict_actions.items()
+                if last_action == action]
+
+
 class AnswerHealthCheck(Answer):
     """
     Classe dérivée qui va analyser la réponse d'une requête réalisée selon le
@@ -326,23 +710,97 @@ class DecisionShort:
     """
     Classe qui instancie un objet DecisionShort.
     C'est à dire une décision retournée par Search.
+    Représentation compacte : la liste des métadonnées (schéma) est
+    commune à toutes les instances et seules les valeurs sont conservées,
+    dans un tuple. Les codes très répétitifs sont internés (une seule
+    chaîne en mémoire pour toutes les décisions). Les structures
+    imbriquées (timeline, contested...), rarement lues, sont conservées
+    en JSON compact (bytes) et décodées à la lecture.
     """
+    # liste des métadonnées à récupérer
+    # certaines ont pu être écartées car inutiles pour le projet
+    short_meta_list = ("chamber", "decision_date", "ecli", "files",
+                       "id", "jurisdiction", "number",
+                       "numbers", "publication", "solution",
+                       "summary", "themes", "type", "location")
+    # schéma complet de la classe et position de chaque métadonnée
+    meta_list = short_meta_list
+    _index = {meta: i for i, meta in enumerate(meta_list)}
+    # métadonnées dont les valeurs (str ou liste de str) sont internées
+    interned_meta = frozenset(["jurisdiction", "chamber", "type",
+                               "publication", "solution", "location",
+                               "formation", "source", "decision_date",
+                               "update_date"])
+    # aucun __dict__ par instance
+    __slots__ = ("_values",)
+
     def __init__(self, dict_from_response):
         """
         Constructeur de l'instance.
         """
-        # liste des métadonnées à récupérer
-        # certaines ont pu être écartées car inutiles pour le projet
-        self.short_meta_list = ["chamber", "decision_date", "ecli", "files",
-                                "id", "jurisdiction", "number",
-                                "numbers", "publication", "solution",
-                                "summary", "themes", "type", "location"]
-        # dictionnaire des métas
-        self.dict_meta = dict()
-        for meta in self.short_meta_list:
-            self.dict_meta[meta] = dict_from_response.get(
-                                                meta,
-                                                None)
+        self._values = tuple(
+            self._compact(meta, dict_from_response.get(meta, None))
+            for meta in self.meta_list)
+
+    @classmethod
+    def _compact(cls, meta, value):
+        """
+        Interne les codes répétitifs. Une liste de codes est conservée
+        sous forme de tuple (restituée en liste par dict_meta).
+        Un dict ou une liste de dict est encodé en JSON compact : quelques
+        centaines d'octets au lieu de plusieurs objets dict.
+        """
+        if isinstance(value, dict) or (isinstance(value, list) and any(
+                isinstance(item, (dict, list)) for item in value)):
+            return json.dumps(value, ensure_ascii=False,
+                              separators=(",", ":")).encode("utf-8")
+        if meta not in cls.interned_meta:
+            return value
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, list) and all(
+                isinstance(item, str) for item in value):
+            return tuple(sys.intern(item) for item in value)
+        return value
+
+    @staticmethod
+    def _expand(value):
+        """
+        Inverse de _compact pour les listes de codes et les structures
+        imbriquées. Un texte écrit sur disque (ou resté dans le stock
+        local) est relu.
+        """
+        if isinstance(value, tuple):
+            return list(value)
+        if isinstance(value, bytes):
+            return json.loads(value)
+        if isinstance(value, (TextHandle, StoredText)):
+            return value.load()
+        return value
+
+    def get(self, meta, default=None):
+        """
+        Retourne la valeur d'une métadonnée sans construire de dict
+        """
+        index = self._index.get(meta)
+        if index is None:
+            return default
+        return self._expand(self._values[index])
+
+    @property
+    def dict_meta(self):
+        """
+        Dictionnaire des métas (construit à la demande)
+        """
+        return self.to_dict()
+
+    def to_dict(self, with_text=True):
+        """
+        Retourne le dictionnaire des métas, avec ou sans le texte
+        """
+        return {meta: self._expand(value)
+                for meta, value in zip(self.meta_list, self._values)
+                if with_text or meta != "text"}
 
 
 class DecisionFull(DecisionShort):
@@ -351,21 +809,24 @@ class DecisionFull(DecisionShort):
     C'est à dire une décision retournée par Export.
     Les attributs sont très complets. Une large sélection est faite.
     """
-
-    def __init__(self, dict_from_response):
-        """
-        Constructeur de l'instance.
-        """
-        # liste des métadonnées supplémentaires à récupérer pou DecisionFull:
-        # certaines ont pu être écartées car inutiles pour le projet
-        self.full_meta_list = [
-            "bulletin", "contested", "formation", "forward", "legacy", "nac",
-            "partial", "portalis", "rapprochements", "to_be_deleted",
-            "solution_alt", "source", "timeline", "update_date", "visa", "text"
-                         ]
-        super().__init__(dict_from_response)
-        # dictionnaire des métas
-        for meta in self.full_meta_list:
-            self.dict_meta[meta] = dict_from_response.get(
-                                                meta,
-                                                None)
+    # liste des métadonnées supplémentaires à récupérer pou DecisionFull:
+    # certaines ont pu être écartées car inutiles pour le projet
+    full_meta_list = (
+        "bulletin", "contested", "formation", "forward", "legacy", "nac",
+        "partial", "portalis", "rapprochements", "to_be_deleted",
+        "solution_alt", "source", "timeline", "update_date", "visa", "text"
+                     )
+    meta_list = DecisionShort.short_meta_list + full_meta_list
+    _index = {meta: i for i, meta in enumerate(meta_list)}
+    __slots__ = ()
+
+    def spill_text(self, store):
+        """
+        Remplace le texte par sa référence dans 'store' (BlobStore)
+        """
+        index = self._index["text"]
+        text = self._values[index]
+        if isinstance(text, str) and text:
+            values = list(self._values)
+            values[index] = store.put(text)
+            self._values = tuple(values)
@@ -0,0 +1,240 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Moteur de requêtes asynchrone (asyncio + aiohttp).
+Alternative aux threads pour récupérer les pages (batchs) d'une réponse
+Export ou Search. Il est choisi lors de la création de l'objet Connexion.
+"""
+
+import asyncio
+import json
+import queue
+import random
+import threading
+import time
+import logging
+import aiohttp
+import backoff
+from . import api_connexion as co
+
+logger_api = logging.getLogger('api.api_async')
+
+# exceptions qui, une fois les tentatives épuisées, placent l'url
+# dans la liste des requêtes erronées
+ASYNC_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    ValueError)
+
+
+class AsyncEngine:
+    """
+    Envoie simultanément les requêtes d'une liste d'URLs dans une boucle
+    asyncio. Les résultats sont retournés dans l'ordre de la liste
+    (cf. iter_fetch).
+    """
+    # timeout identique à celui de Connexion.simple_api_request
+    timeout = 8
+
+    def __init__(self, connexion):
+        """
+        Constructeur de l'instance
+        """
+        self.connexion = connexion
+
+    def iter_fetch(self, urls_list, wrong_urls: list, window=None):
+        """
+        Générateur : la boucle asyncio est exécutée dans un thread et
+        chaque réponse (dict ou None) est retournée dans l'ordre de
+        urls_list dès que les précédentes sont arrivées. Une réponse en
+        erreur vaut None et son url est ajoutée à wrong_urls.
+        Au plus 'window' réponses (par défaut 2 fois le maximum du
+        contrôleur de concurrence) sont téléchargées en avance sur le
+        consommateur : la mémoire reste bornée s'il est lent.
+        """
+        output = queue.Queue()
+        stop = threading.Event()
+        # boucle et crédits de la boucle asyncio (cf. _fetch_all)
+        flow = {"window": window or 2 * self.connexion.concurrency.maximum}
+
+        def target():
+            try:
+                asyncio.run(self._fetch_all(urls_list, wrong_urls, output,
+                                            stop, flow))
+            finally:
+                # fin de la boucle, même en cas d'erreur
+                output.put(None)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        # réponses arrivées en avance, en attente de leur tour
+        pending = {}
+        next_index = 0
+        try:
+            while True:
+                item = output.get()
+                if item is None:
+                    break
+                index, result = item
+                pending[index] = result
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+                    # réponse consommée : une requête de plus autorisée
+                    self._release(flow)
+        finally:
+            # générateur abandonné : les requêtes non commencées
+            # sont annulées
+            stop.set()
+            self._release(flow)
+            thread.join()
+
+    @staticmethod
+    def _release(flow):
+        """
+        Rend un crédit à la boucle asyncio depuis un autre thread
+        """
+        loop = flow.get("loop")
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(flow["credits"].release)
+        except RuntimeError:
+            # boucle déjà terminée
+            pass
+
+    async def _fetch_all(self, urls_list, wrong_urls, output, stop, flow):
+        """
+        Crée la session aiohttp et lance une tâche par url.
+        Chaque réponse est placée dans 'output' (queue.Queue) avec son
+        index dès son arrivée.
+        Une fois 'stop' (threading.Event) activé, les tâches restantes
+        n'envoient plus de requête.
+        Chaque requête consomme un crédit de 'flow', rendu par le
+        consommateur des réponses (cf. iter_fetch).
+        """
+        credits = asyncio.Semaphore(flow["window"])
+        flow["credits"] = credits
+        flow["loop"] = asyncio.get_running_loop()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(headers=self.connexion.headers,
+                                         timeout=timeout) as session:
+
+            async def fetch_indexed(index, url):
+                # les tâches attendent dans l'ordre des urls
+                await credits.acquire()
+                if stop.is_set():
+                    # arrêt : le crédit passe à la tâche suivante
+                    credits.release()
+                    return
+                result = await self._fetch(session, url, wrong_urls)
+                output.put((index, result))
+
+            await asyncio.gather(*(fetch_indexed(index, url)
+                                   for index, url in enumerate(urls_list)))
+
+    async def _fetch(self, session, url, wrong_urls):
+        """
+        Exécute la requête. Les abandons de backoff ne déclenchent
+        qu'un ajout dans wrong_urls.
+        Le nombre de requêtes en vol est celui du contrôleur de
+        concurrence de la connexion.
+        """
+        cache = self.connexion.cache
+        if cache is not None:
+            cached = cache.get(url)
+            if cached is not None:
+                return cached.json()
+        concurrency = self.connexion.concurrency
+        await concurrency.acquire_async()
+        try:
+            text = await self.simple_api_request(session, url)
+            if cache is not None:
+                cache.put(url, text)
+            return json.loads(text)
+        except ASYNC_ERRORS:
+            wrong_urls.append(url)
+        finally:
+            concurrency.release()
+
+    @staticmethod
+    def filter_wrong_codes(e):
+        """
+        Equivalent de Connexion.filter_wrong_codes pour aiohttp
+        """
+        if isinstance(e, aiohttp.ClientResponseError):
+            if e.status >= 500 or e.status in [429, 416]:
+                co.Connexion.requests_number += 1
+                return False
+            else:
+                return True
+        co.Connexion.requests_number += 1
+        return False
+
+    @staticmethod
+    def _backoff_on_success(details):
+        """
+        Log info in case of success
+        """
+        logger_api.info("Success after {tries} tries"
+                        " ==> URL: {args[2]}".format(**details))
+        co.Connexion.requests_number += 1
+
+    @backoff.on_exception(backoff.expo,
+                          (asyncio.TimeoutError,
+                           aiohttp.ClientResponseError),
+                          max_tries=5,
+                          giveup=filter_wrong_codes,
+                          on_success=_backoff_on_success,
+                          on_backoff=co.Connexion._backoff_on_backoff,
+                          on_giveup=co.Connexion._backoff_on_giveup,
+                          logger=None)
+    async def simple_api_request(self, session, url: str):
+        """
+        Envoyer une requête à l'API et retourner le contenu (str).
+        Même politique limiter/backoff que la version synchrone :
+        le seau à jetons de la connexion est partagé.
+        """
+        await self.connexion.limiter.acquire_async()
+        start = time.monotonic()
+        try:
+            response = await session.get(url)
+        except asyncio.TimeoutError:
+            self.connexion.concurrency.on_error()
+            raise
+        async with response:
+            status = response.status
+            # Génération aléatoire d'erreurs dans le mode de test
+            if self.connexion.test_mode:
+                random_test = random.randrange(0, 15)
+                if random_test == 0:
+                    raise asyncio.TimeoutError('timeout')
+                elif random_test == 1:
+                    # too many requests (quota dépassé côté serveur)
+                    status = 429
+                elif random_test == 2:
+                    # server unavailable
+                    status = 503
+                elif random_test == 3:
+                    # Not found
+                    status = 404
+            self.connexion.report_status(status, time.monotonic() - start)
+            if status >= 400:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=status, message=response.reason or "")
+            return await response.text()
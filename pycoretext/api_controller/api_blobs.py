@@ -0,0 +1,161 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Stockage sur disque des textes intégraux des décisions.
+Un texte (souvent 20 à 100 Ko) n'est affiché qu'à la demande : il est
+écrit compressé dans un fichier et la décision ne conserve qu'une
+référence (position, longueur) qui le relit au premier accès.
+"""
+
+import atexit
+import os
+import threading
+import time
+import uuid
+import zlib
+import logging
+from .api_paths import get_data_dir
+
+logger_api = logging.getLogger('api.api_blobs')
+
+
+class TextHandle:
+    """
+    Référence vers un texte du BlobStore
+    """
+    __slots__ = ("store", "offset", "length")
+
+    def __init__(self, store, offset: int, length: int):
+        """
+        Constructeur de l'instance
+        """
+        self.store = store
+        self.offset = offset
+        self.length = length
+
+    def load(self):
+        """
+        Lit et retourne le texte
+        """
+        return self.store.read(self.offset, self.length)
+
+
+class BlobStore:
+    """
+    Fichier d'ajout (append) de textes compressés, propre à une réponse.
+    Il est supprimé par close(remove=True) ou à la sortie de l'application.
+    """
+    # niveau de compression zlib (rapide, les textes sont très redondants)
+    level = 1
+    # un fichier plus ancien (secondes) est un reste d'une session arrêtée
+    max_age = 24 * 3600
+    # stocks ouverts, supprimés à la sortie de l'application
+    _open_stores = set()
+
+    def __init__(self, path=None):
+        """
+        Constructeur de l'instance
+        """
+        if path is None:
+            self._purge_old_files()
+            path = get_data_dir("blobs") / f"{uuid.uuid4().hex}.bin"
+        self.path = path
+        # écriture et lecture partagent la position du fichier
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a+b")
+        self._size = self._file.seek(0, os.SEEK_END)
+        BlobStore._open_stores.add(self)
+
+    def put(self, text: str):
+        """
+        Ecrit le texte et retourne sa référence (TextHandle)
+        """
+        data = zlib.compress(text.encode("utf-8"), self.level)
+        with self._lock:
+            offset = self._size
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            self._size += len(data)
+        return TextHandle(self, offset, len(data))
+
+    def read(self, offset: int, length: int):
+        """
+        Relit un texte écrit par put()
+        """
+        with self._lock:
+            self._file.flush()
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return zlib.decompress(data).decode("utf-8")
+
+    @property
+    def size(self):
+        """
+        Taille du fichier en octets
+        """
+        return self._size
+
+    def close(self, remove=False):
+        """
+        Ferme le fichier et le supprime si 'remove'
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        BlobStore._open_stores.discard(self)
+        if remove:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger_api.warning(f'Blob file not removed : {e}')
+
+    def __getstate__(self):
+        """
+        Seul le chemin est sérialisé (pickle) : le fichier est rouvert
+        """
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """
+        Réouverture du fichier après désérialisation
+        """
+        self.__init__(state["path"])
+
+    def _purge_old_files(self):
+        """
+        Supprime les fichiers laissés par une session interrompue
+        """
+        limit = time.time() - self.max_age
+        for path in get_data_dir("blobs").glob("*.bin"):
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+            except OSError:
+                pass
+
+    @classmethod
+    def close_all(cls):
+        """
+        Ferme et supprime tous les stocks ouverts
+        """
+        for store in list(cls._open_stores):
+            store.close(remove=True)
+
+
+atexit.register(BlobStore.close_all)
@@ -0,0 +1,209 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Cache local (SQLite) des réponses de l'API Judilibre.
+La clé est l'URL canonique (paramètres triés). La durée de vie dépend
+de la commande appelée (taxonomy, stats, export...).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from .api_paths import get_data_dir
+
+logger_api = logging.getLogger('api.api_cache')
+
+
+class CachedResponse:
+    """
+    Réponse lue dans le cache.
+    Elle offre les attributs de requests.Response utilisés par l'application.
+    """
+
+    def __init__(self, url, text):
+        """
+        Constructeur de l'instance
+        """
+        self.url = url
+        self.text = text
+        self.status_code = 200
+        self.from_cache = True
+
+    def json(self):
+        """
+        Retourne le contenu sous forme de dict
+        """
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        """
+        Une réponse en cache est toujours correcte
+        """
+        pass
+
+
+class ResponseCache:
+    """
+    Cache des réponses, borné en taille.
+    Les entrées les moins récemment utilisées sont supprimées en premier.
+    """
+    # durée de vie en secondes selon la commande, None = jamais en cache
+    ttls = {
+        "/taxonomy": 7 * 24 * 3600,
+        "/stats": 15 * 60,
+        "/decision": 24 * 3600,
+        "/export": 3600,
+        "/search": 3600,
+        "/healthcheck": None,
+    }
+    # commandes mises en cache seulement si l'utilisateur le demande
+    opt_in = ["/export", "/search"]
+
+    def __init__(self, path=None, max_bytes=200 * 1024 ** 2,
+                 cache_queries=False):
+        """
+        Constructeur de l'instance
+        """
+        self.path = path or get_data_dir() / "http_cache.sqlite"
+        self.max_bytes = max_bytes
+        # active le cache pour les commandes opt_in
+        self.cache_queries = cache_queries
+        # compteurs
+        self.hits = 0
+        self.misses = 0
+        # une seule connexion SQLite partagée par les workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body TEXT, size INTEGER, "
+            "created REAL, last_access REAL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access "
+            "ON responses(last_access)")
+        self._total_size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def canonical_url(url: str):
+        """
+        Retourne l'URL avec des paramètres triés :
+        deux URLs équivalentes partagent la même clé
+        """
+        parts = urlsplit(url)
+        query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                           parts.path, urlencode(query), ""))
+
+    def ttl_for(self, url: str):
+        """
+        Durée de vie applicable à l'URL (None si pas de cache)
+        """
+        path = urlsplit(url).path
+        for command, ttl in self.ttls.items():
+            if path.endswith(command):
+                if command in self.opt_in and not self.cache_queries:
+                    return None
+                return ttl
+        return None
+
+    def get(self, url: str):
+        """
+        Retourne un objet CachedResponse ou None si absent ou expiré
+        """
+        ttl = self.ttl_for(url)
+        if ttl is None:
+            return None
+        key = self.canonical_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, created FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None or row[1] + ttl < now:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                (now, key))
+            self.hits += 1
+        logger_api.debug(f'Cache hit : {url}')
+        return CachedResponse(url, row[0])
+
+    def put(self, url: str, text: str):
+        """
+        Enregistre le contenu d'une réponse
+        """
+        if self.ttl_for(url) is None:
+            return
+        key = self.canonical_url(url)
+        size = len(text.encode("utf-8"))
+        # une réponse plus grande que le cache entier est ignorée
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now))
+            self._total_size += size - (old[0] if old else 0)
+            if self._total_size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées jusqu'à
+        redescendre sous 90% de la taille maximale
+        (le verrou est déjà pris par l'appelant)
+        """
+        target = self.max_bytes * 0.9
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access")
+        to_delete = []
+        for key, size in rows:
+            if self._total_size <= target:
+                break
+            to_delete.append((key,))
+            self._total_size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        logger_api.debug(f'Cache eviction : {len(to_delete)} entries')
+
+    def clear(self):
+        """
+        Vide le cache
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._total_size = 0
+
+    @property
+    def stats(self):
+        """
+        Compteurs du cache
+        """
+        with self._lock:
+            entries = self._db.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": entries, "size": self._total_size}
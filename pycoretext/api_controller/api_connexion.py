@@ -25,10 +25,22 @@ request et génération de l'objet Answer approprié.
 import requests
 from pycoretext import exceptions as exc
 from . import api_answers as ans, api_url
-import ratelimit
+from .api_limiter import TokenBucket, ConcurrencyController
+from .api_cache import ResponseCache
+from .api_taxonomy import TaxonomyStore
+from .api_stats import StatsEngine
+from .api_planner import QueryPlanner
+from .api_store import DecisionStore
+from .api_jobs import JobJournal
+from .api_registry import AnswerRegistry
+from .api_warmup import ENDPOINTS
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import sqlite3
 import backoff
 import logging
 import random
+import time
 
 
 logger_api = logging.getLogger('api.api_connexion')
@@ -43,33 +55,121 @@ class Connexion:
     requests_number = 0
     # Compte les requêtes qui ont échoué (peu importe la raison)
     abandoned_requests_number = 0
+    # Quota PISTE : 20 appels par seconde, on reste à 19
+    rate_limit_calls = 19
+    rate_limit_period = 1
+    # codes HTTP signalant une surcharge de l'API (cf. filter_wrong_codes)
+    # ils réduisent le nombre de workers simultanés
+    overload_codes = [429, 503]
 
-    # constructeur avec 3 paramètres facultatifs : la clé d'auth.,
-    # l'env et le mode
-    def __init__(self, key_user: str, env='sandbox', test_mode=False):
+    # constructeur avec des paramètres facultatifs : la clé d'auth.,
+    # l'env, le mode, le moteur de requêtage des pages et le cache local
+    # (cache_queries=True pour mettre aussi en cache Export et Search)
+    # auto_shard : découpage des requêtes de plus de 10 000 résultats
+    # resume_jobs : reprise des longs téléchargements interrompus
+    # store : conservation locale des décisions Export (recherche hors ligne)
+    # spill_texts : textes intégraux écrits sur disque, relus à la demande
+    # answers_max_bytes : budget mémoire des réponses dont l'onglet est fermé
+    # session : session HTTP déjà ouverte (cf. api_warmup)
+    def __init__(self, key_user: str, env='sandbox', test_mode=False,
+                 engine='thread', cache=True, cache_queries=False,
+                 auto_shard=True, resume_jobs=True, store=True,
+                 spill_texts=True, answers_max_bytes=512 * 1024 ** 2,
+                 session=None):
         self.key_user = key_user
+        self.env = env
         # le endpoint est différent selon l'env. sélectionné en paramètre
-        if env == 'production':
-            self.endpoint = (
-                'https://api.piste.gouv.fr/cassation/judilibre/v1.0'
-            )
-        elif env == 'sandbox':
-            self.endpoint = (
-                'https://sandbox-api.piste.gouv.fr/cassation/judilibre/v1.0'
-            )
+        if env in ENDPOINTS:
+            self.endpoint = ENDPOINTS[env]
         # le header est nécessaire lors de la requête request.get (r_get)
         self.headers = {'accept': 'application/json',
                         'KeyId': key_user}
         # le mode test est-il activé
         self.test_mode = test_mode
-        # créer la session HTTP
-        self.session = requests.Session()
+        # créer la session HTTP (ou reprendre celle déjà ouverte)
+        self.session = session or requests.Session()
         self.session.headers = {'accept': 'application/json',
                                 'KeyId': key_user}
+        # moteur utilisé pour les pages Export et Search :
+        # 'thread' (ThreadPoolExecutor) ou 'asyncio' (aiohttp)
+        if engine not in ['thread', 'asyncio']:
+            raise ValueError(f"Moteur inconnu : {engine}")
+        self.engine = engine
+        self._async_engine = None
+        # seau à jetons partagé par tous les workers de cette connexion
+        # capacité de 1 : jamais plus de 20 appels sur une seconde glissante
+        self.limiter = TokenBucket(
+            rate=self.rate_limit_calls / self.rate_limit_period,
+            capacity=1)
+        # nombre de workers simultanés ajusté selon la santé de l'API
+        # (10 au départ, comme l'ancienne valeur fixe)
+        self.concurrency = ConcurrencyController(initial=10, maximum=20)
+        # cache local des réponses (taxonomy, stats...)
+        self.cache = None
+        if cache:
+            try:
+                self.cache = ResponseCache(cache_queries=cache_queries)
+            except (sqlite3.Error, OSError) as e:
+                logger_api.warning(f'Cache unavailable : {e}')
+        # découpage des requêtes dépassant la limite de résultats de l'API
+        self.auto_shard = auto_shard
+        self.planner = QueryPlanner(self)
+        # journalisation des longs téléchargements (cf. api_jobs)
+        self.resume_jobs = resume_jobs
+        if resume_jobs:
+            # journaux des exécutions abandonnées
+            try:
+                JobJournal.purge()
+            except OSError as e:
+                logger_api.warning(f'Job journals purge failed : {e}')
+        # stock local des décisions (SQLite + FTS5)
+        self.store = None
+        if store:
+            try:
+                self.store = DecisionStore(env)
+            except (sqlite3.Error, OSError) as e:
+                logger_api.warning(f'Decision store unavailable : {e}')
+        # textes intégraux hors mémoire (cf. api_blobs)
+        self.spill_texts = spill_texts
         # 1/ nombre d'objets Answer créés
         # 2/ idendifiant du dernier objet Answer généré
         # 3/ collection des objets Answer sous forme de dict.
-        self.nb_answers, self.current_id_answer, self.dict_answers = 0, 0, {}
+        # la collection est bornée en mémoire (cf. api_registry)
+        self.nb_answers, self.current_id_answer = 0, 0
+        self.dict_answers = AnswerRegistry(self, max_bytes=answers_max_bytes)
+        # listes de la taxonomy (formulaire), créées à la première utilisation
+        self._taxonomy = None
+        # statistiques de l'InfoPopup, conservées entre deux ouvertures
+        self._stats = None
+
+    @property
+    def async_engine(self):
+        """
+        Moteur asyncio créé à la première utilisation.
+        aiohttp n'est importé que si ce moteur est choisi.
+        """
+        if self._async_engine is None:
+            from .api_async import AsyncEngine
+            self._async_engine = AsyncEngine(self)
+        return self._async_engine
+
+    @property
+    def taxonomy(self):
+        """
+        Stock des listes de la taxonomy propre à cette connexion
+        """
+        if self._taxonomy is None:
+            self._taxonomy = TaxonomyStore(self)
+        return self._taxonomy
+
+    @property
+    def stats(self):
+        """
+        Moteur des statistiques Judilibre propre à cette connexion
+        """
+        if self._stats is None:
+            self._stats = StatsEngine(self)
+        return self._stats
 
     @staticmethod
     def filter_wrong_codes(e):
@@ -81,8 +181,8 @@ class Connexion:
          - Erreurs serveur (>=500) = répétition (False)
          - Erreurs client spécifiques (429, 416) = répétition (False)
          - Autres erreurs clients = Give up
-         Si ratelimit.RateLimitException:
-          Ne compte pas la requête puisqu'elle n'est pas arrivée à l'API
+        La limitation de débit n'apparaît jamais ici : le TokenBucket
+        fait attendre l'appelant sans lever d'exception.
         """
         if isinstance(e, requests.exceptions.HTTPError):
             if e.response.status_code >= 500:
@@ -93,8 +193,6 @@ class Connexion:
                 return False
             else:
                 return True
-        elif isinstance(e, ratelimit.RateLimitException):
-            return False
         Connexion.requests_number += 1
         return False
 
@@ -127,7 +225,6 @@ class Connexion:
 
     @backoff.on_exception(backoff.expo,
                           (requests.exceptions.Timeout,
-                           ratelimit.RateLimitException,
                            requests.exceptions.HTTPError),
                           max_tries=5,
                           giveup=filter_wrong_codes,
@@ -135,26 +232,33 @@ class Connexion:
                           on_backoff=_backoff_on_backoff,
                           on_giveup=_backoff_on_giveup,
                           logger=None)
-    @ratelimit.limits(calls=19, period=1)
-    def simple_api_request(self, url: str):
+    def _api_request(self, url: str):
         """
         Envoyer une requête à l'API
 
-        ratelimit: 19 calls par seconde
+        limiter: 19 calls par seconde, l'appel attend son jeton
+         sans lever d'exception => aucune tentative backoff consommée
         backoff:
-         Si exception timeout, ratelimit ou HTTPError selon le code
+         Si exception timeout ou HTTPError selon le code
          Alors répétion de la fonction, pas plus de 5 fois
          avant d'abandonner.
          Aucun logger propre à backoff
         """
-        response = self.session.get(url, timeout=8)
+        self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=8)
+        except requests.exceptions.Timeout:
+            self.concurrency.on_error()
+            raise
         # Génération aléatoire d'erreurs dans le mode de test
         if self.test_mode:
             random_test = random.randrange(0, 15)
             if random_test == 0:
                 raise requests.exceptions.Timeout('timeout')
             elif random_test == 1:
-                raise ratelimit.RateLimitException('oops', 1)
+                # too many requests (quota dépassé côté serveur)
+                response.status_code = 429
             elif random_test == 2:
                 # server unavailable
                 response.status_code = 503
@@ -163,10 +267,43 @@ class Connexion:
                 response.status_code = 404
             else:
                 pass
+        self.report_status(response.status_code, time.monotonic() - start)
         # If wrong status a HTTPError is raised
         response.raise_for_status()
         return response
 
+    def simple_api_request(self, url: str, use_cache=True):
+        """
+        Retourne la réponse du cache local si elle existe et n'a pas
+        expiré. Sinon envoie la requête et enregistre la réponse.
+        Avec 'use_cache' à False, la requête est toujours envoyée
+        (revalidation) et sa réponse remplace celle du cache.
+        """
+        if self.cache is not None and use_cache:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
+        response = self._api_request(url)
+        if self.cache is not None:
+            self.cache.put(url, response.text)
+        return response
+
+    def report_status(self, status_code: int, latency: float):
+        """
+        Transmet le résultat d'une requête au contrôleur de concurrence
+         - 429 ou 503 = surcharge, diminution du nb de workers
+         - autres erreurs serveur = pas d'augmentation
+         - sinon la latence est prise en compte
+        """
+        if status_code in self.overload_codes:
+            self.concurrency.on_overload()
+            logger_api.warning(f"Overload ({status_code}) => "
+                               f"{self.concurrency.limit} workers")
+        elif status_code >= 500:
+            self.concurrency.on_error()
+        else:
+            self.concurrency.on_success(latency)
+
     def test_connexion(self):
         """
         Test simple de connexion:
@@ -184,7 +321,9 @@ class Connexion:
         finally:
             return is_request_ok
 
-    def send_request(self, url_object: api_url.UrlBase, internal=False):
+    def send_request(self, url_object: api_url.UrlBase, internal=False,
+                     register=True, stream=False, retain=True,
+                     use_cache=True, store_results=False):
         """
         Attend un objet URL (cf. module api_answers). A partir de l'url de
         celui-ci, une requête est envoyée. Si la réponse est correcte et
@@ -192,6 +331,16 @@ class Connexion:
         Le paramètre 'internal' permet de savoir si c'est une requête interne,
         c'est à dire nécessaire au fonctionnement de l'appli  ou à  l'inverse,
         une requête utilisateur.
+        Le paramètre 'register' permet de ne pas ajouter l'objet Answer
+        au dict_answers. L'objet Answer est retourné dans tous les cas.
+        Avec 'stream', un objet AnswerExport ou AnswerSearch ne contient
+        que la 1ère page : les suivantes sont obtenues par fetch_remaining().
+        Avec 'retain' à False, ses décisions ne sont pas conservées
+        (cf. iter_decisions).
+        Avec 'use_cache' à False, la 1ère requête ignore le cache local
+        (cf. simple_api_request).
+        Avec 'store_results', les décisions d'un Export sont ajoutées au
+        stock local (cf. search_local).
         """
         # on construit l'url complète (endpoint+partie variable de l'Objet URL)
         # la méthode get_final_url peut lever des exceptions car elle appelle
@@ -203,29 +352,145 @@ class Connexion:
         else:
             # si url est correcte, tentative de connexion
             try:
-                response = self.simple_api_request(full_url)
+                response = self.simple_api_request(full_url, use_cache)
             # la première requête, si elle est en erreur
             # génère automatiquement une exception.
             except exc.ERRORS as e:
                 raise e
             else:
+                # requête trop large : découpage en tranches de dates
+                shards = None
+                if (self.auto_shard and url_object.integral
+                        and url_object.url_type in ["export", "search"]):
+                    try:
+                        shards = self.planner.plan(url_object, response)
+                    except exc.ERRORS as e:
+                        raise e
                 # tentative de création de l'objet Anwser
                 try:
-                    self._create_answer(response,
-                                        url_object.url_type,
-                                        url_object.dict_criterias,
-                                        full_url, internal,
-                                        url_object.integral)
+                    return self._create_answer(response,
+                                               url_object.url_type,
+                                               url_object.dict_criterias,
+                                               full_url, internal,
+                                               url_object.integral,
+                                               register, shards, stream,
+                                               retain, store_results)
                 except exc.NoResult as e1:
                     raise e1
 
+    def iter_decisions(self, url_object: api_url.UrlBase, on_answer=None):
+        """
+        Générateur : décisions d'une requête Export (DecisionFull) ou
+        Search (DecisionShort), page après page.
+        Aucune décision n'est conservée (ni dans dict_answers, ni dans
+        l'objet Answer) : la mémoire reste bornée à quelques pages, quel
+        que soit le nombre de résultats.
+        'on_answer' est appelée avec l'objet Answer dès la 1ère page reçue
+        (total_decisions, puis wrong_urls une fois le générateur épuisé).
+        Sans résultat, le générateur est vide.
+        """
+        for page in self._iter_decision_pages(url_object, on_answer):
+            yield from page.values()
+
+    async def aiter_decisions(self, url_object: api_url.UrlBase,
+                              on_answer=None):
+        """
+        Equivalent asynchrone de iter_decisions (async for).
+        Les pages sont obtenues dans un thread dédié : la boucle asyncio
+        de l'appelant n'est jamais bloquée. 'on_answer' est appelée dans
+        ce thread.
+        """
+        pages = self._iter_decision_pages(url_object, on_answer)
+        # un seul worker : le générateur n'est jamais utilisé par deux
+        # threads à la fois (sa fermeture attend la page en cours)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            while True:
+                page = await asyncio.wrap_future(
+                    executor.submit(next, pages, None))
+                if page is None:
+                    break
+                for decision in page.values():
+                    yield decision
+        finally:
+            executor.submit(pages.close)
+            executor.shutdown(wait=False)
+
+    def _iter_decision_pages(self, url_object: api_url.UrlBase,
+                             on_answer=None):
+        """
+        Générateur : dict des décisions de chaque page de la requête
+        """
+        if url_object.url_type not in ["export", "search"]:
+            raise exc.WrongCriteria(
+                message="Seules les requêtes Export et Search sont itérables")
+        # toutes les pages sont nécessaires
+        url_object = url_object.copy()
+        url_object.integral = True
+        try:
+            answer = self.send_request(url_object, internal=True,
+                                       register=False, stream=True,
+                                       retain=False)
+        except exc.NoResult:
+            return
+        if on_answer is not None:
+            on_answer(answer)
+        try:
+            yield from answer.iter_pages()
+        finally:
+            answer.close()
+
+    def search_local(self, url_object: api_url.UrlBase):
+        """
+        Equivalent de send_request sur le stock local des décisions :
+        aucune requête n'est envoyée à l'API. L'objet AnswerLocal créé
+        est ajouté au dict_answers et retourné. Seules les métadonnées
+        sont chargées (au plus DecisionStore.max_results décisions) : les
+        textes sont lus dans le stock à l'ouverture d'une décision.
+        """
+        if self.store is None:
+            raise exc.NoResult("Le corpus local n'est pas disponible.")
+        if url_object.url_type not in ["export", "search", "decision"]:
+            raise exc.WrongCriteria(
+                message="Recherche impossible dans le corpus local")
+        try:
+            url_object.get_final_url()
+        except exc.WrongCriteria as e:
+            raise e
+        list_meta = self.store.search_local(url_object.dict_criterias)
+        if not list_meta:
+            raise exc.NoResult()
+        if len(list_meta) >= self.store.max_results:
+            logger_api.info(f'Local search truncated : {len(list_meta)} '
+                            'decisions')
+        id_answer = self._create_id_answer(internal=False)
+        answer = ans.AnswerLocal(list_meta, id_answer,
+                                 url_object.dict_criterias, self)
+        self.dict_answers[id_answer] = answer
+        self.nb_answers += 1
+        return answer
+
+    def get_answer(self, url_object: api_url.UrlBase, use_cache=True):
+        """
+        Requête interne dont l'objet Answer est seulement retourné.
+        Il n'écrase pas dict_answers["internal"] : plusieurs requêtes
+        de ce type peuvent donc être exécutées en parallèle.
+        """
+        return self.send_request(url_object, internal=True, register=False,
+                                 use_cache=use_cache)
+
     def _create_answer(
             self, response: requests.Response,
             url_type: str,
             dict_criterias: dict,
             first_url: str,
             internal: bool,
-            integral=None):
+            integral=None,
+            register=True,
+            shards=None,
+            stream=False,
+            retain=True,
+            store_results=False):
         """
         L'objet requests.Response obtenu nous permet de créer un objet
         personnalisé de type Answer (et dérivés)
@@ -251,7 +516,9 @@ class Connexion:
                                               dict_criterias,
                                               self,
                                               # info pour nouvelle requête
-                                              first_url)
+                                              first_url,
+                                              shards, stream, retain,
+                                              store_results)
                 # sinon un simple objet Answer suffit
                 else:
                     answer = ans.Answer(dict_from_response,
@@ -270,7 +537,9 @@ class Connexion:
                                               id_answer,
                                               dict_criterias,
                                               self,
-                                              first_url)
+                                              first_url,
+                                              shards, stream, retain,
+                                              store_results)
                 else:
                     answer = ans.Answer(dict_from_response,
                                         id_answer,
@@ -290,18 +559,26 @@ class Connexion:
             answer = ans.AnswerHealthCheck(dict_from_response,
                                            id_answer,
                                            dict_criterias)
+        elif url_type == "transactionalhistory":
+            id_answer = self._create_id_answer(internal)
+            answer = ans.AnswerTransactionalHistory(dict_from_response,
+                                                    id_answer,
+                                                    dict_criterias,
+                                                    self,
+                                                    first_url)
         elif url_type == "stats":
             id_answer = self._create_id_answer(internal)
             answer = ans.Answer(dict_from_response,
                                 id_answer,
                                 dict_criterias)
-        if is_answer_created:
+        if is_answer_created and register:
             # si un objet Answer a été créé, on l'ajoute dans le dict_answers
             # avec son id
             self.dict_answers[id_answer] = answer
             # incrémenter le nombre de réponses obtenues
             if not internal:
                 self.nb_answers += 1
+        return answer
 
     def _create_id_answer(self, internal):
         """
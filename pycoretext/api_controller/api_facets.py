@@ -0,0 +1,65 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Facettes (chambre, publication, solution...) des décisions d'une
+réponse : comptages et filtres sans nouvelle requête, calculés sur les
+colonnes catégorielles de la table de la réponse (cf. api_table).
+"""
+
+# facettes proposées et libellés affichés
+FACETS = {
+    "jurisdiction": "Juridiction",
+    "chamber": "Chambre",
+    "type": "Nature",
+    "publication": "Publication",
+    "solution": "Solution",
+}
+
+
+class FacetIndex:
+    """
+    Facettes d'une table (DecisionTable), complétée au fil des pages
+    reçues. Une sélection est un dict {facette: ensemble de valeurs} :
+    les valeurs d'une même facette sont combinées par OU, les facettes
+    entre elles par ET.
+    """
+
+    def __init__(self, table, fields=tuple(FACETS)):
+        """
+        Constructeur de l'instance
+        """
+        self.table = table
+        self.fields = tuple(field for field in fields
+                            if field in table.columns)
+
+    def __len__(self):
+        return len(self.table)
+
+    def filter(self, selection: dict, keys=None):
+        """
+        Identifiants triés des décisions correspondant à la sélection.
+        'keys' : limite la recherche à ces identifiants (nouvelle page)
+        """
+        return self.table.filter_keys(selection, keys=keys)
+
+    def counts(self, field, selection=None):
+        """
+        Nombre de décisions par valeur de la facette, en tenant compte
+        de la sélection sur les autres facettes. Trié par nombre
+        décroissant.
+        """
+        return self.table.counts(field, selection)
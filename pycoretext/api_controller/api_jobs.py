@@ -0,0 +1,221 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Journal des téléchargements longs (Export ou Search de nombreuses pages).
+Chaque page reçue est écrite sur disque : après une coupure réseau ou un
+arrêt de l'application, la même requête reprend au dernier point de
+contrôle et seules les pages manquantes sont téléchargées.
+"""
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+import logging
+from .api_paths import get_data_dir
+from .api_cache import ResponseCache
+
+logger_api = logging.getLogger('api.api_jobs')
+
+
+class JobJournal:
+    """
+    Journal d'une requête, rangé dans ~/.pycoretext/jobs/<clé>/ :
+    - job.json : url de la requête et liste complète des urls des pages
+    - pages.jsonl : une ligne "index<TAB>page json" par page reçue
+    Si la même requête est déjà en cours (deux onglets), le journal est
+    rangé dans <clé>-2/, <clé>-3/... : un journal n'a qu'un seul écrivain.
+    """
+    # nombre de pages à partir duquel une requête est journalisée
+    min_pages = 20
+    # un journal plus ancien (secondes) est ignoré : les données ont changé
+    max_age = 7 * 24 * 3600
+    # nombre de journaux conservés au démarrage (cf. purge)
+    max_count = 20
+    # clés des journaux ouverts par l'application
+    _active = set()
+    _active_lock = threading.Lock()
+
+    def __init__(self, first_url: str, urls_list: list):
+        """
+        Constructeur de l'instance : ouvre le journal existant s'il
+        correspond à la même liste d'urls, sinon en crée un nouveau
+        """
+        self.first_url = first_url
+        self.urls_list = list(urls_list)
+        self.key = self._reserve_key(self.job_key(first_url))
+        self.path = get_data_dir("jobs", self.key)
+        # index de page : position de la ligne dans pages.jsonl
+        self.done = {}
+        if not self._load():
+            self._reset()
+        # nombre de pages retrouvées sur disque
+        self.resumed = len(self.done)
+        if self.resumed:
+            logger_api.info(f'Job {self.key} resumed : {self.resumed}'
+                            + f'/{len(self.urls_list)} pages')
+        try:
+            self._pages = open(self.path / "pages.jsonl", "a+b")
+        except OSError:
+            self._release_key()
+            raise
+
+    @staticmethod
+    def job_key(first_url: str):
+        """
+        Clé du journal : empreinte de l'url canonique
+        """
+        canonical = ResponseCache.canonical_url(first_url)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _reserve_key(cls, key: str):
+        """
+        Réserve la clé du journal, suffixée si un journal de la même
+        requête est déjà ouvert
+        """
+        with cls._active_lock:
+            reserved, suffix = key, 1
+            while reserved in cls._active:
+                suffix += 1
+                reserved = f"{key}-{suffix}"
+            cls._active.add(reserved)
+        return reserved
+
+    @classmethod
+    def purge(cls, max_age=None, max_count=None):
+        """
+        Supprime les journaux des téléchargements abandonnés : ceux plus
+        anciens que 'max_age' (secondes) et, au-delà des 'max_count' plus
+        récents, tous les autres (dossiers suffixés -2, -3... compris).
+        Les journaux ouverts ne sont pas concernés.
+        Retourne le nombre de journaux supprimés.
+        """
+        max_age = cls.max_age if max_age is None else max_age
+        max_count = cls.max_count if max_count is None else max_count
+        with cls._active_lock:
+            active = set(cls._active)
+        jobs = []
+        for path in get_data_dir("jobs").iterdir():
+            if not path.is_dir() or path.name in active:
+                continue
+            try:
+                # dernière page écrite
+                modified = max(entry.stat().st_mtime
+                               for entry in (path, *path.iterdir()))
+            except OSError:
+                continue
+            jobs.append((modified, path))
+        # du plus récent au plus ancien
+        jobs.sort(reverse=True)
+        now = time.time()
+        purged = 0
+        for rank, (modified, path) in enumerate(jobs):
+            if rank >= max_count or now - modified > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+                purged += 1
+        if purged:
+            logger_api.info(f'{purged} job journals purged')
+        return purged
+
+    def _release_key(self):
+        """
+        Libère la clé réservée par le journal
+        """
+        with JobJournal._active_lock:
+            JobJournal._active.discard(self.key)
+
+    def _load(self):
+        """
+        Lit un journal existant. Retourne False s'il est absent, périmé
+        ou s'il concerne une autre liste d'urls.
+        """
+        try:
+            with open(self.path / "job.json", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (job.get("urls") != self.urls_list
+                or time.time() - job.get("created", 0) > self.max_age):
+            return False
+        try:
+            with open(self.path / "pages.jsonl", "r+b") as f:
+                offset = 0
+                for line in f:
+                    # une dernière ligne incomplète (arrêt brutal)
+                    # est supprimée
+                    if not line.endswith(b"\n"):
+                        f.truncate(offset)
+                        break
+                    index = int(line.split(b"\t", 1)[0])
+                    self.done[index] = offset
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger_api.warning(f'Job {self.key} unreadable : {e}')
+            self.done = {}
+            return False
+        return True
+
+    def _reset(self):
+        """
+        Crée un journal vide
+        """
+        (self.path / "pages.jsonl").unlink(missing_ok=True)
+        job = {"first_url": self.first_url, "urls": self.urls_list,
+               "created": time.time()}
+        with open(self.path / "job.json", "w", encoding="utf-8") as f:
+            json.dump(job, f)
+
+    def record(self, index: int, page: dict):
+        """
+        Ecrit une page reçue (point de contrôle)
+        """
+        if index in self.done:
+            return
+        line = (f"{index}\t".encode("utf-8")
+                + json.dumps(page, ensure_ascii=False).encode("utf-8")
+                + b"\n")
+        self._pages.seek(0, 2)
+        self.done[index] = self._pages.tell()
+        self._pages.write(line)
+        self._pages.flush()
+
+    def load(self, index: int):
+        """
+        Relit une page du journal
+        """
+        self._pages.seek(self.done[index])
+        line = self._pages.readline()
+        return json.loads(line.split(b"\t", 1)[1])
+
+    def close(self):
+        """
+        Ferme le fichier des pages (le journal est conservé)
+        """
+        if not self._pages.closed:
+            self._pages.close()
+        self._release_key()
+
+    def discard(self):
+        """
+        Supprime le journal (téléchargement terminé)
+        """
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,275 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Outils de régulation du flux de requêtes vers l'API Judilibre.
+Ils sont partagés par tous les workers (threads ou tâches asyncio)
+d'un même objet Connexion.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Seau à jetons (token bucket).
+    Chaque requête consomme un jeton. Les jetons se régénèrent au rythme
+    'rate' par seconde, dans la limite de 'capacity'.
+    Au lieu de lever une exception, l'appelant attend exactement le temps
+    nécessaire à l'arrivée de son jeton.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        Constructeur de l'instance
+        """
+        # nombre de jetons générés par seconde
+        self.rate = rate
+        # nombre maximal de jetons disponibles d'un coup (rafale)
+        self.capacity = capacity
+        # niveau courant, peut devenir négatif : chaque jeton manquant
+        # correspond à un appelant déjà en attente
+        self._tokens = capacity
+        self._last = time.monotonic()
+        # le verrou n'est conservé que le temps du calcul,
+        # jamais pendant l'attente
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """
+        Ajoute les jetons générés depuis le dernier passage
+        """
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _reserve(self):
+        """
+        Réserve un jeton et retourne le temps d'attente en secondes
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """
+        Bloque le thread appelant jusqu'à la disponibilité de son jeton.
+        Retourne le temps d'attente.
+        """
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """
+        Equivalent de acquire() pour une tâche asyncio :
+        la boucle n'est jamais bloquée.
+        """
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    @property
+    def level(self):
+        """
+        Niveau de remplissage actuel du seau.
+        Une valeur négative indique le nombre d'appelants en attente.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class ConcurrencyController:
+    """
+    Contrôleur de concurrence AIMD (additive increase,
+    multiplicative decrease) pour le téléchargement des batchs.
+    - Tant que la latence et le taux d'erreur restent sains, la limite
+      augmente d'environ 1 par "fenêtre" de requêtes.
+    - Une réponse 429 ou 503 divise la limite par deux.
+    Les workers prennent une place avant chaque requête (acquire)
+    et la libèrent ensuite (release). Les threads attendent sur une
+    threading.Condition, les tâches asyncio sur un Future de leur boucle,
+    réveillé par release() quel que soit le thread appelant.
+    """
+    # lissage des moyennes mobiles (latence et erreurs)
+    _alpha = 0.2
+    # taux d'erreur au-delà duquel la limite n'augmente plus
+    error_threshold = 0.1
+    # une latence moyenne supérieure à X fois la latence de référence
+    # est considérée comme une dégradation
+    latency_factor = 2.0
+    # délai minimal entre deux diminutions (une rafale de 429 = 1 diminution)
+    cooldown = 1.0
+
+    def __init__(self, initial=10, minimum=1, maximum=20,
+                 decrease_factor=0.5):
+        """
+        Constructeur de l'instance
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        # limite courante (float pour l'augmentation additive)
+        self._limit = float(initial)
+        # nombre de requêtes en cours
+        self._in_flight = 0
+        # latence moyenne, latence de référence et taux d'erreur
+        self._latency = None
+        self._baseline = None
+        self._error_rate = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        # tâches asyncio en attente : (boucle, Future)
+        self._async_waiters = []
+
+    @property
+    def limit(self):
+        """
+        Nombre de requêtes simultanées autorisées
+        """
+        return max(self.minimum, int(self._limit))
+
+    def try_acquire(self):
+        """
+        Prend une place si la limite le permet, sans attendre
+        """
+        with self._condition:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """
+        Attend qu'une place se libère (threads)
+        """
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self):
+        """
+        Attend qu'une place se libère (tâches asyncio), sans bloquer la
+        boucle ni l'interroger à intervalle régulier
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                # tâche annulée avant son réveil
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self):
+        """
+        Libère une place
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._notify_all()
+
+    def _notify_all(self):
+        """
+        Réveille les threads et les tâches asyncio en attente
+        (verrou de la condition détenu)
+        """
+        self._condition.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(self._wake, waiter)
+            except RuntimeError:
+                # boucle fermée : la tâche n'attend plus
+                pass
+
+    @staticmethod
+    def _wake(waiter):
+        """
+        Réveil d'une tâche (dans le thread de sa boucle)
+        """
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+    def on_success(self, latency: float):
+        """
+        Réponse correcte : mise à jour des moyennes
+        et augmentation additive si tout est sain
+        """
+        with self._condition:
+            self._update_error_rate(0)
+            if self._latency is None:
+                self._latency = latency
+                self._baseline = latency
+            else:
+                self._latency += self._alpha * (latency - self._latency)
+                self._baseline = min(self._baseline, self._latency)
+            healthy = (
+                self._error_rate < self.error_threshold
+                and self._latency <= self._baseline * self.latency_factor)
+            if healthy and self._limit < self.maximum:
+                # +1 lorsque 'limit' requêtes ont réussi
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+                self._notify_all()
+
+    def on_error(self):
+        """
+        Erreur serveur ou timeout : la limite cesse d'augmenter
+        """
+        with self._condition:
+            self._update_error_rate(1)
+
+    def on_overload(self):
+        """
+        Réponse 429 ou 503 : diminution multiplicative
+        """
+        with self._condition:
+            self._update_error_rate(1)
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._limit = max(self.minimum,
+                              self._limit * self.decrease_factor)
+
+    def _update_error_rate(self, is_error):
+        """
+        Moyenne mobile du taux d'erreur
+        """
+        self._error_rate += self._alpha * (is_error - self._error_rate)
@@ -0,0 +1,35 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Emplacement des fichiers locaux de l'application (cache, bases, journaux)
+"""
+
+import os
+from pathlib import Path
+
+
+def get_data_dir(*parts):
+    """
+    Retourne le dossier de données demandé et le crée si nécessaire.
+    Par défaut ~/.pycoretext, modifiable grâce à la variable
+    d'environnement PYCORETEXT_HOME.
+    """
+    base = Path(os.environ.get("PYCORETEXT_HOME",
+                               Path.home() / ".pycoretext"))
+    path = base.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
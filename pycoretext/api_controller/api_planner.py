@@ -0,0 +1,146 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Planificateur des requêtes Export et Search.
+L'API ne donne jamais accès à plus de 10 000 résultats pour une requête.
+Au-delà, la fenêtre date_start/date_end est coupée en deux, récursivement,
+jusqu'à ce que chaque tranche (shard) passe sous la limite.
+"""
+
+import logging
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from . import api_url
+from pycoretext import exceptions as exc
+
+logger_api = logging.getLogger('api.api_planner')
+
+# nombre maximal de résultats accessibles pour une requête
+MAX_RESULTS = 10000
+
+
+class QueryPlanner:
+    """
+    Découpe une requête trop large en tranches de dates
+    """
+    # nombre de tranches sondées simultanément
+    max_workers = 4
+
+    def __init__(self, connexion):
+        """
+        Constructeur de l'instance
+        """
+        self.connexion = connexion
+
+    def plan(self, url_object: api_url.UrlBase, response):
+        """
+        Retourne la liste des tranches
+        [(url de la 1ère page, total, 1ère page (dict)), ...] dans l'ordre
+        chronologique, ou None si la requête respecte la limite.
+        La 1ère page, téléchargée pour sonder la tranche, n'est pas
+        demandée à nouveau par l'objet Answer.
+        'response' est la réponse à la 1ère page de la requête complète.
+        """
+        total = response.json().get("total") or 0
+        if total < MAX_RESULTS:
+            return None
+        start, end = self._window(url_object)
+        logger_api.info(f'{total} results : sharding {start} - {end}')
+        # parcours par niveau : toutes les tranches d'un niveau sont
+        # sondées simultanément, celles qui dépassent la limite sont
+        # coupées en deux pour le niveau suivant
+        shards = []
+        pending = [(start, end)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending:
+                probes = executor.map(
+                    lambda window: self._probe(url_object, *window), pending)
+                next_level = []
+                for window, (full_url, page) in zip(pending, probes):
+                    shard_total = page.get("total") or 0
+                    if shard_total >= MAX_RESULTS and window[0] < window[1]:
+                        next_level.extend(self._bisect(*window))
+                    elif shard_total:
+                        if shard_total >= MAX_RESULTS:
+                            # une seule journée au-delà de la limite
+                            logger_api.warning(
+                                f'Shard {window[0]} still truncated')
+                        shards.append((window[0], full_url, shard_total,
+                                       page))
+                pending = next_level
+        # les fenêtres sont disjointes : tri sur la date de début
+        shards.sort(key=lambda shard: shard[0])
+        logger_api.info(f'{len(shards)} shards')
+        return [shard[1:] for shard in shards]
+
+    def _window(self, url_object):
+        """
+        Fenêtre de dates de la requête. A défaut de critères, les bornes
+        sont la plus ancienne décision connue (/stats) et aujourd'hui.
+        """
+        criterias = url_object.dict_criterias
+        if "date_start=" in criterias:
+            start = self._parse_date(criterias["date_start="][0], end=False)
+        else:
+            try:
+                answer = self.connexion.get_answer(api_url.UrlStats())
+            except exc.ERRORS as e:
+                raise e
+            results = answer.dict_from_response["results"]
+            start = date.fromisoformat(results["min_decision_date"][:10])
+        if "date_end=" in criterias:
+            end = self._parse_date(criterias["date_end="][0], end=True)
+        else:
+            end = date.today()
+        return start, end
+
+    @staticmethod
+    def _parse_date(value: str, end: bool):
+        """
+        Convertit une date du formulaire ('2023', '2023-01' ou
+        '2023-01-01'). Une date partielle vaut le premier jour de la
+        période, ou le dernier s'il s'agit de la borne de fin.
+        """
+        parts = [int(part) for part in value[:10].split("-")]
+        if len(parts) == 3:
+            return date(*parts)
+        if len(parts) == 1:
+            return date(parts[0], 12 if end else 1, 31 if end else 1)
+        first_day = date(parts[0], parts[1], 1)
+        if not end:
+            return first_day
+        # dernier jour du mois
+        return (first_day + timedelta(days=31)).replace(day=1) \
+            - timedelta(days=1)
+
+    @staticmethod
+    def _bisect(start, end):
+        """
+        Coupe la fenêtre en deux fenêtres disjointes
+        """
+        middle = start + (end - start) // 2
+        return [(start, middle), (middle + timedelta(days=1), end)]
+
+    def _probe(self, url_object, start, end):
+        """
+        Envoie la 1ère page de la tranche et retourne (url, page (dict))
+        """
+        shard = url_object.copy()
+        shard.replace_criteria("date_start=", start.isoformat())
+        shard.replace_criteria("date_end=", end.isoformat())
+        full_url = self.connexion.endpoint + shard.get_final_url()
+        return full_url, self.connexion.simple_api_request(full_url).json()
@@ -0,0 +1,296 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Registre des objets Answer d'une connexion (Connexion.dict_answers).
+Il se comporte comme un dict mais respecte un budget mémoire : les
+réponses dont l'onglet a été fermé sont écrites sur disque (pickle),
+des moins récemment utilisées aux plus récentes, puis rechargées
+à la demande.
+"""
+
+import atexit
+import os
+import pickle
+import sys
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from itertools import islice
+from .api_paths import get_data_dir
+
+logger_api = logging.getLogger('api.api_registry')
+
+
+def deep_size(obj, seen=None):
+    """
+    Taille approximative (octets) d'un objet et de son contenu
+    (dict, list, tuple, set et valeurs des objets Decision)
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen)
+                    for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "_values"):
+        # objets Decision : seules les valeurs sont propres à l'instance
+        size += deep_size(obj._values, seen)
+    return size
+
+
+class AnswerRegistry(MutableMapping):
+    """
+    Dictionnaire {identifiant: Answer} borné en mémoire.
+    - Une réponse ajoutée est "affichée" : elle n'est jamais évincée.
+    - release() signale que son onglet est fermé : elle devient
+      évinçable, dans l'ordre LRU.
+    - Au-delà de 'max_bytes', les réponses évinçables sont écrites sur
+      disque (spill=True) ou supprimées (spill=False).
+    """
+    # nombre de décisions mesurées pour estimer la taille d'une réponse
+    sample_size = 50
+    # un fichier plus ancien (secondes) est un reste d'une session arrêtée
+    max_age = 24 * 3600
+
+    def __init__(self, connexion=None, max_bytes=512 * 1024 ** 2,
+                 spill=True):
+        """
+        Constructeur de l'instance
+        """
+        self.connexion = connexion
+        self.max_bytes = max_bytes
+        self.spill = spill
+        # réponses en mémoire, de la moins à la plus récemment utilisée
+        self._answers = OrderedDict()
+        # réponses écrites sur disque : identifiant -> fichier pickle
+        self._spilled = {}
+        # fichiers de textes (BlobStore) des réponses écrites sur disque
+        self._blob_paths = {}
+        # réponses affichées (jamais évincées)
+        self._pinned = set()
+        # taille estimée : identifiant -> (nb de décisions, octets)
+        self._sizes = {}
+        self._prefix = uuid.uuid4().hex
+        # compteurs
+        self.spills = 0
+        self.evictions = 0
+        self.rehydrations = 0
+        atexit.register(self.close)
+
+    def __getitem__(self, key):
+        if key in self._answers:
+            self._answers.move_to_end(key)
+            return self._answers[key]
+        if key in self._spilled:
+            return self._rehydrate(key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, answer):
+        if key in self:
+            self._discard(key)
+        self._answers[key] = answer
+        self._pinned.add(key)
+        self._enforce()
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._discard(key)
+
+    def __contains__(self, key):
+        return key in self._answers or key in self._spilled
+
+    def __iter__(self):
+        yield from list(self._answers)
+        yield from list(self._spilled)
+
+    def __len__(self):
+        return len(self._answers) + len(self._spilled)
+
+    def release(self, key):
+        """
+        L'onglet de la réponse a été fermé : elle peut être évincée
+        """
+        self._pinned.discard(key)
+        self._enforce()
+
+    @property
+    def nbytes(self):
+        """
+        Taille estimée des réponses en mémoire (octets)
+        """
+        return sum(self._size_of(key) for key in self._answers)
+
+    def _size_of(self, key):
+        """
+        Taille estimée d'une réponse, extrapolée à partir d'un
+        échantillon de décisions. Elle est recalculée lorsque le
+        nombre de décisions change (téléchargement en cours).
+        """
+        answer = self._answers[key]
+        decisions = getattr(answer, "dict_decisions", None) or {}
+        cached = self._sizes.get(key)
+        if cached is not None and cached[0] == len(decisions):
+            return cached[1]
+        size = deep_size(answer.dict_from_response)
+        if decisions:
+            sample = list(islice(decisions.values(), self.sample_size))
+            seen = set()
+            per_decision = sum(deep_size(d, seen) for d in sample)
+            size += per_decision * len(decisions) // len(sample)
+        self._sizes[key] = (len(decisions), size)
+        return size
+
+    @staticmethod
+    def _is_evictable(answer):
+        """
+        Une réponse en cours de téléchargement n'est pas évincée, sauf si
+        ce téléchargement a été abandonné (onglet fermé)
+        """
+        if getattr(answer, "cancelled", False):
+            return True
+        return (getattr(answer, "complete", True)
+                and getattr(answer, "journal", None) is None)
+
+    def _enforce(self, keep=None):
+        """
+        Evince les réponses libérées (LRU) jusqu'à respecter le budget.
+        'keep' : identifiant à conserver (réponse qui vient d'être lue)
+        """
+        total = self.nbytes
+        if total <= self.max_bytes:
+            return
+        for key in list(self._answers):
+            if total <= self.max_bytes:
+                break
+            answer = self._answers[key]
+            if (key in self._pinned or key == keep
+                    or not self._is_evictable(answer)):
+                continue
+            total -= self._size_of(key)
+            # une réponse abandonnée est incomplète : elle n'est pas
+            # écrite sur disque (la requête peut être relancée)
+            if getattr(answer, "cancelled", False) or not (
+                    self.spill and self._spill(key)):
+                self._drop(key)
+        if total > self.max_bytes:
+            logger_api.debug(f'Answers over budget : {total} bytes')
+
+    def _spill(self, key):
+        """
+        Ecrit la réponse sur disque. Retourne False en cas d'échec.
+        """
+        answer = self._answers[key]
+        path = get_data_dir("answers") / f"{self._prefix}_{key}.pickle"
+        try:
+            with open(path, "wb") as f:
+                pickle.dump(answer, f, pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PicklingError, TypeError,
+                AttributeError) as e:
+            logger_api.warning(f'Answer {key} not spilled : {e}')
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False
+        # le fichier des textes est conservé pour la réhydratation
+        blobs = getattr(answer, "blobs", None)
+        if blobs is not None:
+            blobs.close()
+            self._blob_paths[key] = blobs.path
+        del self._answers[key]
+        self._sizes.pop(key, None)
+        self._spilled[key] = path
+        self.spills += 1
+        logger_api.debug(f'Answer {key} spilled to {path}')
+        return True
+
+    def _drop(self, key):
+        """
+        Supprime la réponse de la mémoire
+        """
+        answer = self._answers.pop(key)
+        self._sizes.pop(key, None)
+        self._pinned.discard(key)
+        if hasattr(answer, "close"):
+            answer.close()
+        self.evictions += 1
+        logger_api.debug(f'Answer {key} evicted')
+
+    def _rehydrate(self, key):
+        """
+        Recharge une réponse écrite sur disque
+        """
+        path = self._spilled.pop(key)
+        self._blob_paths.pop(key, None)
+        with open(path, "rb") as f:
+            answer = pickle.load(f)
+        os.remove(path)
+        # la connexion n'est pas sérialisée (cf. Answer.__getstate__)
+        if self.connexion is not None:
+            answer.connexion = self.connexion
+        self._answers[key] = answer
+        self.rehydrations += 1
+        logger_api.debug(f'Answer {key} rehydrated')
+        self._enforce(keep=key)
+        return answer
+
+    def _discard(self, key):
+        """
+        Supprime la réponse, en mémoire ou sur disque
+        """
+        if key in self._answers:
+            answer = self._answers.pop(key)
+            self._sizes.pop(key, None)
+            self._pinned.discard(key)
+            if hasattr(answer, "close"):
+                answer.close()
+            return
+        paths = [self._spilled.pop(key), self._blob_paths.pop(key, None)]
+        for path in paths:
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        """
+        Supprime les fichiers des réponses écrites sur disque
+        """
+        for key in list(self._spilled):
+            self._discard(key)
+        self._purge_old_files()
+
+    def _purge_old_files(self):
+        """
+        Supprime les fichiers laissés par une session interrompue
+        """
+        limit = time.time() - self.max_age
+        for path in get_data_dir("answers").glob("*.pickle"):
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,179 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Statistiques Judilibre (commande /stats).
+Les paramètres d'agrégation de l'API (keys=jurisdiction, keys=month)
+permettent d'obtenir la matrice juridiction x période en quelques
+requêtes, envoyées simultanément.
+"""
+
+import time
+import threading
+import logging
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from . import api_url
+from pycoretext import exceptions as exc
+
+logger_api = logging.getLogger('api.api_stats')
+
+JURISDICTIONS = ["cc", "ca", "tj", "tcom"]
+
+
+class StatsEngine:
+    """
+    Calcule et conserve les statistiques affichées dans l'InfoPopup
+    """
+    # durée (secondes) pendant laquelle les statistiques sont réutilisées
+    refresh_interval = 15 * 60
+
+    def __init__(self, connexion):
+        """
+        Constructeur de l'instance
+        """
+        self.connexion = connexion
+        self._data = None
+        self._timestamp = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, force=False):
+        """
+        Retourne les statistiques, recalculées si elles sont trop anciennes
+        """
+        with self._lock:
+            if (force or self._data is None
+                    or time.monotonic() - self._timestamp
+                    > self.refresh_interval):
+                self._data = self._collect(date.today())
+                self._timestamp = time.monotonic()
+            return self._data
+
+    @staticmethod
+    def periods(today: date):
+        """
+        Bornes des périodes affichées : hier, mois en cours, mois passé
+        """
+        yesterday = today - timedelta(days=1)
+        first_day_month = today.replace(day=1)
+        last_day_prev_month = first_day_month - timedelta(days=1)
+        first_day_prev_month = last_day_prev_month.replace(day=1)
+        return {
+            "yesterday": (yesterday, yesterday),
+            "month": (first_day_month, today),
+            "previous_month": (first_day_prev_month, last_day_prev_month)
+        }
+
+    def _collect(self, today: date):
+        """
+        Envoie les requêtes simultanément et assemble le résultat :
+        {"total", "max_date", "jurisdictions": {juris: {"total",
+        "yesterday", "month", "previous_month"}}}
+        """
+        periods = self.periods(today)
+        month_start = periods["previous_month"][0]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            f_global = executor.submit(self._request)
+            f_juris = executor.submit(self._request, ["jurisdiction"])
+            f_yesterday = executor.submit(
+                self._request, ["jurisdiction"], *periods["yesterday"])
+            f_months = executor.submit(
+                self._request, ["jurisdiction", "month"], month_start, today)
+            # result() relance l'éventuelle exception du worker
+            results = f_global.result()
+            by_juris = self._aggregate(f_juris.result(), "jurisdiction")
+            yesterday = self._aggregate(f_yesterday.result(), "jurisdiction")
+            months = self._aggregate(f_months.result(),
+                                     "jurisdiction", "month")
+        # l'API ne propose pas l'agrégation : une requête par juridiction
+        if by_juris is None:
+            by_juris = self._fan_out()
+        if yesterday is None:
+            yesterday = self._fan_out(periods["yesterday"])
+        if months is None:
+            months = {}
+            for name in ["month", "previous_month"]:
+                month = periods[name][0].strftime("%Y-%m")
+                for juris, count in self._fan_out(periods[name]).items():
+                    months[(juris, month)] = count
+        data = {
+            "total": results["total_decisions"],
+            "max_date": results["max_decision_date"],
+            "jurisdictions": {}
+        }
+        for juris in JURISDICTIONS:
+            data["jurisdictions"][juris] = {
+                "total": by_juris.get(juris, 0),
+                "yesterday": yesterday.get(juris, 0)
+            }
+            for name in ["month", "previous_month"]:
+                month = periods[name][0].strftime("%Y-%m")
+                data["jurisdictions"][juris][name] = months.get(
+                    (juris, month), 0)
+        return data
+
+    def _request(self, keys=(), date_start=None, date_end=None,
+                 jurisdiction=None):
+        """
+        Une requête /stats, retourne le contenu de "results"
+        """
+        url = api_url.UrlStats()
+        for key in keys:
+            # paramètre répété : keys=jurisdiction&keys=month
+            url.set_criteria("keys=", key)
+        if date_start is not None:
+            url.set_criteria("date_start=", str(date_start))
+            url.set_criteria("date_end=", str(date_end))
+        if jurisdiction is not None:
+            url.set_criteria("jurisdiction=", jurisdiction)
+        try:
+            answer = self.connexion.get_answer(url)
+        except exc.ERRORS as e:
+            raise e
+        return answer.dict_from_response["results"]
+
+    @staticmethod
+    def _aggregate(results, *keys):
+        """
+        Convertit "aggregated_data" en dict. La clé est la valeur du
+        critère (ou un tuple si plusieurs critères).
+        Retourne None si l'API n'a pas agrégé les données.
+        """
+        if "aggregated_data" not in results:
+            return None
+        aggregated = {}
+        for item in results["aggregated_data"]:
+            values = tuple(str(item["key"].get(key, "")) for key in keys)
+            # "2023-01-01" ou "2023-01" selon l'API : on garde l'année-mois
+            if "month" in keys:
+                index = keys.index("month")
+                values = (values[:index] + (values[index][:7],)
+                          + values[index + 1:])
+            key = values[0] if len(values) == 1 else values
+            aggregated[key] = aggregated.get(key, 0) + item["decisions_count"]
+        return aggregated
+
+    def _fan_out(self, period=(None, None)):
+        """
+        Solution de repli : une requête par juridiction, simultanées
+        """
+        date_start, date_end = period
+        with ThreadPoolExecutor(max_workers=len(JURISDICTIONS)) as executor:
+            futures = {juris: executor.submit(self._request, (), date_start,
+                                              date_end, juris)
+                       for juris in JURISDICTIONS}
+            return {juris: future.result()["total_decisions"]
+                    for juris, future in futures.items()}
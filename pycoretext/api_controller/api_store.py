@@ -0,0 +1,315 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Stock local (SQLite) des décisions téléchargées par Export.
+Un index plein texte FTS5 sur le texte et le sommaire permet d'interroger
+le corpus local sans requête vers Judilibre. Les recherches ne
+retournent que les métadonnées : le texte d'une décision n'est lu qu'à
+l'affichage (StoredText).
+Chaque environnement (sandbox, production) a sa propre base.
+"""
+
+import json
+import sqlite3
+import threading
+import logging
+from .api_paths import get_data_dir
+
+logger_api = logging.getLogger('api.api_store')
+
+# critères de l'API gérés localement : critère => colonne
+COLUMNS_CRITERIAS = {
+    "id=": "id",
+    "jurisdiction=": "jurisdiction",
+    "chamber=": "chamber",
+    "type=": "type",
+    "formation=": "formation",
+    "solution=": "solution",
+    "location=": "location",
+}
+# critères dont la valeur est une liste (JSON) : critère => colonne
+LIST_CRITERIAS = {
+    "publication=": "publication",
+    "theme=": "themes",
+}
+
+
+class StoredText:
+    """
+    Référence vers le texte d'une décision du stock
+    """
+    __slots__ = ("store", "judi_id")
+
+    def __init__(self, store, judi_id: str):
+        """
+        Constructeur de l'instance
+        """
+        self.store = store
+        self.judi_id = judi_id
+
+    def load(self):
+        """
+        Lit et retourne le texte
+        """
+        return self.store.text(self.judi_id)
+
+
+class DecisionStore:
+    """
+    Base locale des décisions, alimentée page par page
+    """
+    # nombre maximal de décisions retournées par une recherche
+    # (même limite que l'API Judilibre)
+    max_results = 10000
+
+    def __init__(self, env='sandbox', path=None):
+        """
+        Constructeur de l'instance : base de l'environnement 'env', à
+        défaut de chemin explicite
+        """
+        self.path = path or get_data_dir() / f"decisions_{env}.sqlite"
+        # une seule connexion SQLite partagée par les workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS decisions (
+                id TEXT PRIMARY KEY, jurisdiction TEXT, chamber TEXT,
+                type TEXT, formation TEXT, solution TEXT, location TEXT,
+                decision_date TEXT, update_date TEXT, number TEXT,
+                publication TEXT, themes TEXT, meta TEXT,
+                text TEXT, summary TEXT);
+            CREATE INDEX IF NOT EXISTS idx_decision_date
+                ON decisions(decision_date);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY, value TEXT);
+            CREATE VIRTUAL TABLE IF NOT EXISTS decisions_fts USING fts5(
+                text, summary, content='decisions', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2');
+            CREATE TRIGGER IF NOT EXISTS decisions_ai AFTER INSERT
+                ON decisions BEGIN
+                INSERT INTO decisions_fts(rowid, text, summary)
+                VALUES (new.rowid, new.text, new.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS decisions_ad AFTER DELETE
+                ON decisions BEGIN
+                INSERT INTO decisions_fts(decisions_fts, rowid, text, summary)
+                VALUES ('delete', old.rowid, old.text, old.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS decisions_au AFTER UPDATE
+                ON decisions BEGIN
+                INSERT INTO decisions_fts(decisions_fts, rowid, text, summary)
+                VALUES ('delete', old.rowid, old.text, old.summary);
+                INSERT INTO decisions_fts(rowid, text, summary)
+                VALUES (new.rowid, new.text, new.summary);
+            END;
+            """)
+
+    def upsert(self, list_meta):
+        """
+        Ajoute ou met à jour les décisions (liste de dict_meta complets)
+        dans une seule transaction
+        """
+        rows = []
+        for meta in list_meta:
+            if not meta.get("id"):
+                continue
+            other_meta = {key: value for key, value in meta.items()
+                          if key != "text"}
+            rows.append((
+                meta["id"], meta.get("jurisdiction"), meta.get("chamber"),
+                meta.get("type"), meta.get("formation"),
+                meta.get("solution"), meta.get("location"),
+                meta.get("decision_date"), meta.get("update_date"),
+                meta.get("number"),
+                json.dumps(meta.get("publication") or []),
+                json.dumps(meta.get("themes") or []),
+                json.dumps(other_meta, ensure_ascii=False),
+                meta.get("text"), meta.get("summary")))
+        if not rows:
+            return
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany("""
+                    INSERT INTO decisions VALUES
+                    (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                    jurisdiction=excluded.jurisdiction,
+                    chamber=excluded.chamber, type=excluded.type,
+                    formation=excluded.formation,
+                    solution=excluded.solution, location=excluded.location,
+                    decision_date=excluded.decision_date,
+                    update_date=excluded.update_date,
+                    number=excluded.number,
+                    publication=excluded.publication,
+                    themes=excluded.themes, meta=excluded.meta,
+                    text=excluded.text, summary=excluded.summary
+                    """, rows)
+
+    def delete(self, ids):
+        """
+        Supprime des décisions du stock
+        """
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany("DELETE FROM decisions WHERE id = ?",
+                                     [(judi_id,) for judi_id in ids])
+
+    def search_local(self, dict_criterias: dict, limit=None):
+        """
+        Interroge le stock à partir des critères d'un objet Url
+        (ex: {"query=": ["bail"], "jurisdiction=": ["cc"]}).
+        Retourne la liste des dict_meta sans le texte (cf. text), au plus
+        'limit' décisions (par défaut max_results), les plus récentes.
+        """
+        where, params = [], []
+        query = dict_criterias.get("query=", [""])[0].strip()
+        if query:
+            operator = dict_criterias.get("operator=", ["or"])[0]
+            where.append("d.rowid IN (SELECT rowid FROM decisions_fts "
+                         "WHERE decisions_fts MATCH ?)")
+            params.append(self.match_expression(query, operator))
+        for criteria, values in dict_criterias.items():
+            if criteria in COLUMNS_CRITERIAS:
+                where.append(f"d.{COLUMNS_CRITERIAS[criteria]} IN "
+                             f"({', '.join('?' * len(values))})")
+                params.extend(values)
+            elif criteria in LIST_CRITERIAS:
+                where.append(
+                    "EXISTS (SELECT 1 FROM json_each("
+                    f"d.{LIST_CRITERIAS[criteria]}) WHERE value IN "
+                    f"({', '.join('?' * len(values))}))")
+                params.extend(values)
+        # dates partielles acceptées ('2023', '2023-01') :
+        # comparaison sur la longueur de la valeur donnée
+        date_column = "decision_date"
+        if dict_criterias.get("date_type=", [""])[0] == "update":
+            date_column = "update_date"
+        for criteria, operator in [("date_start=", ">="),
+                                   ("date_end=", "<=")]:
+            if criteria in dict_criterias:
+                value = dict_criterias[criteria][0]
+                where.append(f"substr(d.{date_column}, 1, {len(value)}) "
+                             f"{operator} ?")
+                params.append(value)
+        sql = "SELECT d.meta FROM decisions d"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY d.decision_date DESC LIMIT ?"
+        params.append(int(limit or self.max_results))
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(meta) for meta, in rows]
+
+    def text(self, judi_id: str):
+        """
+        Texte intégral d'une décision du stock (None si absente)
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text FROM decisions WHERE id = ?",
+                (judi_id,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def match_expression(query: str, operator: str):
+        """
+        Convertit la recherche du formulaire en expression FTS5.
+        Chaque mot est placé entre guillemets (aucune syntaxe FTS5
+        n'est interprétée). Opérateurs Judilibre : or, and, exact.
+        """
+        words = ['"' + word.replace('"', '""') + '"'
+                 for word in query.split()]
+        if operator == "exact":
+            return '"' + query.replace('"', '""') + '"'
+        if operator == "and":
+            return " AND ".join(words)
+        return " OR ".join(words)
+
+    def count(self):
+        """
+        Nombre de décisions du stock
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def known_ids(self, ids):
+        """
+        Sous-ensemble des identifiants présents dans le stock
+        """
+        ids = list(ids)
+        known = set()
+        with self._lock:
+            # par paquets : nombre de variables SQLite limité
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = self._db.execute(
+                    "SELECT id FROM decisions WHERE id IN "
+                    f"({', '.join('?' * len(chunk))})", chunk)
+                known.update(row[0] for row in rows)
+        return known
+
+    def jurisdictions(self):
+        """
+        Juridictions présentes dans le stock
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT jurisdiction FROM decisions "
+                "WHERE jurisdiction IS NOT NULL").fetchall()
+        return sorted(row[0] for row in rows)
+
+    def last_update(self):
+        """
+        Date de mise à jour la plus récente du stock (ou None)
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT MAX(update_date) FROM decisions").fetchone()[0]
+
+    def __getstate__(self):
+        """
+        Seul le chemin est sérialisé (pickle) : la base est rouverte
+        """
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """
+        Réouverture de la base après désérialisation
+        """
+        self.__init__(path=state["path"])
+
+    def get_meta(self, key: str, default=None):
+        """
+        Lit une valeur de la table meta (ex: point de synchronisation)
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        """
+        Enregistre une valeur dans la table meta
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
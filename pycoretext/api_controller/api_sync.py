@@ -0,0 +1,169 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Synchronisation incrémentale du stock local des décisions.
+L'historique des transactions (/transactionalhistory) donne les décisions
+créées, modifiées ou supprimées depuis le dernier point de synchronisation
+(watermark). Seules celles-ci sont téléchargées.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from . import api_url
+from pycoretext import exceptions as exc
+
+logger_api = logging.getLogger('api.api_sync')
+
+
+class DeltaSync:
+    """
+    Met à jour le stock local (DecisionStore) de la connexion
+    """
+    # nombre de requêtes /decision simultanées
+    max_workers = 8
+    # décisions écrites dans le stock par transaction
+    batch_size = 50
+
+    def __init__(self, connexion):
+        """
+        Constructeur de l'instance
+        """
+        if connexion.store is None:
+            raise exc.NoResult("Le corpus local n'est pas disponible.")
+        self.connexion = connexion
+        self.store = connexion.store
+        # le stock est propre à l'environnement de la connexion
+        self.watermark_key = "sync_watermark"
+
+    @property
+    def watermark(self):
+        """
+        Point de départ de la prochaine synchronisation : date de la
+        dernière synchronisation, à défaut date de mise à jour la plus
+        récente du stock
+        """
+        return (self.store.get_meta(self.watermark_key)
+                or self.store.last_update())
+
+    def run(self, since=None, jurisdictions=None):
+        """
+        Applique les changements intervenus depuis 'since' (par défaut le
+        watermark) et retourne un résumé (dict).
+        'jurisdictions' : juridictions suivies, par défaut celles du stock.
+        """
+        since = since or self.watermark
+        if not since:
+            raise exc.NoResult("Aucun point de départ : "
+                               + "le corpus local est vide.")
+        jurisdictions = jurisdictions or self.store.jurisdictions()
+        logger_api.info(f'Delta sync since {since} ({jurisdictions})')
+        # 1/ historique des transactions
+        try:
+            history = self.connexion.get_answer(
+                api_url.UrlTransactionalHistory(since))
+        except exc.ERRORS as e:
+            raise e
+        deleted = set(history.ids_by_action("deleted"))
+        changed = (set(history.ids_by_action("created"))
+                   | set(history.ids_by_action("updated")))
+        # 2/ suppressions
+        self.store.delete(deleted)
+        # 3/ décisions créées ou modifiées : un export par date de mise à
+        # jour (ajoutées au stock au fil des pages)
+        received, to_be_deleted, failed_pages = set(), set(), 0
+        if changed:
+            received, to_be_deleted, failed_pages = self._export_updates(
+                since, jurisdictions)
+        # 4/ décisions déjà présentes dans le stock mais absentes de
+        # l'export (autre juridiction, date décalée) : requête /decision
+        missing = self.store.known_ids(changed - received - deleted)
+        failed = set()
+        if missing:
+            fetched = self._fetch_decisions(missing)
+            self.store.upsert(fetched)
+            fetched_ids = {meta["id"] for meta in fetched}
+            received |= fetched_ids
+            failed = missing - fetched_ids
+            to_be_deleted.update(meta["id"] for meta in fetched
+                                 if meta.get("to_be_deleted"))
+        # 5/ décisions signalées comme à supprimer
+        self.store.delete(to_be_deleted)
+        # le watermark n'avance que si tout a été appliqué
+        if not failed and not failed_pages and history.query_date:
+            self.store.set_meta(self.watermark_key, history.query_date)
+        summary = {
+            "since": since,
+            "transactions": len(history.transactions),
+            "changed": len(changed),
+            "received": len(received),
+            "deleted": len(deleted | to_be_deleted),
+            # décisions /decision en erreur, pages de l'export en erreur
+            "failed": len(failed),
+            "failed_pages": failed_pages,
+        }
+        logger_api.info(f'Delta sync done : {summary}')
+        return summary
+
+    def _export_updates(self, since, jurisdictions):
+        """
+        Export des décisions mises à jour depuis 'since', écrites dans le
+        stock au fil des pages (aucune n'est conservée en mémoire).
+        Retourne (identifiants reçus, identifiants signalés comme à
+        supprimer, nombre de pages en erreur).
+        """
+        url = api_url.UrlExport()
+        url.set_criteria("date_type=", "update")
+        url.set_criteria("date_start=", since[:10])
+        for jurisdiction in jurisdictions:
+            url.set_criteria("jurisdiction=", jurisdiction)
+        received, to_be_deleted, batch = set(), set(), []
+        # objet Answer transmis dès la 1ère page (pages en erreur)
+        answers = []
+        try:
+            for decision in self.connexion.iter_decisions(url,
+                                                          answers.append):
+                meta = decision.to_dict()
+                received.add(meta.get("id"))
+                if meta.get("to_be_deleted"):
+                    to_be_deleted.add(meta.get("id"))
+                batch.append(meta)
+                if len(batch) >= self.batch_size:
+                    self.store.upsert(batch)
+                    batch = []
+        except exc.ERRORS as e:
+            raise e
+        self.store.upsert(batch)
+        failed_pages = len(answers[0].wrong_urls) if answers else 0
+        return received, to_be_deleted, failed_pages
+
+    def _fetch_decisions(self, ids):
+        """
+        Télécharge simultanément les décisions données.
+        Retourne la liste des dict_meta obtenus.
+        """
+        def fetch(judi_id):
+            try:
+                answer = self.connexion.get_answer(
+                    api_url.UrlDecision(judi_id))
+            except exc.ERRORS as e:
+                logger_api.warning(f'Decision {judi_id} not synced : {e}')
+                return None
+            return answer.decision.dict_meta
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(fetch, ids)
+            return [meta for meta in results if meta]
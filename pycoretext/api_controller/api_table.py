@@ -0,0 +1,357 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Table en colonnes des métadonnées des décisions d'une réponse.
+Les colonnes typées sont remplies une seule fois, au fil des pages
+reçues :
+- codes répétitifs et dates en catégories (un code entier par ligne,
+  les dates des catégories en datetime64)
+- numéro de pourvoi en clé de tri entière
+Les tris (widgets.DecisionsList), filtres et comptages (api_facets) et
+les exports (export.py) lisent ces colonnes ; les opérations sont
+vectorisées avec numpy. Les autres métadonnées sont lues dans les objets
+Decision de la réponse : aucune copie n'en est conservée.
+"""
+
+import re
+import threading
+from array import array
+from datetime import date
+
+# métadonnées codées en catégories (peu de valeurs distinctes).
+# Une liste de codes (publication) forme une seule catégorie : elle
+# correspond à chacun de ses codes pour les filtres et les comptages.
+CATEGORICAL = ("jurisdiction", "chamber", "type", "publication",
+               "solution", "location", "formation", "source")
+# dates, également en catégories (datetime64 par catégorie)
+DATES = ("decision_date", "update_date")
+# numéros de pourvoi, en clé de tri entière (cf. number_key)
+NUMBERS = ("number",)
+# code d'une valeur vide
+MISSING = -1
+# clé d'une date ou d'un numéro vide (valeur NaT de datetime64)
+NAT = -2 ** 63
+# jour 0 de datetime64[D]
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def text_key(value):
+    """
+    Clé de tri d'un texte, sans distinction de casse (liste = éléments
+    joints). None si la valeur est vide.
+    """
+    if value is None or value in ("", [], ()):
+        return None
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(item) for item in value)
+    return str(value).casefold()
+
+
+def date_key(value):
+    """
+    Date ISO convertie en nombre de jours depuis 1970 (datetime64[D]).
+    None si la valeur est vide ou invalide.
+    """
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal() - EPOCH
+    except ValueError:
+        return None
+
+
+def pourvoi_key(number: str):
+    """
+    Normalise un numéro de pourvoi (ou de RG) : année sur 4 chiffres
+    puis numéro d'ordre, ex. "21-24.568" -> (2021, 24568)
+    """
+    parts = re.findall(r"\d+", number)
+    if not parts:
+        return (0, 0)
+    year = int(parts[0])
+    if len(parts[0]) == 2:
+        year += 1900 if year > 50 else 2000
+    rest = "".join(parts[1:])
+    return (year, int(rest) if rest else 0)
+
+
+def number_key(value):
+    """
+    Numéro de pourvoi en entier triable (cf. pourvoi_key).
+    None si la valeur est vide.
+    """
+    if value is None or value in ("", [], ()):
+        return None
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(item) for item in value)
+    year, rest = pourvoi_key(str(value))
+    return year * 10 ** 12 + min(rest, 10 ** 12 - 1)
+
+
+class DecisionTable:
+    """
+    Métadonnées (sans le texte) des décisions d'une réponse, en colonnes.
+    'decisions' : dictionnaire {identifiant: Decision} de la réponse ;
+    les pages y sont ajoutées puis dans la table (append).
+    Une sélection est un dict {colonne: ensemble de valeurs} : les
+    valeurs d'une même colonne sont combinées par OU, les colonnes entre
+    elles par ET. None désigne une valeur vide.
+    """
+
+    def __init__(self, meta_list, decisions: dict):
+        """
+        Constructeur de l'instance
+        """
+        # le texte intégral n'est jamais placé dans la table
+        self.columns = tuple(meta for meta in meta_list if meta != "text")
+        self._decisions = decisions
+        # identifiants des décisions, dans l'ordre d'ajout
+        self._keys = array("q")
+        # colonnes catégorielles : codes, catégories, code de chaque
+        # catégorie
+        self._codes = {meta: array("i") for meta in self.columns
+                       if meta in CATEGORICAL or meta in DATES}
+        self._categories = {meta: [] for meta in self._codes}
+        self._category_codes = {meta: {} for meta in self._codes}
+        # jours (datetime64[D]) des catégories de dates
+        self._category_days = {meta: array("q") for meta in self._codes
+                               if meta in DATES}
+        # clés de tri entières
+        self._numbers = {meta: array("q") for meta in self.columns
+                         if meta in NUMBERS}
+        # tableaux numpy construits à la demande, jusqu'au prochain append
+        self._arrays = {}
+        # les pages sont ajoutées par le thread de téléchargement
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def append(self, new_decisions: dict):
+        """
+        Ajoute les décisions d'une page {identifiant: Decision}
+        """
+        with self._lock:
+            for key, decision in new_decisions.items():
+                self._keys.append(key)
+                for meta, codes in self._codes.items():
+                    codes.append(self._encode(meta, decision.get(meta)))
+                for meta, numbers in self._numbers.items():
+                    number = number_key(decision.get(meta))
+                    numbers.append(NAT if number is None else number)
+            self._arrays = {}
+
+    def _encode(self, meta, value):
+        """
+        Code de la catégorie d'une valeur (créée si nécessaire)
+        """
+        if isinstance(value, list):
+            value = tuple(value)
+        if value is None or value == "" or value == ():
+            return MISSING
+        category_codes = self._category_codes[meta]
+        code = category_codes.get(value)
+        if code is None:
+            code = len(category_codes)
+            category_codes[value] = code
+            self._categories[meta].append(value)
+            if meta in self._category_days:
+                day = date_key(value)
+                self._category_days[meta].append(NAT if day is None
+                                                 else day)
+        return code
+
+    def _array(self, name, meta=None):
+        """
+        Copie numpy (mise en cache) d'une colonne : "keys", "codes",
+        "days" (jours des catégories) ou "numbers". Appelée sous verrou.
+        """
+        import numpy as np
+        cached = self._arrays.get((name, meta))
+        if cached is None:
+            source = {"keys": lambda: self._keys,
+                      "codes": lambda: self._codes[meta],
+                      "days": lambda: self._category_days[meta],
+                      "numbers": lambda: self._numbers[meta]}[name]()
+            # copie : le tableau d'origine continue de grandir
+            cached = np.array(source, dtype=source.typecode)
+            self._arrays[(name, meta)] = cached
+        return cached
+
+    def keys(self):
+        """
+        Identifiants des décisions (numpy), dans l'ordre d'ajout
+        """
+        with self._lock:
+            return self._array("keys")
+
+    def dates(self, column):
+        """
+        Colonne de dates en datetime64[D] (NaT si vide ou invalide)
+        """
+        import numpy as np
+        with self._lock:
+            codes = self._array("codes", column)
+            days = np.append(self._array("days", column), NAT)
+        # MISSING (-1) désigne le dernier élément : NaT
+        return days[codes].view("datetime64[D]")
+
+    def _sort_ranks(self, column):
+        """
+        Rangs de tri de chaque ligne (numpy int64) et masque des valeurs
+        vides. Appelée sous verrou.
+        """
+        import numpy as np
+        if column in self._numbers:
+            ranks = self._array("numbers", column)
+            return ranks, ranks == NAT
+        codes = self._array("codes", column)
+        if column in self._category_days:
+            days = self._array("days", column)
+            ranks = np.append(days, NAT)[codes]
+            return ranks, ranks == NAT
+        # rang (dense) de chaque catégorie selon sa clé de texte
+        text_keys = [text_key(value) for value in self._categories[column]]
+        ordered = sorted(set(text_keys))
+        position = {value: rank for rank, value in enumerate(ordered)}
+        category_ranks = np.array([position[value] for value in text_keys]
+                                  + [0], dtype=np.int64)
+        return category_ranks[codes], codes == MISSING
+
+    def sort_keys(self, column, descending=False, keys=None):
+        """
+        Identifiants des décisions triés selon la colonne (les valeurs
+        vides en dernier, l'ordre d'ajout pour les valeurs égales).
+        'keys' : limite le tri à ces identifiants.
+        """
+        import numpy as np
+        if column not in self._codes and column not in self._numbers:
+            raise ValueError(f"Colonne non triable : {column}")
+        with self._lock:
+            all_keys = self._array("keys")
+            ranks, missing = self._sort_ranks(column)
+        rows = np.arange(len(all_keys))
+        if keys is not None:
+            rows = rows[np.isin(all_keys, np.fromiter(keys, dtype=np.int64))]
+        present = rows[~missing[rows]]
+        present_ranks = ranks[present]
+        order = np.argsort(-present_ranks if descending else present_ranks,
+                           kind="stable")
+        rows = np.concatenate([present[order], rows[missing[rows]]])
+        return all_keys[rows].tolist()
+
+    def _matching_codes(self, column, values):
+        """
+        Codes des catégories qui correspondent à l'une des valeurs
+        (une liste de codes correspond à chacun de ses éléments)
+        """
+        return [code for code, category
+                in enumerate(self._categories[column])
+                if any(item in values for item in (
+                    category if isinstance(category, tuple)
+                    else (category,)))] + (
+            [MISSING] if None in values else [])
+
+    def mask(self, selection: dict, exclude=None):
+        """
+        Masque numpy des lignes correspondant à la sélection
+        (la colonne 'exclude' est ignorée). Appelée sous verrou.
+        """
+        import numpy as np
+        result = np.ones(len(self._keys), dtype=bool)
+        for column, values in selection.items():
+            if column == exclude or not values:
+                continue
+            codes = self._array("codes", column)
+            result &= np.isin(codes, self._matching_codes(column, values))
+        return result
+
+    def filter_keys(self, selection: dict, keys=None):
+        """
+        Identifiants triés des décisions correspondant à la sélection.
+        'keys' : limite la recherche à ces identifiants (nouvelle page)
+        """
+        import numpy as np
+        with self._lock:
+            all_keys = self._array("keys")
+            mask = self.mask(selection)
+        if keys is not None:
+            mask &= np.isin(all_keys, np.fromiter(keys, dtype=np.int64))
+        return np.sort(all_keys[mask]).tolist()
+
+    def counts(self, column, selection=None):
+        """
+        Nombre de décisions par valeur de la colonne, en tenant compte
+        de la sélection sur les autres colonnes. Trié par nombre
+        décroissant ; None désigne les valeurs vides.
+        """
+        import numpy as np
+        with self._lock:
+            codes = self._array("codes", column)[
+                self.mask(selection or {}, exclude=column)]
+            categories = list(self._categories[column])
+        by_code = np.bincount(codes + 1, minlength=len(categories) + 1)
+        counts = {}
+        for category, count in zip([None] + categories, by_code.tolist()):
+            if not count:
+                continue
+            items = category if isinstance(category, tuple) else (category,)
+            for item in items:
+                counts[item] = counts.get(item, 0) + count
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def iter_rows(self):
+        """
+        Générateur : (identifiant, [valeurs des colonnes]) pour chaque
+        décision ajoutée au moment de l'appel. Les colonnes catégorielles
+        sont décodées, les autres lues dans les objets Decision.
+        """
+        with self._lock:
+            size = len(self._keys)
+            keys = self._keys[:size]
+            codes = {meta: self._codes[meta][:size] for meta in self._codes}
+            categories = {meta: list(values)
+                          for meta, values in self._categories.items()}
+        for row, key in enumerate(keys):
+            decision = self._decisions[key]
+            values = []
+            for meta in self.columns:
+                if meta in codes:
+                    code = codes[meta][row]
+                    value = (None if code == MISSING
+                             else categories[meta][code])
+                    values.append(list(value) if isinstance(value, tuple)
+                                  else value)
+                else:
+                    values.append(decision.get(meta))
+            yield key, values
+
+    def __getstate__(self):
+        """
+        Le verrou et les tableaux numpy ne sont pas sérialisés (pickle)
+        """
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_arrays"] = {}
+        return state
+
+    def __setstate__(self, state):
+        """
+        Recréation du verrou après désérialisation
+        """
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
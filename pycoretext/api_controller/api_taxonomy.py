@@ -0,0 +1,276 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Stock des listes de critères (taxonomy) utilisées par le formulaire.
+Les listes sont téléchargées simultanément et enregistrées dans un
+instantané (snapshot) local. Au démarrage suivant, l'instantané est servi
+immédiatement puis rafraîchi en arrière-plan (stale-while-revalidate) :
+ce rafraîchissement ignore le cache des réponses de la connexion et
+remplace 'data' (le formulaire surveille ce changement).
+"""
+
+import json
+import sys
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from . import api_url
+from .api_paths import get_data_dir
+from pycoretext import exceptions as exc
+
+logger_api = logging.getLogger('api.api_taxonomy')
+
+# critère du formulaire : (id, context_value)
+CRITERIAS = {
+    "chamber": ("chamber", None),
+    "formation": ("formation", None),
+    "theme": ("theme", None),
+    "theme ca": ("theme", "ca"),
+    "type": ("type", None),
+    "publication": ("publication", None),
+    "solution": ("solution", None),
+    "jurisdiction": ("jurisdiction", None),
+    "operator": ("operator", None),
+    # liste principale : "id=" sans valeur pour avoir la totale
+    "idT": ("", None),
+    "location ca": ("location", "ca"),
+    "location tj": ("location", "tj"),
+    "location tcom": ("location", "tcom"),
+    "filetype": ("filetype", None)
+}
+# valeurs sans intérêt retirées de la liste principale
+MAIN_LIST_EXCLUDED = ["cc", "ca", "tj", "tcom", "all"]
+
+
+def snapshot_path(env):
+    """
+    Instantané de l'utilisateur, rafraîchi à chaque téléchargement
+    """
+    return get_data_dir() / f"taxonomy_{env}.json"
+
+
+def bundled_snapshot_path(env):
+    """
+    Instantané livré avec l'application (cf. pycoretext.spec), régénéré
+    par "python -m pycoretext snapshot". Il sert au 1er démarrage,
+    avant tout téléchargement.
+    """
+    if getattr(sys, "frozen", False):
+        base = Path(getattr(sys, "_MEIPASS", Path(sys.executable).parent))
+    else:
+        base = Path(__file__).parent
+    return base / f"taxonomy_{env}.json"
+
+
+def read_snapshot(env):
+    """
+    Lit l'instantané de l'utilisateur ou, à défaut, celui livré avec
+    l'application. Retourne None si aucun n'est utilisable.
+    """
+    for path in (snapshot_path(env), bundled_snapshot_path(env)):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            logger_api.warning(f'Invalid taxonomy snapshot {path} : {e}')
+            continue
+        # un instantané incomplet (ancienne version) est ignoré
+        if isinstance(data, dict) and set(CRITERIAS) <= set(data):
+            logger_api.info(f'Taxonomy snapshot loaded : {path}')
+            return data
+    return None
+
+
+class TaxonomyStore:
+    """
+    Listes de la taxonomy d'un environnement (sandbox ou production)
+    """
+    # nombre de requêtes simultanées (borné de toute façon
+    # par le seau à jetons de la connexion)
+    max_workers = 8
+
+    def __init__(self, connexion):
+        """
+        Constructeur de l'instance
+        """
+        self.connexion = connexion
+        self.env = connexion.env
+        # dict critère : liste de valeurs
+        self.data = None
+        # incrémenté à chaque remplacement de 'data' (cf. current)
+        self.version = 0
+        # True si les données viennent d'un instantané non encore rafraîchi
+        self.stale = False
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+        # instantané déjà lu (cf. seed)
+        self._seed = None
+
+    @property
+    def snapshot_path(self):
+        """
+        Instantané de l'utilisateur, rafraîchi à chaque téléchargement
+        """
+        return snapshot_path(self.env)
+
+    @property
+    def bundled_snapshot_path(self):
+        """
+        Instantané livré avec l'application (facultatif)
+        """
+        return bundled_snapshot_path(self.env)
+
+    def seed(self, snapshot):
+        """
+        Instantané lu à l'avance (cf. api_warmup) : load() le sert sans
+        relire le disque puis lance le rafraîchissement en arrière-plan
+        """
+        self._seed = snapshot
+
+    def load(self):
+        """
+        Retourne les listes du formulaire.
+        Avec un instantané, celui-ci est retourné sans attendre et un
+        rafraîchissement est lancé en arrière-plan. Sans instantané,
+        les listes sont téléchargées immédiatement.
+        """
+        if self.data is not None:
+            return self.data
+        snapshot = self._read_snapshot()
+        if snapshot is not None:
+            with self._lock:
+                self.data = snapshot
+                self.version += 1
+                self.stale = True
+            self.refresh_in_background()
+        else:
+            try:
+                self.refresh()
+            except exc.ERRORS as e:
+                raise e
+        return self.data
+
+    def current(self):
+        """
+        Retourne (version, listes) : le formulaire compare la version
+        pour savoir si ses listes ont été remplacées depuis
+        """
+        with self._lock:
+            return self.version, self.data
+
+    @property
+    def refreshing(self):
+        """
+        Vrai si un rafraîchissement en arrière-plan est en cours
+        """
+        return (self._refresh_thread is not None
+                and self._refresh_thread.is_alive())
+
+    def refresh(self, revalidate=False):
+        """
+        Télécharge toutes les listes simultanément puis met à jour
+        les données et l'instantané de l'utilisateur.
+        Avec 'revalidate', les réponses du cache local sont ignorées.
+        """
+        use_cache = not revalidate
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {criteria: executor.submit(self._fetch, criteria,
+                                                 use_cache)
+                       for criteria in CRITERIAS}
+            # result() relance l'éventuelle exception du worker
+            data = {criteria: future.result()
+                    for criteria, future in futures.items()}
+        with self._lock:
+            self.data = data
+            self.version += 1
+            self.stale = False
+        self._write_snapshot(data)
+        logger_api.info(f'Taxonomy {self.env} refreshed')
+        return data
+
+    def refresh_in_background(self):
+        """
+        Lance refresh() dans un thread (une erreur est seulement journalisée :
+        l'instantané reste en place)
+        """
+        if self.refreshing:
+            return
+
+        def target():
+            try:
+                self.refresh(revalidate=True)
+            except exc.ERRORS as e:
+                logger_api.warning(f'Taxonomy refresh failed : {e}')
+
+        self._refresh_thread = threading.Thread(target=target, daemon=True)
+        self._refresh_thread.start()
+
+    def _fetch(self, criteria: str, use_cache=True):
+        """
+        Télécharge et met en forme la liste d'un critère
+        """
+        id_value, context_value = CRITERIAS[criteria]
+        criteria_url = api_url.UrlTaxonomy()
+        criteria_url.set_criteria("id=", id_value)
+        if context_value is not None:
+            criteria_url.set_criteria("context_value=", context_value)
+        # la réponse n'est pas stockée dans le dict_answers de la connexion
+        answer = self.connexion.get_answer(criteria_url, use_cache)
+        if criteria == "idT":
+            return [value for value in answer.list_results
+                    if value not in MAIN_LIST_EXCLUDED]
+        # les thèmes sont liés soit au cc, soit au ca = tri à effectuer
+        elif criteria == "theme":
+            return answer.list_results
+        elif criteria == "theme ca":
+            # les thèmes ca ne sont pas encore correctement gérées par
+            # l'API. Suivre les améliorations pour ajuster les dev.
+            data = []
+            for key, values in answer.dict_results.items():
+                # on met en valeur les clés entre des astérisques
+                data.append("**" + str(key) + "**")
+                # on poursuit avec les autres valeurs
+                data.extend(values)
+            return data
+        # dans tous les autres cas : tri ascendant des clés
+        return sorted(answer.dict_results.keys())
+
+    def _read_snapshot(self):
+        """
+        Instantané déjà lu ou, à défaut, lecture sur disque
+        (cf. read_snapshot). Retourne None si aucun n'est utilisable.
+        """
+        if self._seed is not None:
+            snapshot, self._seed = self._seed, None
+            return snapshot
+        return read_snapshot(self.env)
+
+    def _write_snapshot(self, data):
+        """
+        Enregistre l'instantané (écriture atomique)
+        """
+        path = self.snapshot_path
+        tmp = path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            tmp.replace(path)
+        except OSError as e:
+            logger_api.warning(f'Taxonomy snapshot not saved : {e}')
@@ -20,6 +20,7 @@ Le but est d'obtenir la partie variable de l'Url pour composer la requête.
 La base de l'Url (endpoint) proviendra du module judilibre_connexion
 """
 
+import copy
 from pycoretext import exceptions as exc
 
 
@@ -67,6 +68,30 @@ class UrlBase:
         else:
             self.dict_criterias[criteria] = [value]
 
+    def copy(self):
+        """
+        Retourne une copie indépendante de l'objet Url
+        """
+        new_url = copy.copy(self)
+        new_url.dict_criterias = {
+            criteria: list(values)
+            for criteria, values in self.dict_criterias.items()}
+        return new_url
+
+    def replace_criteria(self, criteria, value):
+        """
+        Remplace les valeurs d'un critère (ou l'ajoute s'il n'existe pas)
+        puis reconstruit la partie variable de l'url
+        """
+        self.dict_criterias[criteria] = [value]
+        # la commande (ex: "/export?") précède toujours les critères
+        base, sep, _ = self.final_url.partition("?")
+        criterias, self.dict_criterias = self.dict_criterias, {}
+        self.final_url, self.nb_criterias = base + sep, 0
+        for criteria, values in criterias.items():
+            for value in values:
+                self.set_criteria(criteria, value)
+
     def get_final_url(self):
         "Retourne la partie varialbe finale de l'Url"
         # vérification de l'Url avant de la transmettre
@@ -280,3 +305,39 @@ class UrlStats(UrlBase):
         self.url_type = "stats"
         # ajout de la base
         self.final_url += self._export_base
+
+
+class UrlTransactionalHistory(UrlBase):
+    """
+    Permet de forger une requête de type TransactionalHistory.
+    Elle attend une date (AAAA-MM-JJ ou date et heure ISO) et retournera
+    la liste des décisions créées, modifiées ou supprimées depuis celle-ci.
+    """
+    # commande obligatoire pour TransactionalHistory
+    _export_base = "/transactionalhistory?"
+    _page_size = 500
+
+    def __init__(self, date: str, integral=True):
+        """
+        Fonction d'initialisation
+        """
+        super().__init__(integral)
+        # mode de recherche
+        self.url_type = "transactionalhistory"
+        # ajout de la base
+        self.final_url += self._export_base
+        # ajout des critères obligatoires
+        self.set_criteria("date=", date)
+        self.set_criteria("page_size=", str(self._page_size))
+
+    def _check_final_url(self):
+        """
+        Spécifique à la méthode TransactionalHistory
+        Seuls les critères date, page_size et from_id sont acceptés
+        """
+        for crit in self.dict_criterias:
+            if crit not in ['date=', 'page_size=', 'from_id=']:
+                raise exc.WrongCriteria(
+                                        crit,
+                                        'Critère non accepté pour '
+                                        + 'TransactionalHistory')
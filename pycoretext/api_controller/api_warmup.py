@@ -0,0 +1,131 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Préparation de la connexion pendant l'affichage de la fenêtre de
+connexion, alors que l'environnement et la clé ne sont pas encore connus :
+pour chaque environnement, une session HTTP est ouverte (TCP/TLS) et
+l'instantané taxonomy est lu. Une fois la clé saisie, la Connexion
+reprend la session de l'environnement choisi : il ne reste que la
+vérification de la clé avant l'affichage de la page d'accueil.
+Ce module est importé avant la fenêtre de connexion : requests n'y est
+importé que dans les threads de préparation.
+"""
+
+import threading
+import logging
+
+logger_api = logging.getLogger('api.api_warmup')
+
+# url de base de l'API selon l'environnement
+ENDPOINTS = {
+    'production': 'https://api.piste.gouv.fr/cassation/judilibre/v1.0',
+    'sandbox': 'https://sandbox-api.piste.gouv.fr/cassation/judilibre/v1.0',
+}
+
+
+class Prewarmer:
+    """
+    Prépare en arrière-plan une session HTTP et l'instantané taxonomy de
+    chaque environnement. 'preload' : fonction exécutée dans un thread
+    (ex. import différé des modules de l'application).
+    """
+    # délai de la requête d'ouverture de la connexion
+    timeout = 5
+
+    def __init__(self, endpoints=None, preload=None):
+        """
+        Constructeur de l'instance
+        """
+        self.endpoints = dict(endpoints or ENDPOINTS)
+        self._preload = preload
+        # environnement -> session HTTP / instantané taxonomy
+        self._sessions = {}
+        self._snapshots = {}
+        # préparation terminée (environnement -> Event)
+        self._ready = {env: threading.Event() for env in self.endpoints}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Lance un thread par environnement (et un pour 'preload')
+        """
+        for env in self.endpoints:
+            threading.Thread(target=self._prepare, args=(env,),
+                             name=f"warmup-{env}", daemon=True).start()
+        if self._preload is not None:
+            threading.Thread(target=self._run_preload,
+                             name="warmup-preload", daemon=True).start()
+        return self
+
+    def take(self, env, timeout=None):
+        """
+        Retourne (session, instantané taxonomy) de l'environnement.
+        Attend la fin de sa préparation (au plus 'timeout' secondes,
+        par défaut le délai de la requête). La session n'est donnée
+        qu'une fois ; None si elle n'est pas disponible.
+        """
+        ready = self._ready.get(env)
+        if ready is None:
+            return None, None
+        ready.wait(self.timeout if timeout is None else timeout)
+        with self._lock:
+            return self._sessions.pop(env, None), self._snapshots.get(env)
+
+    def close(self):
+        """
+        Ferme les sessions qui n'ont pas été utilisées
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def _prepare(self, env):
+        """
+        Lecture de l'instantané taxonomy et ouverture de la connexion
+        """
+        try:
+            from .api_taxonomy import read_snapshot
+            snapshot = read_snapshot(env)
+            with self._lock:
+                self._snapshots[env] = snapshot
+            import requests
+            session = requests.Session()
+            try:
+                # la réponse (sans clé) importe peu : seule la connexion
+                # TCP/TLS, conservée par la session, est utile
+                session.head(self.endpoints[env] + "/healthcheck",
+                             timeout=self.timeout)
+            except requests.RequestException as e:
+                logger_api.info(f'Warm-up {env} failed : {e}')
+                session.close()
+            else:
+                with self._lock:
+                    self._sessions[env] = session
+                logger_api.info(f'Warm-up {env} done')
+        finally:
+            self._ready[env].set()
+
+    def _run_preload(self):
+        """
+        Exécute la fonction 'preload' (une erreur est seulement
+        journalisée : elle se reproduira lors de l'usage normal)
+        """
+        try:
+            self._preload()
+        except Exception as e:
+            logger_api.warning(f'Warm-up preload failed : {e}')
@@ -27,13 +27,17 @@ from pathlib import Path
 import tkinter as tk
 from tkinter import BooleanVar
 from tkinter import ttk
-from .api_controller import api_connexion as co, api_url
 from .views import login_page as l_pg
-from .views import homepage as h, result_page
 from .widgets import CustomNotebook
 from .widgets import place_windows
 from .widgets import CustomMessageBox
 from . import exceptions as exc
+from . import startup
+from .api_controller.api_warmup import Prewarmer
+
+# modules importés une fois la fenêtre de connexion affichée
+# (requests, sqlite3... cf. _import_main_modules)
+co = api_url = h = result_page = None
 
 # Définie le chemin vers le fichier log
 # il change selon si nous sommes dans un fichier frozen (exécutable)
@@ -89,6 +93,16 @@ fh_api.setFormatter(formatter)
 logger_api.addHandler(fh_api)
 
 
+def _import_main_modules():
+    """
+    Import différé des modules de la connexion et des pages principales :
+    ils ne retardent pas l'affichage de la fenêtre de connexion
+    """
+    global co, api_url, h, result_page
+    from .api_controller import api_connexion as co, api_url
+    from .views import homepage as h, result_page
+
+
 class Application(tk.Tk):
     """ Classe principale de l'application"""
 
@@ -122,8 +136,16 @@ class Application(tk.Tk):
         self._login.bind('<<Connexion>>', self._on_connexion)
         # fenêtre principale masquée au démarrage
         self.withdraw()
-        # initialisation du gestionnaire d'événements
         logger.info('END init of the application')
+        # affichage de la fenêtre de connexion et rapport de démarrage
+        self._login.update()
+        if startup.finish():
+            self.destroy()
+            return
+        # pendant la saisie de la clé : ouverture des connexions,
+        # lecture des instantanés taxonomy et import des modules
+        self._prewarmer = Prewarmer(preload=_import_main_modules).start()
+        # initialisation du gestionnaire d'événements
         self.mainloop()
 
     def _on_connexion(self, *_):
@@ -183,11 +205,20 @@ class Application(tk.Tk):
         2- si ok = construction de la homepage et fermeture de la login page
         3- si ko = envoi de l'erreur dans la login page et nettoyage"""
         logger.info('TRY API connection')
+        _import_main_modules()
+        env = self._login.var["environment"].get()
+        # session et instantané préparés pendant la saisie de la clé
+        session, snapshot = self._prewarmer.take(env)
         self.connexion = co.Connexion(
-            env=self._login.var["environment"].get(),
+            env=env,
             key_user=self._login.var["key"].get(),
-            test_mode=self._login.var["test_mode"].get()
+            test_mode=self._login.var["test_mode"].get(),
+            engine=("asyncio" if self._login.var["async_engine"].get()
+                    else "thread"),
+            session=session
             )
+        if snapshot is not None:
+            self.connexion.taxonomy.seed(snapshot)
         test_result = self.connexion.test_connexion()
         if isinstance(test_result, bool):
             logger.info('SUCCES API connection')
@@ -238,11 +269,16 @@ class Application(tk.Tk):
             self._homepage.bind('<<info_request>>', self._update_count)
             # on bind la fonction de recherche
             self._homepage.search.bind("<<OnSearch>>", self._on_search)
+            # pages de résultats ouvertes : identifiant Answer -> page
+            self._result_pages = {}
+            self._notebook.bind("<<NotebookTabClosed>>", self._on_tab_closed)
             # Signal pour supprimer la progressbar
             self._login_ready.set(True)
             # On supprime la page de login lorsque tout est initialisé
             self.deiconify()
             self._login.destroy()
+            # sessions préparées pour l'autre environnement
+            self._prewarmer.close()
             # mise à jour des compteurs de requêtes
             self._update_count()
             logger.info('SUCCESS homepage created')
@@ -318,6 +354,8 @@ class Application(tk.Tk):
         # appel de la fonction get() de SearchBloc afin de récolter les
         # informations données par l'utilisateur dans le formulaire
         data_from_dict = self._homepage.search.get()
+        # la case "Corpus local" n'est pas un critère de l'URL
+        local = data_from_dict.pop("local", False)
         # vérifier si le formulaire est bien complété
         # Si problème alors :
         # -fin de la recherche
@@ -336,8 +374,15 @@ class Application(tk.Tk):
         if "internal" in self.connexion.dict_answers:
             del self.connexion.dict_answers["internal"]
         # envoi requête à l'API
+        # seule la 1ère page est attendue, la page de résultats
+        # télécharge ensuite les suivantes ; les décisions alimentent
+        # le corpus local
         try:
-            self.connexion.send_request(url)
+            if local:
+                self.connexion.search_local(url)
+            else:
+                self.connexion.send_request(url, stream=True,
+                                            store_results=True)
         except exc.NoResult as e:
             logger.info('NO RESULT user API request')
             self.waiting_dialog.destroy()
@@ -374,18 +419,32 @@ class Application(tk.Tk):
                 if int(id) > last_id:
                     last_id = id
             last_answer = self.connexion.dict_answers[last_id]
-            self._result_page = result_page.ResultPage(
-                                    self._notebook,
-                                    last_answer)
-            self._notebook.add(self._result_page,
+            page = result_page.ResultPage(self._notebook, last_answer)
+            self._result_pages[last_answer.id_answer] = page
+            self._notebook.add(page,
                                text=f"Recherche {last_answer.id_answer}")
-            self._notebook.select(self._result_page)
+            self._notebook.select(page)
+            # compteurs mis à jour à la fin du téléchargement des pages
+            page.bind("<<AnswerComplete>>", self._update_count)
             # mise à jour de la variable qui indique
             # la fin du traitement dans le thread
             self._search_done.set(True)
             # mise à jour des compteurs de requêtes
             self._update_count()
 
+    def _on_tab_closed(self, *_):
+        """
+        Détruit les pages de résultats dont l'onglet a été fermé.
+        Leurs objets Answer peuvent alors être évincés de la mémoire
+        (cf. AnswerRegistry).
+        """
+        open_tabs = set(self._notebook.tabs())
+        for id_answer, page in list(self._result_pages.items()):
+            if str(page) not in open_tabs:
+                page.destroy()
+                del self._result_pages[id_answer]
+                self.connexion.dict_answers.release(id_answer)
+
     def _custom_hook_search(self, args: threading.ExceptHookArgs):
         """
         Fonction pour gérer les exceptions qui ne sont pas déjà gérées
@@ -423,7 +482,7 @@ class Application(tk.Tk):
             self._add_criterias_in_url(url, data_from_dict)
         return url
 
-    def _add_criterias_in_url(self, url: api_url.UrlBase, data: dict):
+    def _add_criterias_in_url(self, url: "api_url.UrlBase", data: dict):
         """
         Ajoute les critères à l'objet URL et vide le dictionnaire
         """
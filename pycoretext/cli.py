@@ -0,0 +1,348 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Mode ligne de commande, sans interface graphique (tâches planifiées).
+Les décisions sont téléchargées page après page avec les mêmes outils
+que l'application (Connexion.iter_decisions, api_url) et écrites au fil
+de l'eau au format JSONL (une décision JSON par ligne) : la mémoire
+utilisée ne dépend pas du nombre de résultats.
+Ni tkinter ni pandas ne sont importés.
+
+La commande sync met à jour le corpus local (api_sync.DeltaSync) avec
+les décisions créées, modifiées ou supprimées depuis la dernière
+synchronisation.
+
+Exemples :
+    python -m pycoretext export --jurisdiction cc --chamber soc \\
+        --date-start 2023-01-01 --date-end 2023-03-31 -o soc.jsonl
+    python -m pycoretext sync --env production
+    python -m pycoretext snapshot --env production
+La commande snapshot régénère l'instantané taxonomy livré avec
+l'application (api_taxonomy.bundled_snapshot_path).
+La clé API est lue dans --key ou dans la variable PYCORETEXT_KEY.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+from pycoretext import exceptions as exc
+from pycoretext.api_controller import api_connexion as co, api_url
+from pycoretext.api_controller.api_sync import DeltaSync
+from pycoretext.api_controller.api_taxonomy import bundled_snapshot_path
+
+logger = logging.getLogger('flux.cli')
+
+# critères répétables : option -> critère Judilibre
+LIST_CRITERIAS = {
+    "jurisdiction": "jurisdiction=",
+    "chamber": "chamber=",
+    "type": "type=",
+    "publication": "publication=",
+    "solution": "solution=",
+    "location": "location=",
+}
+# critères simples : option -> critère Judilibre
+SINGLE_CRITERIAS = {
+    "date_start": "date_start=",
+    "date_end": "date_end=",
+    "date_type": "date_type=",
+}
+# secondes minimales entre deux lignes de progression
+PROGRESS_INTERVAL = 2.0
+
+
+def build_parser():
+    """
+    Analyseur des arguments de la ligne de commande
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m pycoretext",
+        description="PYCORETEXT sans interface graphique")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser(
+        "export",
+        help="télécharge les décisions au format JSONL",
+        description="Télécharge toutes les décisions correspondant aux "
+                    "critères (Export, ou Search si --query est donné) "
+                    "et les écrit au format JSONL.")
+    _add_connexion_arguments(export)
+    export.add_argument("--engine", choices=["thread", "asyncio"],
+                        default="thread", help="moteur de requêtage")
+    export.add_argument("--query", help="mots clés (requête Search)")
+    for option in LIST_CRITERIAS:
+        export.add_argument(f"--{option}", action="append", default=[],
+                            metavar="CODE",
+                            help="répétable (valeurs combinées par OU)")
+    for option in SINGLE_CRITERIAS:
+        export.add_argument(f"--{option.replace('_', '-')}", dest=option,
+                            metavar="VALEUR")
+    export.add_argument("-c", "--criteria", action="append", default=[],
+                        metavar="NOM=VALEUR",
+                        help="tout autre critère Judilibre (répétable)")
+    export.add_argument("-o", "--output", default="-",
+                        help="fichier JSONL (défaut : sortie standard)")
+    export.add_argument("--no-text", action="store_true",
+                        help="n'écrit pas le texte intégral")
+    _add_output_arguments(export)
+    sync = commands.add_parser(
+        "sync",
+        help="met à jour le corpus local",
+        description="Applique au corpus local les décisions créées, "
+                    "modifiées ou supprimées depuis la dernière "
+                    "synchronisation (historique des transactions).")
+    _add_connexion_arguments(sync)
+    sync.add_argument("--since", metavar="DATE",
+                      help="point de départ (défaut : dernière "
+                           "synchronisation)")
+    sync.add_argument("--jurisdiction", action="append", default=[],
+                      metavar="CODE",
+                      help="juridiction suivie, répétable (défaut : "
+                           "celles du corpus local)")
+    _add_output_arguments(sync)
+    snapshot = commands.add_parser(
+        "snapshot",
+        help="régénère l'instantané taxonomy livré",
+        description="Télécharge toutes les listes taxonomy et les écrit "
+                    "dans l'instantané livré avec l'application.")
+    _add_connexion_arguments(snapshot)
+    snapshot.add_argument("-o", "--output",
+                          help="fichier JSON (défaut : instantané livré "
+                               "de l'environnement)")
+    _add_output_arguments(snapshot)
+    return parser
+
+
+def _add_connexion_arguments(parser):
+    """
+    Options de connexion communes aux commandes
+    """
+    parser.add_argument("--key", default=os.environ.get("PYCORETEXT_KEY"),
+                        help="clé API (défaut : variable PYCORETEXT_KEY)")
+    parser.add_argument("--env", choices=["sandbox", "production"],
+                        default="sandbox", help="environnement Judilibre")
+    parser.add_argument("--endpoint",
+                        help="url de base de l'API (remplace --env)")
+
+
+def _add_output_arguments(parser):
+    """
+    Options du journal communes aux commandes
+    """
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="ni progression ni avertissement")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="journal détaillé des requêtes")
+
+
+def build_url(args):
+    """
+    Objet Url (Search si --query, sinon Export) construit à partir des
+    arguments
+    """
+    url = api_url.UrlSearch(args.query) if args.query else api_url.UrlExport()
+    for option, criteria in LIST_CRITERIAS.items():
+        for value in getattr(args, option):
+            url.set_criteria(criteria, value)
+    for option, criteria in SINGLE_CRITERIAS.items():
+        value = getattr(args, option)
+        if value:
+            url.set_criteria(criteria, value)
+    for item in args.criteria:
+        name, sep, value = item.partition("=")
+        if not sep or not name:
+            raise exc.WrongCriteria(item, "Critère attendu : NOM=VALEUR")
+        url.set_criteria(name + "=", value)
+    return url
+
+
+def _configure_logging(verbose, quiet):
+    """
+    Journal des loggers 'flux' et 'api' sur la sortie d'erreur
+    """
+    level = (logging.DEBUG if verbose
+             else logging.ERROR if quiet else logging.WARNING)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(
+        '[%(asctime)s] %(levelname)s // %(name)s // %(message)s',
+        datefmt='%m-%d-%Y %H:%M:%S'))
+    for name in ("flux", "api"):
+        log = logging.getLogger(name)
+        log.setLevel(level)
+        log.addHandler(handler)
+
+
+def _report(out, written, total, start, final=False):
+    """
+    Ligne de progression (débit) sur la sortie d'erreur
+    """
+    elapsed = time.monotonic() - start
+    rate = written / elapsed if elapsed else 0.0
+    label = "Terminé" if final else "En cours"
+    out.write(f"{label} : {written}/{total} décisions en {elapsed:.1f} s "
+              f"({rate:.1f} décisions/s)\n")
+    out.flush()
+
+
+def run_export(args, stderr=sys.stderr):
+    """
+    Exécute la commande export. Retourne le code de sortie :
+    0 = succès, 1 = erreur ou pages manquantes
+    """
+    if not args.key:
+        stderr.write("Clé API manquante (--key ou PYCORETEXT_KEY)\n")
+        return 1
+    try:
+        url = build_url(args)
+    except exc.WrongCriteria as e:
+        stderr.write(f"Critère erroné : {e.criteria} {e.message}\n")
+        return 1
+    # pas de stock local ni de textes sur disque : chaque page est
+    # écrite puis oubliée
+    connexion = co.Connexion(args.key, env=args.env, engine=args.engine,
+                             store=False, spill_texts=False)
+    if args.endpoint:
+        connexion.endpoint = args.endpoint.rstrip("/")
+    # objet Answer transmis par iter_decisions dès la 1ère page
+    answers = []
+    written = 0
+    start = last_report = time.monotonic()
+    out = (sys.stdout if args.output == "-"
+           else open(args.output, "w", encoding="utf-8"))
+    logger.info(f'START export => {args.output}')
+    try:
+        for decision in connexion.iter_decisions(url, answers.append):
+            out.write(json.dumps(
+                decision.to_dict(with_text=not args.no_text),
+                ensure_ascii=False))
+            out.write("\n")
+            written += 1
+            now = time.monotonic()
+            if not args.quiet and now - last_report >= PROGRESS_INTERVAL:
+                _report(stderr, written, answers[0].total_decisions, start)
+                last_report = now
+        out.flush()
+    except exc.WrongCriteria as e:
+        stderr.write(f"Critère erroné : {e.criteria} {e.message}\n")
+        return 1
+    except exc.ERRORS as e:
+        stderr.write(f"Requête impossible : {e}\n")
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if not answers:
+        stderr.write("Aucun résultat trouvé.\n")
+        return 0
+    answer = answers[0]
+    logger.info(f'END export : {written} decisions')
+    if not args.quiet:
+        _report(stderr, written, answer.total_decisions, start, final=True)
+    if answer.wrong_urls:
+        stderr.write(f"{len(answer.wrong_urls)} page(s) en erreur :\n")
+        for wrong_url in answer.wrong_urls:
+            stderr.write(f"  {wrong_url}\n")
+        return 1
+    return 0
+
+
+def run_sync(args, stderr=sys.stderr):
+    """
+    Exécute la commande sync. Retourne le code de sortie :
+    0 = succès, 1 = erreur ou décisions non synchronisées
+    """
+    if not args.key:
+        stderr.write("Clé API manquante (--key ou PYCORETEXT_KEY)\n")
+        return 1
+    connexion = co.Connexion(args.key, env=args.env, spill_texts=False)
+    if args.endpoint:
+        connexion.endpoint = args.endpoint.rstrip("/")
+    try:
+        summary = DeltaSync(connexion).run(
+            since=args.since, jurisdictions=args.jurisdiction or None)
+    except exc.WrongCriteria as e:
+        stderr.write(f"Critère erroné : {e.criteria} {e.message}\n")
+        return 1
+    except exc.NoResult as e:
+        stderr.write(f"Synchronisation impossible : {e.message}\n")
+        return 1
+    except exc.ERRORS as e:
+        stderr.write(f"Requête impossible : {e}\n")
+        return 1
+    if not args.quiet:
+        stderr.write(
+            f"Depuis {summary['since']} : {summary['changed']} décisions "
+            f"modifiées, {summary['received']} reçues, "
+            f"{summary['deleted']} supprimées\n")
+    if summary["failed"] or summary["failed_pages"]:
+        stderr.write(f"{summary['failed']} décision(s) et "
+                     f"{summary['failed_pages']} page(s) en erreur : "
+                     "le point de synchronisation n'a pas avancé\n")
+        return 1
+    return 0
+
+
+def run_snapshot(args, stderr=sys.stderr):
+    """
+    Exécute la commande snapshot. Retourne le code de sortie :
+    0 = succès, 1 = erreur
+    """
+    if not args.key:
+        stderr.write("Clé API manquante (--key ou PYCORETEXT_KEY)\n")
+        return 1
+    connexion = co.Connexion(args.key, env=args.env, cache=False,
+                             store=False)
+    if args.endpoint:
+        connexion.endpoint = args.endpoint.rstrip("/")
+    try:
+        data = connexion.taxonomy.refresh(revalidate=True)
+    except exc.ERRORS as e:
+        stderr.write(f"Requête impossible : {e}\n")
+        return 1
+    path = args.output or bundled_snapshot_path(args.env)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    if not args.quiet:
+        stderr.write(f"Instantané écrit : {path}\n")
+    return 0
+
+
+def main(argv=None):
+    """
+    Point d'entrée : python -m pycoretext <commande> ...
+    Sans argument, l'application graphique est lancée.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        from pycoretext import startup
+        startup.install()
+        from pycoretext import application
+        application.Application()
+        return 0
+    args = build_parser().parse_args(argv)
+    _configure_logging(args.verbose, args.quiet)
+    if args.command == "export":
+        return run_export(args)
+    if args.command == "sync":
+        return run_sync(args)
+    if args.command == "snapshot":
+        return run_snapshot(args)
+    return 1
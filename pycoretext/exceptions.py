@@ -18,19 +18,26 @@
 Module qui rassemble les exceptions gérées dans le projet pycoretext
 """
 
-import requests
-import ratelimit
-
-# variable utilisée dans les différents modules du projet
-# liste les exceptions à gérer lors d'une requête API
-ERRORS = (
-    requests.HTTPError,
-    requests.exceptions.Timeout,
-    ratelimit.RateLimitException,
-    requests.ConnectionError,
-    AttributeError,
-    ValueError,
-    requests.exceptions.RequestException)
+
+def __getattr__(name):
+    """
+    ERRORS : variable utilisée dans les différents modules du projet,
+    elle liste les exceptions à gérer lors d'une requête API.
+    Elle est créée au premier accès : requests n'est pas importé au
+    démarrage de l'application (cf. module startup).
+    """
+    if name != "ERRORS":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import requests
+    global ERRORS
+    ERRORS = (
+        requests.HTTPError,
+        requests.exceptions.Timeout,
+        requests.ConnectionError,
+        AttributeError,
+        ValueError,
+        requests.exceptions.RequestException)
+    return ERRORS
 
 
 class WrongCriteria(Exception):
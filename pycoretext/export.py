@@ -0,0 +1,184 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Export des métadonnées d'une réponse (Excel, CSV ou Parquet).
+Les lignes sont écrites au fil de l'eau à partir de la table en colonnes
+de la réponse (cf. api_table) : aucune copie complète des données n'est
+construite. Les fonctions peuvent être exécutées dans un thread ; la
+progression est transmise par une fonction de rappel.
+"""
+
+import csv
+import json
+import os
+import re
+import importlib.util
+import logging
+from pathlib import Path
+
+logger = logging.getLogger('flux.export')
+
+# formats proposés : extension -> libellé
+FORMATS = {
+    "xlsx": "Classeur Excel",
+    "csv": "CSV (séparateur ;)",
+    "parquet": "Parquet",
+}
+# nombre de lignes entre deux appels de la fonction de progression
+PROGRESS_STEP = 200
+# caractères de contrôle refusés par openpyxl (IllegalCharacterError),
+# identique à openpyxl.cell.cell.ILLEGAL_CHARACTERS_RE qui n'est pas
+# importé ici (openpyxl n'est chargé que pour l'export Excel)
+ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+
+class ExportCancelled(Exception):
+    """
+    L'utilisateur a interrompu l'export
+    """
+
+
+def available_formats():
+    """
+    Formats utilisables : Parquet nécessite pyarrow (facultatif)
+    """
+    formats = dict(FORMATS)
+    if importlib.util.find_spec("pyarrow") is None:
+        del formats["parquet"]
+    return formats
+
+
+def cell_value(value):
+    """
+    Convertit une métadonnée en valeur simple (texte, nombre ou None).
+    Les caractères de contrôle sont retirés des textes.
+    """
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    if isinstance(value, (list, tuple)) and all(
+            isinstance(item, (str, int, float)) for item in value):
+        value = ", ".join(str(item) for item in value)
+    else:
+        value = json.dumps(value, ensure_ascii=False)
+    return ILLEGAL_CHARACTERS_RE.sub("", value)
+
+
+def export_table(table, path, fmt=None, progress=None, cancel=None):
+    """
+    Ecrit la table (DecisionTable) dans le fichier 'path'.
+    'fmt' : xlsx, csv ou parquet (par défaut, l'extension du fichier)
+    'progress' : fonction appelée avec (lignes écrites, total)
+    'cancel' : threading.Event ; s'il est activé, l'export s'arrête,
+    le fichier incomplet est supprimé et ExportCancelled est levée.
+    Retourne le nombre de lignes écrites.
+    """
+    path = Path(path)
+    fmt = (fmt or path.suffix.lstrip(".")).lower()
+    writers = {"xlsx": _write_xlsx, "csv": _write_csv,
+               "parquet": _write_parquet}
+    if fmt not in writers:
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+    total = len(table)
+    header = ["id_decision"] + list(table.columns)
+
+    def rows():
+        for count, (key, values) in enumerate(table.iter_rows(), start=1):
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled()
+            yield [key] + [cell_value(value) for value in values]
+            if progress is not None and (count % PROGRESS_STEP == 0
+                                         or count == total):
+                progress(count, total)
+
+    logger.info(f'START export {fmt} : {total} rows => {path}')
+    try:
+        written = writers[fmt](path, header, rows())
+    except BaseException:
+        # fichier incomplet (erreur ou annulation)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    logger.info(f'END export {fmt} : {written} rows')
+    return written
+
+
+def _write_xlsx(path, header, rows):
+    """
+    Classeur openpyxl en mode écriture seule : les lignes ne sont pas
+    conservées en mémoire
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Décisions")
+    sheet.append(header)
+    written = 0
+    for row in rows:
+        sheet.append(row)
+        written += 1
+    workbook.save(path)
+    return written
+
+
+def _write_csv(path, header, rows):
+    """
+    CSV lisible par Excel (UTF-8 avec BOM, séparateur ;)
+    """
+    written = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    return written
+
+
+def _write_parquet(path, header, rows, chunk_size=1000):
+    """
+    Fichier Parquet écrit par groupes de 'chunk_size' lignes
+    (colonnes texte, identifiant entier)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(header[0], pa.int64())]
+                       + [(name, pa.string()) for name in header[1:]])
+
+    def to_batch(chunk):
+        columns = list(zip(*chunk))
+        arrays = [pa.array(columns[0], pa.int64())]
+        arrays += [pa.array([None if value is None else str(value)
+                             for value in column], pa.string())
+                   for column in columns[1:]]
+        return pa.record_batch(arrays, schema=schema)
+
+    written = 0
+    with pq.ParquetWriter(str(path), schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                writer.write_batch(to_batch(chunk))
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_batch(to_batch(chunk))
+            written += len(chunk)
+    return written
@@ -0,0 +1,224 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Mesure du démarrage de l'application, y compris dans l'exécutable
+PyInstaller où l'option "python -X importtime" n'existe pas.
+Avec la variable d'environnement PYCORETEXT_STARTUP_REPORT=1, la durée
+de chaque import et des étapes du démarrage est écrite dans le journal
+une fois la fenêtre de connexion affichée.
+Les modules lourds (DEFERRED_MODULES) ne doivent pas être chargés avant
+cette fenêtre : ils sont importés au premier usage.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import logging
+from importlib.abc import Loader, MetaPathFinder
+
+logger = logging.getLogger('flux.startup')
+
+# active la mesure des imports et le rapport
+REPORT_VAR = "PYCORETEXT_STARTUP_REPORT"
+# l'application s'arrête une fois la fenêtre de connexion affichée et
+# écrit le résumé (JSON) sur la sortie standard (cf. bench_startup)
+EXIT_VAR = "PYCORETEXT_STARTUP_EXIT"
+# modules chargés au premier usage, jamais avant la fenêtre de connexion
+DEFERRED_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow", "requests",
+                    "urllib3", "backoff", "aiohttp", "psutil", "sqlite3")
+
+# référence des mesures : 1er import de ce module
+_start = time.perf_counter()
+# étapes : (libellé, secondes depuis _start)
+_marks = []
+# imports mesurés : nom -> [profondeur, propre (µs), cumulé (µs)]
+_imports = {}
+_timer = None
+
+
+def enabled():
+    """
+    Vrai si le rapport de démarrage est demandé
+    """
+    return os.environ.get(REPORT_VAR, "") not in ("", "0")
+
+
+def exit_requested():
+    """
+    Vrai si l'application doit s'arrêter après la fenêtre de connexion
+    """
+    return os.environ.get(EXIT_VAR, "") not in ("", "0")
+
+
+def install():
+    """
+    Installe la mesure des imports si le rapport est demandé.
+    A appeler le plus tôt possible (point d'entrée).
+    """
+    global _timer
+    if _timer is None and (enabled() or exit_requested()):
+        _timer = _ImportTimer()
+        sys.meta_path.insert(0, _timer)
+
+
+def uninstall():
+    """
+    Fin de la mesure des imports
+    """
+    global _timer
+    if _timer is not None:
+        sys.meta_path.remove(_timer)
+        _timer = None
+
+
+def mark(label):
+    """
+    Enregistre une étape du démarrage
+    """
+    _marks.append((label, time.perf_counter() - _start))
+
+
+def loaded_deferred():
+    """
+    Modules lourds déjà chargés
+    """
+    return [name for name in DEFERRED_MODULES if name in sys.modules]
+
+
+def summary():
+    """
+    Résumé : étapes (ms), modules lourds chargés et nombre d'imports
+    """
+    return {
+        "marks": {label: round(seconds * 1000, 1)
+                  for label, seconds in _marks},
+        "deferred_loaded": loaded_deferred(),
+        "imports": len(_imports),
+    }
+
+
+def report(top=25):
+    """
+    Rapport texte : étapes, modules lourds chargés et imports les plus
+    longs, au format de "python -X importtime"
+    """
+    lines = [f"{label} : {seconds * 1000:.0f} ms"
+             for label, seconds in _marks]
+    lines.append("Modules différés déjà chargés : "
+                 + (", ".join(loaded_deferred()) or "aucun"))
+    if _imports:
+        lines.append("import time: self [us] | cumulative | imported package")
+        slowest = sorted(_imports.items(), key=lambda item: -item[1][2])
+        for name, (depth, own, cumulative) in slowest[:top]:
+            lines.append(f"import time: {own:>9} | {cumulative:>10} | "
+                         f"{'  ' * depth}{name}")
+    return "\n".join(lines)
+
+
+def finish():
+    """
+    Fenêtre de connexion affichée : écrit le rapport et arrête la mesure.
+    Retourne True si l'application doit s'arrêter (cf. EXIT_VAR).
+    """
+    mark("Fenêtre de connexion affichée")
+    uninstall()
+    if enabled():
+        logger.info("Startup report\n" + report())
+    if exit_requested():
+        print(json.dumps(summary()), flush=True)
+        return True
+    return False
+
+
+class _ImportTimer(MetaPathFinder):
+    """
+    Finder placé en tête de sys.meta_path : il délègue la recherche aux
+    autres finders et enveloppe le loader trouvé pour mesurer l'import
+    """
+
+    def __init__(self):
+        """
+        Constructeur de l'instance
+        """
+        # imports en cours (par thread) : durée des imports enfants
+        self._local = threading.local()
+
+    @property
+    def stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self, fullname)
+        return spec
+
+    def measure(self, name, func, *args):
+        """
+        Exécute func(*args) et ajoute sa durée (propre et cumulée) à
+        celle de l'import 'name'
+        """
+        stack = self.stack
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            entry = _imports.setdefault(name, [len(stack), 0, 0])
+            entry[1] += int((elapsed - children) * 1e6)
+            entry[2] += int(elapsed * 1e6)
+
+
+class _TimedLoader(Loader):
+    """
+    Enveloppe d'un loader : le module retrouve son loader d'origine
+    avant d'être exécuté
+    """
+
+    def __init__(self, loader, timer, name):
+        """
+        Constructeur de l'instance
+        """
+        self.loader = loader
+        self.timer = timer
+        self.name = name
+
+    def create_module(self, spec):
+        # les modules compilés (extensions) sont chargés ici
+        return self.timer.measure(self.name, self.loader.create_module,
+                                  spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.timer.measure(self.name, self.loader.exec_module, module)
@@ -22,7 +22,7 @@ permettra de faire sélectionner des critères et de lancer des recherches
 import tkinter as tk
 from tkinter import ttk
 from pycoretext import widgets as w
-from pycoretext.api_controller import api_url, api_connexion as co
+from pycoretext.api_controller import api_connexion as co
 from pycoretext import exceptions as exc
 import logging
 
@@ -33,6 +33,10 @@ class SearchBloc(ttk.Frame):
     """
     Frame principal qui contiendra les sous_frames de la recherche
     """
+    # intervalle (ms) de vérification du rafraîchissement de la taxonomy
+    taxonomy_poll_interval = 1000
+    # liste de la taxonomy => variable du formulaire (si nom différent)
+    taxonomy_vars = {"filetype": "withFileOfType"}
 
     def __init__(self, master, connexion, *args, **kwargs):
         """
@@ -66,18 +70,54 @@ class SearchBloc(ttk.Frame):
             "location ca": tk.StringVar(),
             "location tj": tk.StringVar(),
             "location tcom": tk.StringVar(),
-            "withFileOfType": tk.StringVar()
+            "withFileOfType": tk.StringVar(),
+            # recherche dans le corpus local plutôt que dans Judilibre
+            "local": tk.BooleanVar()
         }
         # récupérer les données dynamiquement pour les inputs
         try:
             logger.info('TRY get data for input')
-            self._data = SearchData(self.connexion).data
+            search_data = SearchData(self.connexion)
+            self._data = search_data.data
+            self._data_version = search_data.version
         except exc.ERRORS as e:
             logger.error('FAIL get data for input')
             raise e
         else:
             logger.info('SUCCESS get data for input')
             self._create_form()
+            # listes issues d'un instantané : elles sont remplacées dès
+            # la fin de leur rafraîchissement, même s'il s'est terminé
+            # pendant la construction du formulaire (cf. _poll_taxonomy)
+            self.after(self.taxonomy_poll_interval, self._poll_taxonomy)
+
+    def _poll_taxonomy(self):
+        """
+        Vérifie (thread Tk) si le rafraîchissement de la taxonomy en
+        arrière-plan a remplacé les listes affichées. La vérification
+        est répétée tant qu'un rafraîchissement est en cours.
+        """
+        if not self.winfo_exists():
+            return
+        taxonomy = self.connexion.taxonomy
+        version, data = taxonomy.current()
+        if version != self._data_version:
+            self._data, self._data_version = data, version
+            self._update_lists()
+        elif taxonomy.refreshing:
+            self.after(self.taxonomy_poll_interval, self._poll_taxonomy)
+
+    def _update_lists(self):
+        """
+        Remplace les valeurs des listes du formulaire par celles de
+        la taxonomy (self._data)
+        """
+        logger.info('UPDATE form lists from refreshed taxonomy')
+        for criteria, items_list in self._data.items():
+            var = self._vars.get(self.taxonomy_vars.get(criteria, criteria))
+            widget = getattr(var, "label_widget", None)
+            if widget is not None:
+                widget.set_items(items_list)
 
     def _create_form(self):
         """
@@ -297,6 +337,11 @@ class SearchBloc(ttk.Frame):
                                         text="Effacer les critères",
                                         command=self._reset)
         self._reset_button.grid(row=0, column=1, sticky=tk.W + tk.E)
+        # recherche hors ligne dans les décisions déjà téléchargées
+        self._local_check = ttk.Checkbutton(buttons_frame,
+                                            text="Corpus local",
+                                            variable=self._vars["local"])
+        self._local_check.grid(row=0, column=2, sticky=tk.E, padx=(6, 0))
 
     def _on_search(self, *_):
         """
@@ -377,90 +422,14 @@ class SearchData:
     def __init__(self, connexion: co.Connexion):
         """
         Fonction d'initialisation
+        Les listes proviennent du stock taxonomy de la connexion
+        (instantané local ou téléchargement simultané des listes)
         """
         self.connexion = connexion
-        main_list = self._create_main_list()
         # variables qui contiendront les listes des critères
-        self.data = {
-            "chamber": self._create_sub_list("chamber"),
-            "formation": self._create_sub_list("formation"),
-            "theme": self._create_sub_list("theme"),
-            "theme ca": self._create_sub_list("theme ca"),
-            "type": self._create_sub_list("type"),
-            "publication": self._create_sub_list("publication"),
-            "solution": self._create_sub_list("solution"),
-            "jurisdiction": self._create_sub_list("jurisdiction"),
-            "operator": self._create_sub_list("operator"),
-            "idT": main_list,
-            "location ca": self._create_sub_list("location ca"),
-            "location tj": self._create_sub_list("location tj"),
-            "location tcom": self._create_sub_list("location tcom"),
-            "filetype": self._create_sub_list("filetype")
-        }
-        # vider le dictionnaire
-        self.connexion.dict_answers.clear()
-
-    def _create_main_list(self):
-        """
-        Crée la liste principale des critères
-        """
-        all_criteria_url = api_url.UrlTaxonomy()
-        # critère "id=" mais pas de valeur pour avoir la totale
-        all_criteria_url.set_criteria("id=", "")
         try:
-            self.connexion.send_request(all_criteria_url, internal=True)
+            self.connexion.taxonomy.load()
         except exc.ERRORS as e:
             raise e
-        else:
-            # on supprime les valeurs sans intérêt
-            to_return = self.connexion.dict_answers["internal"].list_results
-            to_return.remove("cc")
-            to_return.remove("ca")
-            to_return.remove("tj")
-            to_return.remove("tcom")
-            to_return.remove("all")
-            return to_return
-
-    def _create_sub_list(self, criteria: str):
-        """
-        Crée la liste pour un ou plusieurs critères définis
-        """
-        # création de l'ojet URL
-        criteria_url = api_url.UrlTaxonomy()
-        # le cas échéant, id et context_value séparés par un espace
-        # il faut le gérer :
-        if " " in criteria:
-            list_criterias = criteria.split(" ")
-            criteria_url.set_criteria("id=", list_criterias[0])
-            criteria_url.set_criteria("context_value=", list_criterias[1])
-        else:
-            criteria_url.set_criteria("id=", criteria)
-        # On récupère les données
-        try:
-            self.connexion.send_request(criteria_url, internal=True)
-        except exc.ERRORS as e:
-            raise e
-        else:
-            # les thèmes sont liés soit au cc, soit au ca = tri à effectuer
-            if criteria == "theme":
-                data = self.connexion.dict_answers["internal"].list_results
-            elif criteria == "theme ca":
-                # les thèmes ca ne sont pas encore correctement gérées par
-                # l'API. Suivre les améliorations pour ajuster les dev.
-                data = []
-                for key, values in (
-                        self.connexion.dict_answers["internal"].
-                        dict_results.items()):
-                    # on met en valeur les dés entre des astérisques
-                    data.append("**" + str(key) + "**")
-                    # on poursuit avec les autres valeurs
-                    for value in values:
-                        data.append(value)
-            # dans tous les autres cas :
-            else:
-                data = list(
-                    self.connexion.dict_answers["internal"].dict_results.keys()
-                           )
-                # Tri ascendant de la liste
-                data = sorted(data)
-            return data
+        # listes et version lues ensemble (cf. SearchBloc._poll_taxonomy)
+        self.version, self.data = self.connexion.taxonomy.current()
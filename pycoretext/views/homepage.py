@@ -23,7 +23,7 @@ Une classe générale accompagnée de 3 sous-classes :
 import threading
 import tkinter as tk
 from tkinter import ttk
-from datetime import date as d, timedelta as td
+from datetime import date as d
 from pycoretext import exceptions as exc, widgets as w
 from pycoretext.api_controller import api_url
 from pycoretext.widgets import place_windows, CustomMessageBox
@@ -356,91 +356,33 @@ class StatsBlocData:
 
     def _build_lists(self):
         """
-        Complète les listes _all, _cc, _ca et _tj puis les retourne
+        Complète les listes _all, _cc, _ca, _tj et _tcom à partir des
+        statistiques de la connexion (agrégées et mises en cache)
         """
-        # Information de date utile pour les futures requêtes
-        today = d.today()
-        diff1 = td(days=1)
-        yesterday = today - diff1
-        month = str(today.month)
-        first_day_month = today.replace(day=1)
-        last_day_of_prev_month = today.replace(day=1) - td(days=1)
-        start_day_of_prev_month = today.replace(day=1) - td(
-                                        days=last_day_of_prev_month.day)
-        previous_month = last_day_of_prev_month.month
-        # 1/ collecter les infos générales
+        periods = self.connexion.stats.periods(d.today())
+        month = periods["month"][0].month
+        previous_month = periods["previous_month"][0].month
         try:
-            self.connexion.send_request(api_url.UrlStats(), internal=True)
+            stats = self.connexion.stats.get()
         except exc.ERRORS as e:
             raise e
-        else:
-            dict_answer = self.connexion.dict_answers["internal"]
-            results = dict_answer.dict_from_response["results"]
-            self._dict_lists["all"].append(
-                            ("Nb total des textes",
-                             "{:,}".format(results["total_decisions"])))
-            self._dict_lists["all"].append(
-                            ("Date créa. la plus récente",
-                             results["max_decision_date"]))
-        # 2/ collecte de statistiques par juridiction
-        # 2.1/ nb de textes par juridiction
-            for juris in ["cc", "ca", "tj", "tcom"]:
-                try:
-                    url = api_url.UrlStats()
-                    url.set_criteria("jurisdiction=", juris)
-                    self.connexion.send_request(url, internal=True)
-                except exc.ERRORS as e:
-                    raise e
-                else:
-                    dict_answer = self.connexion.dict_answers["internal"]
-                    results = dict_answer.dict_from_response["results"]
-                    self._dict_lists[juris].append(
-                                ("Nb textes", "{:,}".format(
-                                    results["total_decisions"])))
-            # 2.2/ Requêtes sur des périodes spécifiques
-            # (interne) constantes pour les requêtes :
-            # requêtes pour chaque organisme
-            for orga in ["cc", "ca", "tj", "tcom"]:
-                self._date_request(
-                    "Créés hier",
-                    yesterday,
-                    yesterday,
-                    orga
-                )
-            for orga in ["cc", "ca", "tj", "tcom"]:
-                self._date_request(
-                    f"Créés mois en cours ({str(month)})",
-                    first_day_month,
-                    today, orga
-                )
-            for orga in ["cc", "ca", "tj", "tcom"]:
-                self._date_request(
-                    f"Créés mois passé ({str(previous_month)})",
-                    start_day_of_prev_month,
-                    last_day_of_prev_month, orga
-                )
-
-    def _date_request(self, label, date_start, date_end,
-                      jurisdiction):
-        # transformation en string
-        date_start, date_end = str(date_start), str(date_end)
-        # création de l'URL EXPORT
-        url = api_url.UrlStats(integral=False)
-        url.set_criteria('date_start=', date_start)
-        url.set_criteria('date_end=', date_end)
-        url.set_criteria('jurisdiction=', jurisdiction)
-        try:
-            self.connexion.send_request(url, internal=True)
-        except exc.ERRORS as e:
-            raise e
-        except exc.NoResult:
-            self._dict_lists[jurisdiction].append((label, "0"))
-        else:
-            dict_answer = self.connexion.dict_answers["internal"]
-            results = dict_answer.dict_from_response["results"]
-            self._dict_lists[jurisdiction].append(
-                            (label,
-                             "{:,}".format(results["total_decisions"])))
+        # 1/ infos générales
+        self._dict_lists["all"].append(
+                        ("Nb total des textes",
+                         "{:,}".format(stats["total"])))
+        self._dict_lists["all"].append(
+                        ("Date créa. la plus récente", stats["max_date"]))
+        # 2/ statistiques par juridiction
+        labels = [
+            ("total", "Nb textes"),
+            ("yesterday", "Créés hier"),
+            ("month", f"Créés mois en cours ({str(month)})"),
+            ("previous_month", f"Créés mois passé ({str(previous_month)})")
+        ]
+        for juris, values in stats["jurisdictions"].items():
+            for key, label in labels:
+                self._dict_lists[juris].append(
+                                (label, "{:,}".format(values[key])))
 
     def _get_data(self):
         "retourne les quatre listes pour construction des labels"
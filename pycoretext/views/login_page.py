@@ -47,7 +47,8 @@ class LoginPage(tk.Toplevel):
             "environment": tk.StringVar(),
             "key": tk.StringVar(),
             "error_message": tk.StringVar(),
-            "test_mode": tk.BooleanVar()
+            "test_mode": tk.BooleanVar(),
+            "async_engine": tk.BooleanVar()
                     }
         # tracer la variable de message d'erreur
         self.var["error_message"].trace_add("write", self._on_error)
@@ -139,6 +140,12 @@ class LoginPage(tk.Toplevel):
                                         variable=self.var['test_mode'])
         test_checkbox.grid(column=0, row=7, sticky=tk.W)
 
+        # Checkbox pour le moteur de requêtes asynchrone (aiohttp)
+        async_checkbox = ttk.Checkbutton(main_frame,
+                                         text='Moteur asyncio',
+                                         variable=self.var['async_engine'])
+        async_checkbox.grid(column=0, row=7, sticky=tk.E)
+
     def _fill_oridata(self):
         """
         Récupère un fichier externe pour compléter oridata
@@ -0,0 +1,145 @@
+# Copyright 2022, Yohan Chevalier
+# This file is part of PYCORETEXT.
+
+# PYCORETEXT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# PYCORETEXT is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with PYCORETEXT. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Mise en forme des métadonnées d'une décision pour le widget Text de la
+page de résultats.
+Le rendu est construit en une seule chaîne accompagnée de la liste des
+hyperliens (début, fin, url) : le widget est alimenté en un seul appel
+à Text.insert, puis les liens sont appliqués.
+"""
+
+import re
+
+# balise <a ... href="url" ...>cible</a> (guillemets facultatifs)
+HYPERLINK_RE = re.compile(
+    r"""<a\b[^>]*?\bhref\s*=\s*["']?(?P<url>[^"'\s>]*)["']?[^>]*>"""
+    r"(?P<target>.*?)</a\s*>",
+    re.IGNORECASE | re.DOTALL)
+
+
+def render_meta(dict_meta: dict):
+    """
+    Retourne (texte, liens) pour un dictionnaire de métadonnées.
+    'liens' est une liste de tuples (début, fin, url), les positions
+    étant des nombres de caractères depuis le début du texte.
+    """
+    parts = []
+    spans = []
+    # position courante dans le texte final
+    position = 0
+
+    def write(chunk):
+        nonlocal position
+        parts.append(chunk)
+        position += len(chunk)
+
+    # classement alphabétique des métadonnées
+    for key in sorted(dict_meta.keys()):
+        # on gère le texte ailleurs
+        if key == "text":
+            continue
+        write(f'==== {key.upper()} ====\n')
+        _render_value(dict_meta[key], write, spans, lambda: position)
+        write('\n\n')
+    return "".join(parts), spans
+
+
+def _render_value(value, write, spans, position):
+    """
+    Ecrit la valeur donnée selon son type et son contenu.
+    'position' retourne la position courante dans le texte final.
+    """
+    # Liste
+    if isinstance(value, list):
+        if not len(value):
+            write("None")
+        # Liste de string = string séparée par " / "
+        elif isinstance(value[0], str):
+            write(" / ".join(value))
+        # Liste de dict = string débutant par # et avec saut de ligne
+        elif isinstance(value[0], dict):
+            for index_list, item in enumerate(value):
+                ch = _dict_to_string(item)
+                # Recherche des possibles hyperliens
+                hyperlinks_info = find_replace_hyperlink(ch)
+                if hyperlinks_info:
+                    ch, links = hyperlinks_info
+                    # les positions sont décalées de "# "
+                    start = position() + 2
+                    spans.extend((start + i_start, start + i_end, url)
+                                 for i_start, i_end, url in links)
+                write(f"# {ch}")
+                if index_list + 1 < len(value):
+                    write('\n')
+    # Dictionnaire = string débutant par #
+    elif isinstance(value, dict):
+        if not len(value):
+            write("None")
+        else:
+            write(f"# {_dict_to_string(value)}")
+    # String simple = les sauts de ligne sont supprimés
+    elif isinstance(value, str):
+        write(value.replace("\n", ""))
+    # Si boolean
+    elif isinstance(value, bool):
+        write("Oui" if value else "Non")
+    # Si Faux alors on écrit "None"
+    else:
+        write("None")
+
+
+def _dict_to_string(item: dict):
+    """
+    "Clé : valeur, Clé : valeur..." sur une seule ligne
+    """
+    values = []
+    for key, v in item.items():
+        if isinstance(v, str):
+            v = v.replace("\n", " ")
+        values.append(f"{key.capitalize()} : {v}")
+    return ", ".join(values)
+
+
+def find_replace_hyperlink(text):
+    """
+    Dans un texte, remplace chaque balise <a href="url">cible</a> par sa
+    cible (texte d'affichage), en une seule passe.
+    Retourne un tuple composé du nouveau texte et d'une liste de tuples
+    (début, fin, url) donnant la position de chaque cible dans le
+    nouveau texte.
+    Si aucune balise <a></a> alors retourne None
+    """
+    if "<a" not in text:
+        return None
+    parts = []
+    indices_and_url = []
+    # position dans le texte source et longueur du nouveau texte
+    previous = 0
+    length = 0
+    for match in HYPERLINK_RE.finditer(text):
+        before = text[previous:match.start()]
+        target = match.group("target")
+        parts.append(before)
+        parts.append(target)
+        start = length + len(before)
+        length = start + len(target)
+        indices_and_url.append((start, length, match.group("url")))
+        previous = match.end()
+    if not indices_and_url:
+        return None
+    parts.append(text[previous:])
+    return ("".join(parts), indices_and_url)
@@ -18,14 +18,21 @@
 Classes pour instanciation d'une page de résultat
 """
 
+import queue
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import ttk, VERTICAL, filedialog
 import webbrowser as web
-import pandas as pd
 from datetime import datetime
 from pycoretext.api_controller import api_answers
+from pycoretext.api_controller.api_planner import MAX_RESULTS
+from pycoretext.api_controller.api_facets import FACETS
 from pycoretext.widgets import DecisionsList, ButtonWholeText
 import pycoretext.widgets as widgets
+from pycoretext import export
+from pycoretext.views.meta_render import render_meta
 import logging
 
 logger = logging.getLogger('flux.app.ResultPage')
@@ -37,6 +44,10 @@ class ResultPage(tk.Frame):
     Hérité de Frame
     A insérer dans un notebook
     """
+    # intervalle (ms) de lecture des pages reçues pendant le téléchargement
+    poll_interval = 100
+    # nombre de rendus de métadonnées conservés (cf. _feed_text)
+    render_cache_size = 500
 
     def __init__(self, parent, answer: api_answers.Answer, *args, **kwargs):
         """
@@ -47,6 +58,10 @@ class ResultPage(tk.Frame):
         # récupération des données importantes liées à l'answer
         self._answer = answer
         self._id_answer = answer.id_answer
+        # rendus des métadonnées déjà affichées : identifiant -> rendu
+        self._render_cache = OrderedDict()
+        # interruption du téléchargement (onglet fermé)
+        self._stop_download = threading.Event()
         self._dict_criterias = answer.dict_criterias
         self._answer_type = self.identify_type(str(answer.__class__))
         if self._answer_type in ["export", "search"]:
@@ -85,6 +100,9 @@ class ResultPage(tk.Frame):
             # on lie l'évènement <<DisplayDecision>>
             self._treeview.bind("<<DisplayDecision>>",
                                 self.retrieve_selection_treeview)
+            # pages restantes téléchargées en arrière-plan
+            if not answer.complete:
+                self._start_download()
         elif self._answer_type == "decision":
             self.add_text()
             self._feed_text(self.decision)
@@ -102,9 +120,13 @@ class ResultPage(tk.Frame):
         """
         Affiche le dict_criteria ainsi que le nombre de décisions trouvé
         """
+        # le bloc est reconstruit à la fin d'un téléchargement
+        if hasattr(self, "_details_frame"):
+            self._details_frame.destroy()
         # frame principal
         details_frame = ttk.Frame(self._left_frame)
         details_frame.grid(row=0, column=0, sticky=tk.W + tk.E)
+        self._details_frame = details_frame
         details_frame.columnconfigure(0, weight=1)
         # critères de recherche
         criteria_frame = ttk.LabelFrame(
@@ -126,8 +148,14 @@ class ResultPage(tk.Frame):
                                 text=self._expected_decisions_nb_from_api
                                 )
             expected_label.grid(row=0, column=0, sticky=tk.W + tk.E)
+            # requête découpée en tranches de dates (limite API dépassée)
+            nb_shards = len(getattr(self._answer, "shards", []))
+            if nb_shards > 1:
+                expected_label.config(text=(
+                            str(self._expected_decisions_nb_from_api)
+                            + f" ({nb_shards} tranches de dates)"))
             # Alerte si limite de recherche API atteinte (10 000)
-            if self._expected_decisions_nb_from_api >= 10000:
+            elif self._expected_decisions_nb_from_api >= MAX_RESULTS:
                 expected_label.config(text=(
                             str(self._expected_decisions_nb_from_api)
                             + " Limite API !"),
@@ -143,10 +171,12 @@ class ResultPage(tk.Frame):
                             text=self._decisions_nb_obtained
                             )
                 final_label.grid(row=0, column=0, sticky=tk.W + tk.E)
+                self._final_label = final_label
                 # Si le nb obtenu n'est pas celui attendu
-                # le nb appraît en rouge
+                # le nb appraît en rouge (une fois le téléchargement fini)
                 if (
-                    self._expected_decisions_nb_from_api
+                    self._answer.complete
+                    and self._expected_decisions_nb_from_api
                         != self._decisions_nb_obtained):
                     final_label.config(foreground="red")
                 # si des requêtes sont erronnées
@@ -182,16 +212,122 @@ class ResultPage(tk.Frame):
         Construit le treeview si plusieurs décisions ont été renvoyées
         """
         # créationd du treeview
-        self._treeview = DecisionsList(self._left_frame)
+        self._treeview = DecisionsList(self._left_frame, self._answer.table)
         self._treeview.grid(row=1, column=0, sticky=tk.W + tk.E + tk.N + tk.S)
         self._treeview.populate(self.dict_decisions)
         # Ajout du bouton pour export Excel
         self._button_excel = ttk.Button(self._left_frame,
-                                        text="Export Excel brut",
+                                        text="Export brut (Excel, CSV...)",
                                         command=self._export_raw_excel)
         self._button_excel.grid(row=2, column=0,
                                 sticky=tk.W + tk.E + tk.S,
                                 pady=(3, 0))
+        # facettes : filtres instantanés sur les décisions reçues
+        self._facet_panel = widgets.FacetPanel(self._left_frame, FACETS)
+        self._facet_panel.grid(row=3, column=0, sticky=tk.W + tk.E,
+                               pady=(3, 0))
+        self._facet_panel.bind("<<FacetChanged>>", self._on_facet_changed)
+        self._refresh_facets()
+
+    def _refresh_facets(self):
+        """
+        Met à jour les nombres de décisions affichés par le panneau
+        """
+        facets = self._answer.facets
+        selection = self._facet_panel.selection
+        self._facet_panel.update_counts(
+            {field: facets.counts(field, selection) for field in FACETS})
+
+    def _on_facet_changed(self, *_):
+        """
+        Affiche dans le treeview les seules décisions de la sélection
+        """
+        keys = self._answer.facets.filter(self._facet_panel.selection)
+        self._treeview.populate({key: self.dict_decisions[key]
+                                 for key in keys})
+        self._refresh_facets()
+
+    def _filter_page(self, new_decisions: dict):
+        """
+        Décisions d'une nouvelle page qui correspondent à la sélection
+        """
+        selection = self._facet_panel.selection
+        if not selection:
+            return new_decisions
+        keys = self._answer.facets.filter(selection, keys=new_decisions)
+        return {key: new_decisions[key] for key in keys}
+
+    def _start_download(self):
+        """
+        Télécharge les pages restantes dans un thread.
+        Les nouvelles décisions transitent par une file (queue.Queue)
+        lue depuis la boucle Tk : seul le thread principal modifie
+        les widgets.
+        """
+        self._pages_queue = queue.Queue()
+        self._button_excel.state(["disabled"])
+        threading.Thread(target=self._download_remaining,
+                         daemon=True).start()
+        self.after(self.poll_interval, self._poll_pages)
+
+    def _download_remaining(self):
+        """
+        Fonction exécutée dans le thread de téléchargement.
+        L'interruption est vérifiée entre deux pages : la fermeture du
+        générateur annule les requêtes non commencées.
+        """
+        pages = self._answer.iter_pages()
+        try:
+            for new_decisions in pages:
+                if self._stop_download.is_set():
+                    logger.info('CANCEL download ResultPage')
+                    break
+                self._pages_queue.put(new_decisions)
+        finally:
+            pages.close()
+            # signal de fin du téléchargement
+            self._pages_queue.put(None)
+
+    def destroy(self):
+        """
+        Onglet fermé : les pages restantes ne sont plus téléchargées
+        """
+        self._stop_download.set()
+        super().destroy()
+
+    def _poll_pages(self):
+        """
+        Ajoute au treeview les pages reçues depuis le dernier passage
+        """
+        # l'onglet a pu être fermé pendant le téléchargement
+        if not self.winfo_exists():
+            return
+        done = False
+        received = False
+        try:
+            while True:
+                new_decisions = self._pages_queue.get_nowait()
+                if new_decisions is None:
+                    done = True
+                    break
+                self._treeview.append(self._filter_page(new_decisions))
+                received = True
+        except queue.Empty:
+            pass
+        if received:
+            self._refresh_facets()
+        self._decisions_nb_obtained = self._answer.nb_decision
+        if done:
+            # compteurs définitifs et éventuelles requêtes erronées
+            self.add_answer_details()
+            self._button_excel.state(["!disabled"])
+            self.event_generate("<<AnswerComplete>>")
+            logger.info('END download ResultPage')
+        else:
+            if hasattr(self, "_final_label"):
+                self._final_label.config(
+                    text=f"{self._decisions_nb_obtained} (en cours...)")
+            self.after(self.poll_interval, self._poll_pages)
 
     def add_text(self):
         """
@@ -211,6 +347,14 @@ class ResultPage(tk.Frame):
                           command=self._text.yview)
         s.grid(row=0, column=1, sticky=tk.N + tk.S + tk.W)
         self._text["yscrollcommand"] = s.set
+        # un seul tag, configuré une fois, pour tous les hyperliens
+        self._links = []
+        self._links_starts = []
+        self._text.tag_config("hyperlink", foreground="blue", underline=True)
+        self._text.tag_bind("hyperlink", "<Button-1>",
+                            self._on_hyperlink_click)
+        self._text.tag_bind("hyperlink", "<Enter>", self._enter)
+        self._text.tag_bind("hyperlink", "<Leave>", self._leave)
 
     def retrieve_selection_treeview(self, *_):
         """
@@ -218,102 +362,36 @@ class ResultPage(tk.Frame):
         """
         # decision sélectionnée
         selection = self._treeview.selected_id
-        dict_meta = self.dict_decisions[selection].dict_meta
-        self._feed_text(dict_meta)
+        decision = self.dict_decisions[selection]
+        # le texte (éventuellement sur disque) n'est lu qu'à l'affichage
+        dict_meta = decision.to_dict(with_text=False)
+        self._feed_text(dict_meta, cache_key=selection)
         if self._answer_type == "export":
             self._build_access_text_button(
-                dict_meta["text"],
+                lambda: decision.get("text"),
                 dict_meta["id"],
                 dict_meta["number"])
 
-    def _feed_text(self, dict_meta: dict):
+    def _feed_text(self, dict_meta: dict, cache_key=None):
         """
         Ecrit les éléments d'un dictionnaire donné dans le widget self._text
-        Pour Export, Search et Decision
+        Pour Export, Search et Decision.
+        Le rendu (texte et hyperliens) est construit en une seule passe
+        puis conservé pour 'cache_key' (identifiant de la décision).
         """
-        self._text.delete("1.0", tk.END)
-        # classement alphabétique des métadonnées
-        sorted_keys = sorted(list(dict_meta.keys()))
-        for key in sorted_keys:
-            # on gère le texte ailleurs
-            if key != "text":
-                value = dict_meta[key]
-                self._text.insert(
-                    tk.END, f'==== {key.upper()} ====\n')
-                self._write_value_in_text(value)
-                self._text.insert(tk.END, '\n\n')
-
-    def _write_value_in_text(self, value):
-        """
-        Ecrit dans self._text la valeur donnée selon son type et son contenu.
-        """
-        # Liste
-        if isinstance(value, list):
-            if not len(value):
-                self._text.insert(tk.END, "None")
-            # Liste de string = string séparée par " / "
-            elif isinstance(value[0], str):
-                self._text.insert(tk.END, " / ".join(value))
-            # Liste de dict = string débutant par # et avec saut de ligne
-            elif isinstance(value[0], dict):
-                for index_list, item in enumerate(value):
-                    ch = ""
-                    for index_dict, key in enumerate(list(item.keys())):
-                        v = item[key]
-                        if isinstance(v, str):
-                            v = v.replace("\n", " ")
-                        ch += f"{key.capitalize()} : {v}"
-                        if index_dict + 1 < len(list(item.keys())):
-                            ch += ", "
-                    # Recherche des possibles hyperliens
-                    # Obtention des indices des targets si des remplacements
-                    # ont été faits
-                    hyperlinks_info = self._find_replace_hyperlink(ch)
-                    # Si des hyperliens ont été trouvés
-                    if hyperlinks_info:
-                        new_ch = hyperlinks_info[0]
-                        self._text.insert(tk.END, f"# {new_ch}")
-                        # dernière ligne complétée
-                        i_line = self._text.index(
-                                        "end - 1 chars").split('.')[0]
-                        # Application des tag
-                        for tag in hyperlinks_info[1]:
-                            self._add_hypertags(i_line,
-                                                tag[0] + 2,
-                                                tag[1] + 2,
-                                                tag[2])
-                    else:
-                        self._text.insert(tk.END, f"# {ch}")
-                    if index_list + 1 < len(value):
-                        self._text.insert(tk.END, '\n')
-        # Dictionnaire = string débutant par #
-        elif isinstance(value, dict):
-            if not len(value):
-                self._text.insert(tk.END, "None")
-            else:
-                ch = ""
-                for index, key in enumerate(list(value.keys())):
-                    v = value[key]
-                    if isinstance(v, str):
-                        v = v.replace("\n", " ")
-                    ch += f"{key.capitalize()} : {v}"
-                    if index + 1 < len(list(value.keys())):
-                        ch += ", "
-                self._text.insert(tk.END, f"# {ch}")
-        # String simple = pas de mise en forme particulière
-        elif isinstance(value, str):
-            value = value.split("\n")
-            for line in value:
-                self._text.insert(tk.END, line)
-        # Si boolean
-        elif isinstance(value, bool):
-            if value:
-                self._text.insert(tk.END, "Oui")
-            else:
-                self._text.insert(tk.END, "Non")
-        # Si Faux alors on écrit "None"
+        rendering = self._render_cache.get(cache_key)
+        if rendering is None:
+            rendering = render_meta(dict_meta)
+            if cache_key is not None:
+                self._render_cache[cache_key] = rendering
+                if len(self._render_cache) > self.render_cache_size:
+                    self._render_cache.popitem(last=False)
         else:
-            self._text.insert(tk.END, "None")
+            self._render_cache.move_to_end(cache_key)
+        text, spans = rendering
+        self._text.delete("1.0", tk.END)
+        self._text.insert("1.0", text)
+        self._apply_hyperlinks(spans)
 
     def _feed_text_from_taxonomy(self):
         """
@@ -385,6 +463,9 @@ class ResultPage(tk.Frame):
         """
         if "Export" in class_name:
             return "export"
+        # réponse du corpus local : décisions complètes comme Export
+        elif "Local" in class_name:
+            return "export"
         elif "Search" in class_name:
             return "search"
         elif "Decision" in class_name:
@@ -394,44 +475,6 @@ class ResultPage(tk.Frame):
         else:
             return None
 
-    def _find_replace_hyperlink(self, text):
-        """
-        Dans un texte :
-        Trouve les balises <a></a> qui contiennent
-        les attributs href et target
-        Pour chaque occurence:
-        /1 remplace <a></a> par la target (texte d'affichage)
-        /2 conserve les indices de début et
-        fin de la target dans le nouveau texte
-        Retourne un tuple composé du nouveau text et d'une liste de tuples :
-            -> Chaque tuple contient l'indice de début et
-               de fin de la target ainsi que l'URL
-        Si aucune balise <a></a> alors retourne None
-        """
-        is_there_hyperlink = False
-        indices_and_url = []
-        while 1:
-            # Trouver le premier <a> dans le texte
-            indice_start = text.find("<a")
-            if indice_start == -1:
-                break
-            else:
-                is_there_hyperlink = True
-                indice_end = text.find("</a")
-                hyper = text[indice_start:indice_end+4]
-                url = hyper[hyper.find("https"):hyper.find("target")]
-                target = hyper[hyper.find(">")+1:hyper.find("</a>")]
-                text = text[:indice_start] + target + text[indice_end + 4:]
-                i_start_targed_in_new_text = indice_start
-                i_end_target_in_new_text = indice_start + len(target)
-                indices_and_url.append((i_start_targed_in_new_text,
-                                        i_end_target_in_new_text,
-                                        url))
-        if is_there_hyperlink:
-            return (text, indices_and_url)
-        else:
-            return None
-
     def _open_url(self, url):
         """
         Ouvre l'URL donnée dans un nouvel onglet
@@ -448,49 +491,113 @@ class ResultPage(tk.Frame):
         Revient à la forme de curseur normal"""
         self._text.config(cursor="")
 
-    def _add_hypertags(self, i_line, i_start, i_end, url):
-        """
-        Crée un tag sur un extrait de texte
-        Le configure en bleu souligné
-        Le bind à _leave et _enter pour la forme du curseur
-        Le bind à _open_url"""
-        # ajouter un tag (début et fin)
-        self._text.tag_add(url, i_line + '.' + str(i_start),
-                           i_line + '.' + str(i_end))
-        # Le configurer en prenant l'url pour nom de tag
-        self._text.tag_config(url, foreground="blue", underline=True)
-        # Le lier à une méthode ou fonction
-        self._text.tag_bind(url, "<Button-1>",
-                            func=lambda event, url=url: self._open_url(url))
-        self._text.tag_bind(url, "<Enter>", self._enter)
-        self._text.tag_bind(url, "<Leave>", self._leave)
+    def _apply_hyperlinks(self, spans):
+        """
+        Applique le tag partagé "hyperlink" à toutes les cibles en un seul
+        appel. Les liens (début, fin, url) sont conservés, triés, pour
+        retrouver l'URL lors d'un clic.
+        """
+        self._links = sorted(spans)
+        self._links_starts = [start for start, _, _ in self._links]
+        if not spans:
+            return
+        indices = []
+        for start, end, _ in self._links:
+            indices.extend((f"1.0 + {start} chars", f"1.0 + {end} chars"))
+        self._text.tag_add("hyperlink", *indices)
+
+    def _on_hyperlink_click(self, event):
+        """
+        Ouvre l'URL du lien cliqué (recherche dichotomique de la position
+        du clic parmi les liens affichés)
+        """
+        count = self._text.count("1.0", f"@{event.x},{event.y}", "chars")
+        position = count[0] if count else 0
+        i = bisect_right(self._links_starts, position) - 1
+        if i >= 0:
+            start, end, url = self._links[i]
+            if start <= position < end:
+                self._open_url(url)
 
     def _export_raw_excel(self):
         """
-        Méthode qui utilise Pandas pour exporter
-        les données dans Excel"""
-        logger.info('TRY export result in Excel')
-        # dictionnaire adapté à Pandas
-        dict_for_export = {}
-        for key, value in self.dict_decisions.items():
-            # copie du dictionnaire de la décision
-            meta_in_value = value.dict_meta.copy()
-            dict_for_export[key] = meta_in_value
-            # suppression du text
-            dict_for_export[key].pop("text", "")
-        # création du dataframe transposé
-        df = pd.DataFrame(dict_for_export).T
+        Exporte les métadonnées des décisions (Excel, CSV ou Parquet).
+        L'écriture est faite dans un thread : la progression transite
+        par une file (queue.Queue) lue depuis la boucle Tk.
+        """
+        logger.info('TRY export result')
+        formats = export.available_formats()
         today = datetime.today().strftime("%Y-%m-%d-%H-%M")
-        filename = f"\\{today}_pycoretext_id{self._id_answer}.xlsx"
-        # on demande à l'utilisateur dans quel dossier placer le fichier excel
+        # le format est choisi par l'extension du fichier
+        path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            initialfile=f"{today}_pycoretext_id{self._id_answer}.xlsx",
+            filetypes=[(label, f"*.{ext}") for ext, label in formats.items()])
+        if not path:
+            return
+        self._export_queue = queue.Queue()
+        cancel = threading.Event()
+        self._export_dialog = widgets.ProgressDialog(
+            self, "Export des résultats", cancel)
+        self._button_excel.state(["disabled"])
+        threading.Thread(target=self._run_export,
+                         args=(path, cancel),
+                         daemon=True).start()
+        self.after(self.poll_interval, self._poll_export)
+
+    def _run_export(self, path, cancel):
+        """
+        Fonction exécutée dans le thread d'export
+        """
         try:
-            export_path = filedialog.askdirectory()
-        except PermissionError:
-            pass
-        # export Excel
-        df.to_excel(export_path + filename)
-        logger.info('SUCCESS export result in Excel : '
-                    + f'file name = \'{export_path + filename}\'')
+            written = export.export_table(
+                self._answer.table, path, cancel=cancel,
+                progress=lambda done, total: self._export_queue.put(
+                    ("progress", done, total)))
+        except export.ExportCancelled:
+            self._export_queue.put(("cancelled",))
+        except Exception as e:
+            # toute erreur est transmise : la fenêtre de progression
+            # doit toujours être fermée
+            logger.exception('FAIL export thread')
+            self._export_queue.put(("error", e))
+        else:
+            self._export_queue.put(("done", path, written))
+
+    def _poll_export(self):
+        """
+        Met à jour la fenêtre de progression de l'export
+        """
+        if not self.winfo_exists():
+            return
+        message = None
+        try:
+            while True:
+                message = self._export_queue.get_nowait()
+                if message[0] == "progress":
+                    self._export_dialog.update_progress(*message[1:])
+                else:
+                    break
+        except queue.Empty:
+            message = None
+        if message is None:
+            self.after(self.poll_interval, self._poll_export)
+            return
+        self._export_dialog.destroy()
+        self._button_excel.state(["!disabled"])
+        if message[0] == "done":
+            logger.info('SUCCESS export result : '
+                        + f'file name = \'{message[1]}\'')
+            widgets.CustomMessageBox(
+                "Export terminé",
+                f"{message[2]} décisions exportées dans {message[1]}",
+                "information")
+        elif message[0] == "error":
+            logger.error(f'FAIL export result : {message[1]}')
+            widgets.CustomMessageBox("Export impossible", message[1],
+                                     "error")
+        else:
+            logger.info('CANCEL export result')
 
     def _display_wrong_urls(self):
         """
@@ -18,9 +18,10 @@
 Ce module contient les créations de classes de widgets pour pycoretext
 """
 
+import time
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, VERTICAL, WORD
-import psutil
 import logging
 
 logger = logging.getLogger('flux.widgets')
@@ -261,6 +262,28 @@ class LabelInput(tk.Frame):
         # enregistrement de la sélection dans la variable
         widget.variable.set(to_return)
 
+    def set_items(self, items_list):
+        """
+        Remplace les valeurs proposées (Listbox ou ButtonSelect).
+        Les valeurs sélectionnées encore présentes le restent.
+        """
+        if isinstance(self.input, ButtonSelect):
+            self.input.set_items(items_list)
+            return
+        widget_list = self.input.winfo_children()[0]
+        selected = {widget_list.get(i) for i in widget_list.curselection()}
+        # une liste désactivée ne peut pas être modifiée
+        state = widget_list["state"]
+        widget_list.configure(state=tk.NORMAL)
+        widget_list.delete(0, tk.END)
+        for i, item in enumerate(items_list):
+            widget_list.insert(tk.END, item)
+            if item in selected:
+                widget_list.selection_set(i)
+        widget_list.configure(state=state)
+        if selected:
+            self._update(self)
+
     def _unselect(self, var, *_):
         """
         Méthode spécifique aux Listbox.
@@ -356,8 +379,12 @@ class ButtonSelect(ttk.Frame):
         # si la variable self._selection est déjà complétée alors
         # on sélectionne à nouveau les éléments
         if self.selection:
+            items = self._widget_list.get(0, tk.END)
             for item in self.selection:
-                index = self._widget_list.get(0, tk.END).index(item)
+                # valeur retirée de la liste depuis (cf. set_items)
+                if item not in items:
+                    continue
+                index = items.index(item)
                 self._widget_list.selection_set(index, index)
         # bouton de validation
         validate = ttk.Button(top_frame, text="Valider",
@@ -401,10 +428,19 @@ class ButtonSelect(ttk.Frame):
         "retire sélection dans Listbox/vide self._selection/vide self.text"
         self._widget_list.selection_clear(0, tk.END)
 
+    def set_items(self, items_list):
+        """
+        Remplace les valeurs proposées à la prochaine ouverture
+        de la fenêtre de sélection
+        """
+        self._items_list = list(items_list or [])
+
 
 class DecisionsList(tk.Frame):
     """
-    Widget treeview pour afficher le résultat de la recherche
+    Widget treeview pour afficher le résultat de la recherche.
+    Les tris sont calculés sur la table en colonnes de la réponse
+    ('table', cf. api_table.DecisionTable).
     """
 
     # définition anticipée des colonnes et de leur configuration
@@ -417,17 +453,33 @@ class DecisionsList(tk.Frame):
         "chamber": {"label": "Ch", "width": 50},
         "publication": {"label": "Pub", "width": 40},
     }
+    # indicateurs du sens de tri dans les en-têtes
+    sort_indicators = {False: " \u25b2", True: " \u25bc"}
     default_width = 70
     default_minwidth = 10
     default_anchor = tk.W
+    # insertion par tranches : nombre maximal de lignes et durée maximale
+    # (ms) d'une tranche
+    chunk_size = 500
+    slice_ms = 15
 
-    def __init__(self, parent, *args, **kwargs):
+    def __init__(self, parent, table, *args, **kwargs):
         """
         Fonction d'initialisation
         """
         super().__init__(parent, *args, **kwargs)
+        self.table = table
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
+        # lignes (identifiant, décision) en attente d'insertion
+        self._pending = deque()
+        # identifiant de la prochaine tranche programmée (after)
+        self._job = None
+        # décisions de la liste
+        self._decisions = {}
+        # tri courant (colonne, décroissant) et lignes ajoutées depuis
+        self._sort = None
+        self._unsorted = False
         # création du treeview
         self.treeview = ttk.Treeview(
             self,
@@ -443,7 +495,8 @@ class DecisionsList(tk.Frame):
             minwidth = definition.get("minwidth", self.default_minwidth)
             width = definition.get("width", self.default_width)
             stretch = definition.get("stretch", False)
-            self.treeview.heading(name, text=label, anchor=anchor)
+            self.treeview.heading(name, text=label, anchor=anchor,
+                                  command=lambda c=name: self.sort_by(c))
             self.treeview.column(
                 name, anchor=anchor, minwidth=minwidth,
                 width=width, stretch=stretch
@@ -483,24 +536,208 @@ class DecisionsList(tk.Frame):
         dict_decisions correspond à un dictionnaire de décisions fourni
         par l'objet Answer
         """
+        self._cancel_insertion()
+        self.treeview.delete(*self.treeview.get_children())
+        self._decisions = {}
+        self.append(dict_decision)
+
+    def append(self, dict_decision: dict):
+        """
+        Ajoute les lignes des décisions données à la fin du treeview
+        (pages reçues au fil du téléchargement).
+        Les lignes sont insérées par tranches (cf. _insert_chunk) :
+        la première est affichée immédiatement, les suivantes laissent
+        la boucle Tk traiter les évènements entre deux tranches.
+        """
+        self._pending.extend(dict_decision.items())
+        self._decisions.update(dict_decision)
+        if self._sort is not None and dict_decision:
+            self._unsorted = True
+        if self._job is None:
+            self._insert_chunk()
+
+    @property
+    def pending(self):
+        """
+        Nombre de lignes en attente d'insertion
+        """
+        return len(self._pending)
+
+    def _insert_chunk(self):
+        """
+        Insère au plus 'chunk_size' lignes, pendant au plus 'slice_ms'
+        millisecondes, puis programme la tranche suivante
+        """
+        self._job = None
         # récupération de la liste des colonnes définies pour notre treeview
         cids = self.treeview.cget('columns')
-        # pour chaque décision
-        for key, value in dict_decision.items():
-            # récupération de son dictionnaire de méta
-            dict_meta = value.dict_meta
-            values = [dict_meta[cid] for cid in cids]
+        deadline = time.perf_counter() + self.slice_ms / 1000
+        count = 0
+        while self._pending and count < self.chunk_size:
+            key, value = self._pending.popleft()
+            # récupération des métas affichées
+            values = [value.get(cid) for cid in cids]
             self.treeview.insert("", "end", iid=str(key),
                                  text=str(key), values=values)
+            count += 1
+            if time.perf_counter() > deadline:
+                break
         # on place la sélection sur le premier élément de la liste
         # "1" car nous idenfions les décisions à partir de 1 dans Answer
-        self.treeview.focus_set()
-        self.treeview.selection_set("1")
-        self.treeview.focus("1")
+        if not self.treeview.selection() and self.treeview.exists("1"):
+            self.treeview.focus_set()
+            self.treeview.selection_set("1")
+            self.treeview.focus("1")
+        if self._pending:
+            self._job = self.after(1, self._insert_chunk)
+        else:
+            if self._unsorted:
+                # lignes reçues après le tri : nouveau tri global
+                self._apply_sort()
+            self.event_generate("<<ListPopulated>>")
+
+    def sort_by(self, column, descending=None):
+        """
+        Trie la liste selon la colonne (clic sur l'en-tête).
+        Sans 'descending', un second clic inverse le sens du tri.
+        """
+        if descending is None:
+            descending = self._sort == (column, False)
+        self._sort = (column, descending)
+        for name, definition in self.columns_def.items():
+            label = definition.get("label", "")
+            if name == column:
+                label += self.sort_indicators[descending]
+            self.treeview.heading(name, text=label)
+        self._apply_sort()
+
+    def _apply_sort(self):
+        """
+        Réordonne toutes les lignes en une seule opération :
+        - toutes insérées : un seul appel Treeview.set_children
+        - insertion en cours : les lignes sont réinsérées par tranches,
+          dans l'ordre du tri
+        """
+        self._unsorted = False
+        column, descending = self._sort
+        if column == "#0":
+            order = sorted(self._decisions, reverse=descending)
+        else:
+            # tri vectorisé, limité aux décisions de la liste
+            order = self.table.sort_keys(column, descending,
+                                         keys=self._decisions)
+        if self._pending:
+            self._cancel_insertion()
+            self.treeview.delete(*self.treeview.get_children())
+            self._pending.extend((key, self._decisions[key])
+                                 for key in order)
+            self._insert_chunk()
+        else:
+            self.treeview.set_children("", *(str(key) for key in order))
+            selection = self.treeview.selection()
+            if selection:
+                self.treeview.see(selection[0])
+
+    def _cancel_insertion(self):
+        """
+        Abandonne les lignes en attente d'insertion
+        """
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+        self._pending.clear()
+
+    def destroy(self):
+        """
+        Annule la tranche programmée avant la destruction du widget
+        """
+        self._cancel_insertion()
+        super().destroy()
+
+
+class FacetPanel(ttk.LabelFrame):
+    """
+    Panneau de facettes : une liste déroulante par facette, avec le
+    nombre de décisions de chaque valeur.
+    Génère l'évènement <<FacetChanged>> lorsque la sélection change.
+    """
+    all_label = "Toutes"
+    empty_label = "(vide)"
+
+    def __init__(self, parent, facets: dict, *args, **kwargs):
+        """
+        Fonction d'initialisation
+        'facets' : {facette: libellé}
+        """
+        super().__init__(parent, text="Filtrer les résultats",
+                         *args, **kwargs)
+        self.columnconfigure(1, weight=1)
+        self._combos = {}
+        # valeurs proposées par chaque liste (dans l'ordre affiché)
+        self._choices = {}
+        for row, (field, label) in enumerate(facets.items()):
+            ttk.Label(self, text=label).grid(row=row, column=0,
+                                             sticky=tk.W, padx=(4, 6))
+            combo = ttk.Combobox(self, state="readonly",
+                                 values=[self.all_label])
+            combo.current(0)
+            combo.grid(row=row, column=1, sticky=tk.W + tk.E,
+                       padx=(0, 4), pady=1)
+            combo.bind("<<ComboboxSelected>>", self._on_change)
+            self._combos[field] = combo
+            self._choices[field] = []
+
+    def _selected(self, field):
+        """
+        Retourne (True, valeur) si une valeur est choisie pour la facette
+        """
+        index = self._combos[field].current()
+        if index <= 0:
+            return False, None
+        return True, self._choices[field][index - 1]
+
+    @property
+    def selection(self):
+        """
+        Sélection courante : {facette: {valeur}}
+        """
+        selection = {}
+        for field in self._combos:
+            is_selected, value = self._selected(field)
+            if is_selected:
+                selection[field] = {value}
+        return selection
+
+    def update_counts(self, counts_by_field: dict):
+        """
+        Met à jour les valeurs proposées : {facette: {valeur: nombre}}
+        La valeur choisie reste sélectionnée.
+        """
+        for field, counts in counts_by_field.items():
+            is_selected, selected = self._selected(field)
+            values = list(counts)
+            if is_selected and selected not in counts:
+                values.append(selected)
+            self._choices[field] = values
+            combo = self._combos[field]
+            combo["values"] = [self.all_label] + [
+                f"{self.empty_label if value is None else value}"
+                f" ({counts.get(value, 0)})" for value in values]
+            combo.current(values.index(selected) + 1 if is_selected else 0)
+
+    def _on_change(self, *_):
+        """
+        Signale le changement de sélection
+        """
+        self.event_generate("<<FacetChanged>>")
 
 
 class ButtonWholeText(ttk.Button):
-    """Bouton qui génère un widget Text contenant le texte d'une décision"""
+    """
+    Bouton qui génère un widget Text contenant le texte d'une décision.
+    'decision_text' peut être une fonction : le texte n'est alors lu
+    qu'au clic.
+    """
 
     def __init__(self, parent, decision_text, id_decision,
                  number_decision, *args, **kwargs):
@@ -531,7 +768,10 @@ class ButtonWholeText(ttk.Button):
         )
         text.grid(column=0, row=0, sticky="ewsn")
         # On ajoute le texte
-        text.insert("1.0", self.decision_text)
+        decision_text = self.decision_text
+        if callable(decision_text):
+            decision_text = decision_text()
+        text.insert("1.0", decision_text)
         # ajout d'une scrollbar
         self.scrollbar = ttk.Scrollbar(
             top,
@@ -783,6 +1023,51 @@ class CustomMessageBox(tk.Toplevel):
         close_app("pycoretext")
 
 
+class ProgressDialog(tk.Toplevel):
+    """
+    Fenêtre de progression (barre déterminée) avec un bouton Annuler.
+    Le bouton active l'évènement 'cancel' (threading.Event) partagé
+    avec le thread de travail.
+    """
+
+    def __init__(self, parent, title, cancel, *args, **kwargs):
+        """
+        Fonction d'initialisation
+        """
+        super().__init__(parent, *args, **kwargs)
+        self.title(title)
+        self.cancel = cancel
+        place_windows(self, 350, 90, self.nametowidget("."))
+        self.resizable(False, False)
+        self.grab_set()
+        self.columnconfigure(0, weight=1)
+        # la croix annule également le travail
+        self.protocol("WM_DELETE_WINDOW", self._on_cancel)
+        self._label = ttk.Label(self, text="Préparation...")
+        self._label.grid(row=0, column=0, sticky=tk.W, padx=6, pady=(6, 2))
+        self._bar = ttk.Progressbar(self, orient=tk.HORIZONTAL,
+                                    mode="determinate", maximum=1)
+        self._bar.grid(row=1, column=0, sticky=tk.W + tk.E, padx=6)
+        self._button = ttk.Button(self, text="Annuler",
+                                  command=self._on_cancel)
+        self._button.grid(row=2, column=0, pady=6)
+
+    def update_progress(self, done, total):
+        """
+        Met à jour la barre et le libellé
+        """
+        self._bar.configure(maximum=max(total, 1), value=done)
+        self._label.configure(text=f"{done} / {total} lignes")
+
+    def _on_cancel(self):
+        """
+        Demande l'arrêt du travail en cours
+        """
+        self.cancel.set()
+        self._button.state(["disabled"])
+        self._label.configure(text="Annulation...")
+
+
 def place_windows(win_to_place: tk.Tk, width, height, root="screen"):
     """
     Positionne la fenêtre donnée au centre de la fenêtre root"""
@@ -811,6 +1096,8 @@ def close_app(app_name):
     Interrompt le processus donné en paramètre
     # https://stackoverflow.com/questions/5625524/how-to-close-a-program-using-python
     """
+    # import différé : psutil n'est utile qu'à la fermeture
+    import psutil
     logger.info("TRY stop pycoretext.exe processus")
     # returns names of running processes
     running_apps = psutil.process_iter(['pid', 'name'])
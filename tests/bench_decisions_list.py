@@ -0,0 +1,78 @@
+"""
+Objectif du test : mesurer le temps d'affichage de DecisionsList pour
+1 000, 10 000 et 50 000 décisions.
+- "1er affichage" : temps entre l'appel à populate() et le premier
+  rafraîchissement de la fenêtre (update_idletasks)
+- "total" : temps jusqu'à l'insertion de la dernière ligne
+  (évènement <<ListPopulated>>)
+La ligne "synchrone" reproduit l'ancien comportement (toutes les lignes
+insérées en une seule boucle).
+Les décisions sont construites à partir de tests/dataframe_search.json.
+Nécessite un affichage (écran ou serveur X virtuel).
+
+Usage : python tests/bench_decisions_list.py [N1 N2 ...]
+"""
+
+import json
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pycoretext.api_controller.api_answers import DecisionShort  # noqa: E402
+from pycoretext.api_controller.api_table import DecisionTable  # noqa: E402
+from pycoretext.widgets import DecisionsList  # noqa: E402
+
+path = os.path.join(os.path.dirname(__file__), "dataframe_search.json")
+
+
+def build_decisions(n):
+    """
+    Retourne un dict {identifiant: DecisionShort} de n décisions
+    """
+    with open(path, encoding="utf-8") as f:
+        records = json.load(f)["results"]
+    return {i: DecisionShort(records[(i - 1) % len(records)])
+            for i in range(1, n + 1)}
+
+
+def measure(root, decisions, synchronous):
+    """
+    Retourne (1er affichage, total) en secondes
+    """
+    table = DecisionTable(DecisionShort.meta_list, decisions)
+    table.append(decisions)
+    widget = DecisionsList(root, table)
+    widget.grid(row=0, column=0, sticky="nsew")
+    if synchronous:
+        widget.chunk_size = len(decisions)
+        widget.slice_ms = 10 ** 9
+    done = tk.BooleanVar(value=False)
+    widget.bind("<<ListPopulated>>", lambda _: done.set(True))
+    start = time.perf_counter()
+    widget.populate(decisions)
+    root.update_idletasks()
+    first_paint = time.perf_counter() - start
+    if widget.pending:
+        root.wait_variable(done)
+    total = time.perf_counter() - start
+    widget.destroy()
+    return first_paint, total
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 50000]
+    root = tk.Tk()
+    root.geometry("600x400")
+    root.columnconfigure(0, weight=1)
+    root.rowconfigure(0, weight=1)
+    for n in sizes:
+        decisions = build_decisions(n)
+        for synchronous in (True, False):
+            first_paint, total = measure(root, decisions, synchronous)
+            mode = "synchrone" if synchronous else "par tranches"
+            print(f"N={n:<6} {mode:<13} 1er affichage : "
+                  f"{first_paint * 1000:8.1f} ms / total : "
+                  f"{total * 1000:8.1f} ms")
+    root.destroy()
@@ -0,0 +1,112 @@
+"""
+Objectif du test : vérifier que le démarrage de l'application ne régresse
+pas. Chaque mesure est faite dans un nouveau processus Python :
+- "imports" : durée de l'import de pycoretext.application (tout ce qui
+  précède la fenêtre de connexion, hors Tk)
+- "fenêtre de connexion" : lancement de pycoretext.py jusqu'à
+  l'affichage de la fenêtre de connexion (variable PYCORETEXT_STARTUP_EXIT,
+  cf. module startup). Nécessite un affichage, sinon la mesure est ignorée.
+Le test échoue (code de sortie 1) si la médiane dépasse le budget ou si
+un module lourd (pandas, requests...) est chargé avant la fenêtre de
+connexion.
+
+Usage : python tests/bench_startup.py [nb d'essais] [budget imports ms]
+        [budget fenêtre ms]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# budgets par défaut (médiane, en millisecondes)
+IMPORTS_BUDGET_MS = 150
+LOGIN_BUDGET_MS = 1500
+
+IMPORTS_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import pycoretext.application
+elapsed = (time.perf_counter() - start) * 1000
+from pycoretext import startup
+print(json.dumps({"ms": elapsed, "deferred": startup.loaded_deferred()}))
+"""
+
+
+def run(args, env=None):
+    """
+    Lance un processus Python. Retourne (durée totale ms, dernière ligne
+    JSON de la sortie standard) ou None en cas d'échec
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0 or not result.stdout.strip():
+        return wall, None
+    return wall, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def has_display():
+    """
+    Vrai si une fenêtre Tk peut être créée
+    """
+    code = "import tkinter; tkinter.Tk().destroy()"
+    return subprocess.run([sys.executable, "-c", code],
+                          capture_output=True).returncode == 0
+
+
+def check(label, values, budget, deferred):
+    """
+    Affiche les mesures et retourne False si le budget est dépassé ou
+    si des modules lourds ont été chargés
+    """
+    median = statistics.median(values)
+    print(f"{label:<22} 1er (à froid) : {values[0]:8.1f} ms / "
+          f"médiane : {median:8.1f} ms / budget : {budget} ms")
+    ok = median <= budget
+    if not ok:
+        print(f"  ECHEC : budget dépassé ({median:.1f} > {budget} ms)")
+    if deferred:
+        print("  ECHEC : modules chargés avant la fenêtre de connexion : "
+              + ", ".join(sorted(deferred)))
+        ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    imports_budget = (float(sys.argv[2]) if len(sys.argv) > 2
+                      else IMPORTS_BUDGET_MS)
+    login_budget = (float(sys.argv[3]) if len(sys.argv) > 3
+                    else LOGIN_BUDGET_MS)
+    success = True
+    # imports
+    values, deferred = [], set()
+    for _ in range(runs):
+        _, data = run(["-c", IMPORTS_CODE])
+        if data is None:
+            print("ECHEC : import de pycoretext.application impossible")
+            sys.exit(1)
+        values.append(data["ms"])
+        deferred.update(data["deferred"])
+    success &= check("imports", values, imports_budget, deferred)
+    # fenêtre de connexion
+    if has_display():
+        env = dict(os.environ, PYCORETEXT_STARTUP_EXIT="1")
+        values, deferred = [], set()
+        for _ in range(runs):
+            wall, data = run(["pycoretext.py"], env=env)
+            if data is None:
+                print("ECHEC : lancement de l'application impossible")
+                sys.exit(1)
+            values.append(wall)
+            deferred.update(data["deferred_loaded"])
+        success &= check("fenêtre de connexion", values, login_budget,
+                         deferred)
+    else:
+        print("fenêtre de connexion   ignorée (aucun affichage)")
+    sys.exit(0 if success else 1)
@@ -0,0 +1,72 @@
+"""
+Objectif du test : mesurer avec psutil la mémoire occupée par les objets
+DecisionShort et DecisionFull (RSS du processus avant et après la création
+de N décisions).
+Les décisions sont construites à partir de tests/dataframe_export.json.
+Chaque réponse est décodée à nouveau, comme lors d'une vraie requête.
+Chaque mesure est faite dans un nouveau processus, afin que la mémoire
+libérée par une mesure ne fausse pas la suivante.
+Mode "spill" : les textes sont écrits sur disque (BlobStore), comme lors
+d'un export avec Connexion(spill_texts=True).
+
+Usage : python tests/measure_decisions_memory.py [N]
+"""
+
+import gc
+import json
+import os
+import subprocess
+import sys
+import psutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pycoretext.api_controller import api_answers  # noqa: E402
+from pycoretext.api_controller.api_blobs import BlobStore  # noqa: E402
+
+path = os.path.join(os.path.dirname(__file__), "dataframe_export.json")
+
+
+def measure(n, class_name, with_text):
+    """
+    Retourne la mémoire (octets) occupée en moyenne par une décision
+    with_text : "0" sans texte, "1" texte en mémoire, "spill" sur disque
+    """
+    decision_class = getattr(api_answers, class_name)
+    with open(path, encoding="utf-8") as f:
+        records = [json.dumps(r) for r in json.load(f)["results"]]
+    blobs = BlobStore() if with_text == "spill" else None
+    process = psutil.Process()
+    gc.collect()
+    before = process.memory_info().rss
+    decisions = []
+    for i in range(n):
+        item = json.loads(records[i % len(records)])
+        # sans texte : mesure des seules métadonnées
+        if with_text == "0":
+            item.pop("text", None)
+        decision = decision_class(item)
+        if blobs is not None:
+            decision.spill_text(blobs)
+        decisions.append(decision)
+    gc.collect()
+    result = (process.memory_info().rss - before) / n
+    if blobs is not None:
+        blobs.close(remove=True)
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        # processus fils : une seule mesure
+        print(measure(int(sys.argv[1]), sys.argv[2], sys.argv[3]))
+    else:
+        n = sys.argv[1] if len(sys.argv) > 1 else "10000"
+        for class_name, with_text in [("DecisionShort", "0"),
+                                      ("DecisionFull", "0"),
+                                      ("DecisionFull", "1"),
+                                      ("DecisionFull", "spill")]:
+            result = subprocess.run(
+                [sys.executable, __file__, n, class_name, with_text],
+                capture_output=True, text=True, check=True)
+            print(f"{class_name:<14} texte={with_text} N={n} : "
+                  f"{float(result.stdout):,.0f} octets / décision")
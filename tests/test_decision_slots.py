@@ -0,0 +1,61 @@
+"""
+Objectif du test : vérifier la représentation compacte des objets
+DecisionShort et DecisionFull (cf. tests/measure_decisions_memory.py pour
+la mesure avec psutil) : aucun __dict__ par instance, un seul tuple de
+valeurs et des codes répétitifs internés, partagés entre les décisions.
+
+Usage : python -m pytest tests/test_decision_slots.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pycoretext.api_controller import api_answers  # noqa: E402
+
+path = os.path.join(os.path.dirname(__file__), "dataframe_export.json")
+# taille d'une instance : en-tête de l'objet et un seul slot (64 bits)
+MAX_INSTANCE_SIZE = 48
+# taille du tuple des valeurs : en-tête et un pointeur par métadonnée
+TUPLE_HEADER_SIZE = 48
+
+
+def _records():
+    """
+    Décisions de l'exemple, décodées à chaque appel comme une réponse
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def test_no_dict_and_instance_size():
+    for decision_class in (api_answers.DecisionShort,
+                           api_answers.DecisionFull):
+        for record in _records():
+            decision = decision_class(record)
+            assert not hasattr(decision, "__dict__")
+            assert sys.getsizeof(decision) <= MAX_INSTANCE_SIZE
+            values_size = sys.getsizeof(decision._values)
+            assert values_size <= (TUPLE_HEADER_SIZE
+                                   + 8 * len(decision_class.meta_list))
+            # moins que le dict des mêmes métadonnées
+            as_dict = {meta: record.get(meta)
+                       for meta in decision_class.meta_list}
+            assert (sys.getsizeof(decision) + values_size
+                    < sys.getsizeof(as_dict))
+
+
+def test_interned_codes_are_shared():
+    first, second = (api_answers.DecisionFull(record)
+                     for record in (_records()[0], _records()[0]))
+    for meta in ("jurisdiction", "chamber", "type", "decision_date"):
+        if first.get(meta) is not None:
+            index = api_answers.DecisionFull._index[meta]
+            assert first._values[index] is second._values[index]
+
+
+if __name__ == "__main__":
+    test_no_dict_and_instance_size()
+    test_interned_codes_are_shared()
+    print("OK")
@@ -0,0 +1,183 @@
+"""
+Objectif du test : vérifier que les tris, filtres et comptages vectorisés
+de la table en colonnes (api_table.DecisionTable) donnent le même
+résultat que le calcul ligne à ligne sur les objets Decision
+(valeurs vides, listes de codes, casse, dates invalides, ordre des
+valeurs égales).
+
+Usage : python -m pytest tests/test_decision_table.py
+"""
+
+import os
+import pickle
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pycoretext.api_controller import api_table  # noqa: E402
+from pycoretext.api_controller.api_answers import DecisionShort  # noqa: E402
+from pycoretext.api_controller.api_table import DecisionTable  # noqa: E402
+
+# clé de tri ligne à ligne de chaque colonne triée par DecisionsList
+ROW_KEYS = {
+    "jurisdiction": api_table.text_key,
+    "type": api_table.text_key,
+    "chamber": api_table.text_key,
+    "publication": api_table.text_key,
+    "decision_date": api_table.date_key,
+    "number": api_table.number_key,
+}
+
+
+def build_decisions(n, seed=0):
+    """
+    Retourne un dict {identifiant: DecisionShort} de n décisions variées
+    """
+    rand = random.Random(seed)
+    decisions = {}
+    for key in range(1, n + 1):
+        record = {
+            "id": f"id{key}",
+            "jurisdiction": rand.choice(["cc", "ca", "tj", None]),
+            "chamber": rand.choice(["soc", "Soc", "civ1", "cr", "", None]),
+            "type": rand.choice(["arret", "ordonnance", "qpc"]),
+            "publication": rand.choice([["b"], ["n"], ["b", "r"], [],
+                                        ["r", "b"]]),
+            "solution": rand.choice(["rejet", "cassation", None]),
+            "decision_date": rand.choice([
+                f"20{rand.randint(10, 23)}-0{rand.randint(1, 9)}-1"
+                f"{rand.randint(0, 9)}", "2022-02-30", None]),
+            "number": rand.choice([
+                f"{rand.randint(0, 99):02d}-{rand.randint(0, 99999):05d}",
+                f"{rand.randint(10, 22)}/0{rand.randint(0, 9999):04d}",
+                "", None]),
+        }
+        decisions[key] = DecisionShort(record)
+    return decisions
+
+
+def row_sort(decisions, column, descending, keys):
+    """
+    Tri ligne à ligne : valeurs vides en dernier, ordre d'origine pour
+    les valeurs égales
+    """
+    def sort_key(key):
+        value = ROW_KEYS[column](decisions[key].get(column))
+        return (1, 0) if value is None else (0, value)
+    order = sorted(keys, key=sort_key, reverse=descending)
+    return ([key for key in order if sort_key(key)[0] == 0]
+            + [key for key in order if sort_key(key)[0] == 1])
+
+
+def row_items(decision, column):
+    """
+    Valeurs d'une décision pour les facettes (None = vide)
+    """
+    value = decision.get(column)
+    items = value if isinstance(value, list) else [value]
+    return [None if item == "" else item for item in items] or [None]
+
+
+def row_filter(decisions, selection):
+    """
+    Filtre ligne à ligne (OU dans une colonne, ET entre colonnes)
+    """
+    return sorted(key for key, decision in decisions.items()
+                  if all(not values or any(item in values for item
+                                           in row_items(decision, column))
+                         for column, values in selection.items()))
+
+
+def row_counts(decisions, column, selection):
+    """
+    Comptage ligne à ligne, sélection des autres colonnes appliquée
+    """
+    others = {field: values for field, values in selection.items()
+              if field != column}
+    counts = {}
+    for key in row_filter(decisions, others):
+        for item in row_items(decisions[key], column):
+            counts[item] = counts.get(item, 0) + 1
+    return counts
+
+
+def _table(decisions, pages=7):
+    """
+    Table remplie page par page, comme pendant un téléchargement
+    """
+    table = DecisionTable(DecisionShort.meta_list, decisions)
+    items = list(decisions.items())
+    size = len(items) // pages + 1
+    for start in range(0, len(items), size):
+        table.append(dict(items[start:start + size]))
+        # une requête entre deux pages : tableaux mis en cache puis
+        # invalidés par la page suivante
+        table.sort_keys("decision_date")
+    return table
+
+
+def test_sort_matches_row_path():
+    decisions = build_decisions(2000)
+    table = _table(decisions)
+    subset = [key for key in decisions if key % 3]
+    for column in ROW_KEYS:
+        for descending in (False, True):
+            assert (table.sort_keys(column, descending)
+                    == row_sort(decisions, column, descending, decisions))
+            assert (table.sort_keys(column, descending, keys=subset)
+                    == row_sort(decisions, column, descending, subset))
+
+
+def test_filter_and_counts_match_row_path():
+    decisions = build_decisions(2000, seed=1)
+    table = _table(decisions)
+    selections = [
+        {},
+        {"chamber": {"soc"}},
+        {"chamber": {"soc", None}, "publication": {"b"}},
+        {"publication": {"r", None}, "jurisdiction": {"cc", "tj"}},
+        {"type": {"qpc"}, "solution": {None}},
+        {"chamber": {"inconnue"}},
+    ]
+    for selection in selections:
+        assert table.filter_keys(selection) == row_filter(decisions,
+                                                          selection)
+        page = [key for key in decisions if 500 <= key < 550]
+        assert (table.filter_keys(selection, keys=page)
+                == [key for key in row_filter(decisions, selection)
+                    if key in page])
+        for column in ("jurisdiction", "chamber", "publication"):
+            counts = table.counts(column, selection)
+            assert counts == row_counts(decisions, column, selection)
+            # nombres décroissants
+            assert list(counts.values()) == sorted(counts.values(),
+                                                   reverse=True)
+
+
+def test_dates_and_rows():
+    decisions = build_decisions(300, seed=2)
+    table = pickle.loads(pickle.dumps(_table(decisions)))
+    dates = table.dates("decision_date")
+    assert str(dates.dtype) == "datetime64[D]"
+    for key, day in zip(table.keys().tolist(), dates.tolist()):
+        expected = api_table.date_key(decisions[key].get("decision_date"))
+        assert (day is None) == (expected is None)
+        if day is not None:
+            assert day.isoformat() == decisions[key].get(
+                "decision_date")[:10]
+    # l'export lit les mêmes valeurs que les objets Decision
+    for key, values in table.iter_rows():
+        decision = decisions[key]
+        for column, value in zip(table.columns, values):
+            expected = decision.get(column)
+            # valeur vide d'une colonne codée
+            if column in table._codes and expected in ("", []):
+                expected = None
+            assert value == expected, (key, column)
+
+
+if __name__ == "__main__":
+    test_sort_matches_row_path()
+    test_filter_and_counts_match_row_path()
+    test_dates_and_rows()
+    print("OK")
@@ -0,0 +1,64 @@
+"""
+Objectif du test : vérifier que JobJournal.purge supprime les journaux des
+téléchargements abandonnés (trop anciens ou au-delà du nombre conservé),
+dossiers suffixés -2, -3... compris, sans toucher aux journaux ouverts.
+
+Usage : python -m pytest tests/test_job_journal_purge.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pycoretext.api_controller.api_jobs import JobJournal  # noqa: E402
+from pycoretext.api_controller.api_paths import get_data_dir  # noqa: E402
+
+
+URLS = [f"https://api/export?batch={index}" for index in range(20)]
+
+
+def _old(journal, age):
+    """
+    Vieillit les fichiers d'un journal fermé de 'age' secondes
+    """
+    when = time.time() - age
+    for entry in (journal.path, *journal.path.iterdir()):
+        os.utime(entry, (when, when))
+
+
+def test_purge():
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["PYCORETEXT_HOME"] = home
+        try:
+            # journaux abandonnés : récents, ancien et suffixé
+            recent = [JobJournal(f"https://api/export?q={index}", URLS)
+                      for index in range(3)]
+            for journal in recent:
+                journal.record(0, {"results": []})
+                journal.close()
+            twin = JobJournal("https://api/export?q=0", URLS)
+            first = JobJournal("https://api/export?q=0", URLS)
+            assert first.key == twin.key + "-2"
+            twin.close()
+            first.close()
+            _old(first, JobJournal.max_age + 3600)
+            # journal en cours : jamais supprimé
+            opened = JobJournal("https://api/export?q=open", URLS)
+            _old(opened, JobJournal.max_age + 3600)
+            assert JobJournal.purge(max_count=2) == 2
+            remaining = {path.name for path in get_data_dir("jobs").iterdir()}
+            assert first.key not in remaining
+            assert opened.key in remaining
+            assert len(remaining) == 3
+            opened.discard()
+            assert JobJournal.purge(max_count=0) == 2
+            assert not list(get_data_dir("jobs").iterdir())
+        finally:
+            del os.environ["PYCORETEXT_HOME"]
+
+
+if __name__ == "__main__":
+    test_purge()
+    print("OK")
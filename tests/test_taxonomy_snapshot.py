@@ -0,0 +1,29 @@
+"""
+Objectif du test : vérifier que les instantanés taxonomy livrés avec
+l'application (api_taxonomy.bundled_snapshot_path) sont lisibles et
+complets. Ils sont régénérés par "python -m pycoretext snapshot".
+
+Usage : python -m pytest tests/test_taxonomy_snapshot.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pycoretext.api_controller import api_taxonomy  # noqa: E402
+
+
+def test_bundled_snapshots():
+    for env in ("sandbox", "production"):
+        path = api_taxonomy.bundled_snapshot_path(env)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # même contrôle que read_snapshot
+        assert set(api_taxonomy.CRITERIAS) <= set(data)
+        assert all(isinstance(values, list) for values in data.values())
+
+
+if __name__ == "__main__":
+    test_bundled_snapshots()
+    print("OK")